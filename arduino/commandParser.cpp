@@ -6,6 +6,12 @@
 #include <Arduino.h>
 
 void handleCommands() {
+    // The host closed the port (DTR dropped): fall back to plain ASCII for the next connection
+    if ((isBinaryTelemetry() || isSequenceNumbers()) && !Serial) {
+        setBinaryTelemetry(false);
+        setSequenceNumbers(false);
+    }
+    
     if (Serial.available()) {
         String cmd = Serial.readStringUntil('\n');
         if (cmd == "START") {
@@ -22,6 +28,23 @@ void handleCommands() {
             resetStationCycles(cmd.substring(12).toInt());
         } else if (cmd.startsWith("RESET_FAIL:")) {
             resetStationFailures(cmd.substring(11).toInt());
+        } else if (cmd.startsWith("BINARY:")) {
+            // Acknowledge in the current format, then switch
+            bool enable = cmd.substring(7).toInt() != 0;
+            reportEvent(enable ? "Binary telemetry enabled" : "Binary telemetry disabled");
+            setBinaryTelemetry(enable);
+        } else if (cmd.startsWith("SEQUENCE:")) {
+            bool enable = cmd.substring(9).toInt() != 0;
+            setSequenceNumbers(enable);
+            reportEvent(enable ? "Sequence numbers enabled" : "Sequence numbers disabled");
+        } else if (cmd.startsWith("REQUEST_STATION:")) {
+            // Targeted resync of one station after the host detects a gap
+            int station = cmd.substring(16).toInt();
+            if (station >= 0 && station < STATION_COUNT) {
+                reportStationState(station);
+            } else {
+                reportEvent("Invalid station index: " + String(station));
+            }
         } else if (cmd == "REQUEST_STATE") {
             reportSystemState();
             reportStationStates();
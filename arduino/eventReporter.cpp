@@ -5,7 +5,108 @@
 #include "stationManager.h"
 #include <Arduino.h>
 
+// Binary telemetry frame: SYNC LEN TYPE SEQ16 PAYLOAD[LEN] CRC16, with the CRC
+// (CRC-16/CCITT-FALSE) covering LEN, TYPE, SEQ and PAYLOAD; 16-bit fields
+// are little-endian. Must match gui/telemetry.py.
+constexpr uint8_t FRAME_SYNC = 0xA5;
+constexpr uint8_t FRAME_CYCLE = 1;
+constexpr uint8_t FRAME_STATION = 2;
+constexpr uint8_t FRAME_SYSTEM_STATE = 3;
+constexpr uint8_t FRAME_EVENT = 4;
+constexpr uint8_t FRAME_MAX_PAYLOAD = 128;
+
+struct __attribute__((packed)) CycleFrame {
+    uint8_t station;
+    uint8_t enabled;
+    uint32_t cycles;
+    uint32_t failures;
+    float keyswitchCurrent;
+    float starterCurrent;
+};
+
+struct __attribute__((packed)) StationFrame {
+    uint8_t station;
+    uint8_t enabled;
+    uint32_t cycles;
+    uint32_t failures;
+};
+
+static bool binaryTelemetry = false;
+
+// Every message is numbered within its stream: one stream per station for
+// CYCLE/STATION, one for SYSTEM_STATE/EVENT. Binary frames always carry the
+// number; ASCII lines append "#<seq>" once the host enables it.
+static bool sequenceNumbers = false;
+static uint16_t systemSequence = 0;
+static uint16_t stationSequence[STATION_COUNT] = {0};
+
+void setBinaryTelemetry(bool enabled) {
+    binaryTelemetry = enabled;
+}
+
+bool isBinaryTelemetry() {
+    return binaryTelemetry;
+}
+
+void setSequenceNumbers(bool enabled) {
+    sequenceNumbers = enabled;
+}
+
+bool isSequenceNumbers() {
+    return sequenceNumbers;
+}
+
+static uint16_t nextStationSequence(int station) {
+    if (station < 0 || station >= STATION_COUNT) {
+        return systemSequence++;
+    }
+    return stationSequence[station]++;
+}
+
+static void endLine(uint16_t sequence) {
+    if (sequenceNumbers) {
+        Serial.print("#");
+        Serial.print(sequence);
+    }
+    Serial.println();
+}
+
+static uint16_t crc16(const uint8_t* data, size_t length) {
+    uint16_t crc = 0xFFFF;
+    for (size_t i = 0; i < length; i++) {
+        crc ^= (uint16_t)data[i] << 8;
+        for (int bit = 0; bit < 8; bit++) {
+            crc = (crc & 0x8000) ? (crc << 1) ^ 0x1021 : crc << 1;
+        }
+    }
+    return crc;
+}
+
+static void sendFrame(uint8_t type, uint16_t sequence, const uint8_t* payload, size_t length) {
+    uint8_t frame[FRAME_MAX_PAYLOAD + 7];
+    if (length > FRAME_MAX_PAYLOAD) {
+        length = FRAME_MAX_PAYLOAD;
+    }
+    frame[0] = FRAME_SYNC;
+    frame[1] = length;
+    frame[2] = type;
+    frame[3] = sequence & 0xFF;
+    frame[4] = sequence >> 8;
+    memcpy(frame + 5, payload, length);
+    uint16_t crc = crc16(frame + 1, length + 4);
+    frame[5 + length] = crc & 0xFF;
+    frame[6 + length] = crc >> 8;
+    Serial.write(frame, length + 7);
+}
+
 void reportCycle(int station, boolean enabled, unsigned long cycles, int failures, float keyswitchCurrent, float starterCurrent) {
+    uint16_t sequence = nextStationSequence(station);
+    if (binaryTelemetry) {
+        CycleFrame frame = {(uint8_t)station, (uint8_t)(enabled ? 1 : 0), (uint32_t)cycles, (uint32_t)failures,
+                            keyswitchCurrent, starterCurrent};
+        sendFrame(FRAME_CYCLE, sequence, (const uint8_t*)&frame, sizeof(frame));
+        return;
+    }
     Serial.print("CYCLE:");
     Serial.print(station);
     Serial.print(":");
@@ -17,27 +118,49 @@ void reportCycle(int station, boolean enabled, unsigned long cycles, int failure
     Serial.print(":");
     Serial.print(keyswitchCurrent);
     Serial.print(":");
-    Serial.println(starterCurrent);
+    Serial.print(starterCurrent);
+    endLine(sequence);
 }
 
 void reportEvent(const String& message) {
+    uint16_t sequence = systemSequence++;
+    if (binaryTelemetry) {
+        sendFrame(FRAME_EVENT, sequence, (const uint8_t*)message.c_str(), message.length());
+        return;
+    }
     Serial.print("EVENT:");
-    Serial.println(message);
+    Serial.print(message);
+    endLine(sequence);
 }
 
 void reportSystemState() {
+    uint16_t sequence = systemSequence++;
+    if (binaryTelemetry) {
+        uint8_t running = isSystemRunning() ? 1 : 0;
+        sendFrame(FRAME_SYSTEM_STATE, sequence, &running, sizeof(running));
+        return;
+    }
     String stateData = "SYSTEM_STATE:";
     stateData += String(isSystemRunning() ? 1 : 0);
-    Serial.println(stateData);
+    Serial.print(stateData);
+    endLine(sequence);
 }
 
 void reportStationState(int station) {
+    uint16_t sequence = nextStationSequence(station);
+    if (binaryTelemetry) {
+        StationFrame frame = {(uint8_t)station, (uint8_t)(isStationEnabled(station) ? 1 : 0),
+                              (uint32_t)getStationCycles(station), (uint32_t)getStationFailures(station)};
+        sendFrame(FRAME_STATION, sequence, (const uint8_t*)&frame, sizeof(frame));
+        return;
+    }
     String stateData = "STATION:";
     stateData += String(station) + ":" + 
                  String(isStationEnabled(station) ? 1 : 0) + ":" + 
                  String(getStationCycles(station)) + ":" + 
                  String(getStationFailures(station));
-    Serial.println(stateData);
+    Serial.print(stateData);
+    endLine(sequence);
 }
 
 void reportStationStates() {
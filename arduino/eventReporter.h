@@ -6,4 +6,8 @@ void reportCycle(int station, boolean enabled, unsigned long cycles, int failure
 void reportEvent(const String& message);
 void reportSystemState();
 void reportStationState(int station);
-void reportStationStates();
\ No newline at end of file
+void reportStationStates();
+void setBinaryTelemetry(bool enabled);
+bool isBinaryTelemetry();
+void setSequenceNumbers(bool enabled);
+bool isSequenceNumbers();
\ No newline at end of file
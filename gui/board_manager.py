@@ -0,0 +1,268 @@
+import threading
+from serial_communication import SerialManager
+from command_queue import CommandQueue
+from sequence import SequenceTracker, SYSTEM_STREAM
+from constants import (STATIONS_PER_BOARD, SERIAL_BINARY_TELEMETRY, SERIAL_SEQUENCE_NUMBERS,
+                       RECONNECT_INITIAL_DELAY, RECONNECT_MAX_DELAY)
+
+class Board:
+    """One OpenRB board: its connection, reader thread and command pipeline"""
+    def __init__(self, index, port):
+        self.index = index
+        self.port = port
+        self.serial_manager = SerialManager()
+        self.command_queue = CommandQueue(self.serial_manager)
+        
+        # Gap detection and the stations with a resync in flight
+        self.sequence = SequenceTracker()
+        self.resyncing = set()
+        self.resyncs = 0
+        
+        # Background reconnection after the port is lost
+        self.reconnecting = False
+        self.reconnects = 0
+        self.cancelled = False
+        self.wake = threading.Event()
+    
+    @property
+    def connected(self):
+        return self.serial_manager.serial_port is not None
+    
+    @property
+    def first_station(self):
+        """Global 0-based index of this board's station 0"""
+        return self.index * STATIONS_PER_BOARD
+
+class BoardManager:
+    """Connects to any number of OpenRB boards and maps their stations into one namespace
+    
+    Global station indices are board_index * STATIONS_PER_BOARD + local index,
+    so board 0 keeps stations 0-3, board 1 gets 4-7 and so on. Each board has
+    its own reader thread; on_lines(board_index, lines) and on_lost(board_index)
+    are called from those threads. port_source, if set, returns the currently
+    attached OpenRB ports and lets a lost board come back on a new device name.
+    """
+    def __init__(self, on_lines=None, on_lost=None, port_source=None):
+        self.on_lines = on_lines
+        self.on_lost = on_lost
+        self.port_source = port_source
+        self.boards = []
+    
+    @staticmethod
+    def discover():
+        """Return the ports of all attached OpenRB boards"""
+        return SerialManager().get_openrb_ports()
+    
+    def connect(self, ports):
+        """Open every port in parallel and start its reader; returns {port: connected}"""
+        self.disconnect()
+        boards = [Board(index, port) for index, port in enumerate(ports)]
+        results = {}
+        
+        def open_board(board):
+            results[board.port] = board.serial_manager.connect(board.port)
+        
+        # Each connect sleeps SERIAL_SETTLE_TIME, so open them concurrently
+        threads = [threading.Thread(target=open_board, args=(board,), daemon=True) for board in boards]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        # Keep the namespace dense: board indices follow the successfully opened ports
+        self.boards = []
+        for board in boards:
+            if results.get(board.port):
+                board.index = len(self.boards)
+                self.boards.append(board)
+                self._start_board(board)
+        return results
+    
+    def _start_board(self, board):
+        index = board.index
+        on_lines = self.on_lines
+        on_lost = self.on_lost
+        board.serial_manager.start_reader(
+            (lambda lines: on_lines(index, lines)) if on_lines else (lambda lines: None),
+            (lambda: on_lost(index)) if on_lost else None
+        )
+        board.command_queue.start()
+        board.sequence.reset()
+        board.resyncing.clear()
+        if SERIAL_BINARY_TELEMETRY:
+            self._negotiate_binary(board)
+        if SERIAL_SEQUENCE_NUMBERS:
+            board.command_queue.submit("SEQUENCE", 1)
+    
+    def _negotiate_binary(self, board):
+        """Ask the board for binary telemetry; it stays on ASCII if the firmware refuses"""
+        serial_manager = board.serial_manager
+        serial_manager.request_binary()
+        board.command_queue.submit("BINARY", 1,
+                                   lambda result: result.ok or serial_manager.request_binary(False))
+    
+    def disconnect(self):
+        """Stop every board's command pipeline and reader and close its port"""
+        for board in self.boards:
+            board.cancelled = True
+            board.wake.set()
+            board.command_queue.stop()
+            board.serial_manager.disconnect()
+        self.boards = []
+    
+    def disconnect_board(self, index):
+        """Close one board's port (its stations stay in the namespace)"""
+        board = self.boards[index]
+        board.command_queue.stop()
+        board.serial_manager.disconnect()
+    
+    def reconnect(self, index, on_reconnected=None):
+        """Reopen a lost board in the background, retrying with exponential backoff
+        
+        on_reconnected(board_index) is called from the retry thread once the
+        board is back; it keeps its index and stations.
+        """
+        board = self.boards[index]
+        if board.reconnecting or board.connected:
+            return
+        board.reconnecting = True
+        board.wake.clear()
+        threading.Thread(target=self._reconnect_loop, args=(board, on_reconnected),
+                         name=f"Reconnect B{index + 1}", daemon=True).start()
+    
+    def ports_changed(self):
+        """Retry reconnecting boards now rather than at their next backoff step"""
+        for board in self.boards:
+            if board.reconnecting:
+                board.wake.set()
+    
+    def _reconnect_loop(self, board, on_reconnected):
+        delay = RECONNECT_INITIAL_DELAY
+        while True:
+            board.wake.wait(delay)
+            board.wake.clear()
+            if board.cancelled:
+                return
+            for port in self._reconnect_candidates(board):
+                if not board.serial_manager.connect(port):
+                    continue
+                if board.cancelled:
+                    board.serial_manager.disconnect()
+                    return
+                board.port = port
+                board.reconnecting = False
+                board.reconnects += 1
+                self._start_board(board)
+                if on_reconnected:
+                    on_reconnected(board.index)
+                return
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
+    
+    def _reconnect_candidates(self, board):
+        """The board's last port first, then attached OpenRB ports no other board is using"""
+        candidates = [board.port]
+        if self.port_source:
+            in_use = {other.port for other in self.boards if other is not board and other.connected}
+            candidates += [port for port in self.port_source() if port != board.port and port not in in_use]
+        return candidates
+    
+    @property
+    def connected(self):
+        """True if at least one board is connected"""
+        return any(board.connected for board in self.boards)
+    
+    @property
+    def station_count(self):
+        """Number of stations in the global namespace"""
+        return len(self.boards) * STATIONS_PER_BOARD
+    
+    def locate(self, station):
+        """Map a global 0-based station index to (board, local station index)"""
+        board_index, local = divmod(station, STATIONS_PER_BOARD)
+        if station < 0 or board_index >= len(self.boards):
+            raise ValueError(f"Invalid station index: {station}")
+        return self.boards[board_index], local
+    
+    def submit(self, name, station=None, on_done=None, board_index=None):
+        """Send a command; station commands are routed by global station index
+        
+        Commands without a station go to board_index, or to every board when
+        board_index is None. Returns a list of (board index, Command) pairs.
+        """
+        if station is not None:
+            board, local = self.locate(station)
+            return [(board.index, board.command_queue.submit(name, local, on_done))]
+        
+        boards = self.boards if board_index is None else [self.boards[board_index]]
+        return [(board.index, board.command_queue.submit(name, None, on_done)) for board in boards if board.connected]
+    
+    def observe(self, board_index, message):
+        """Feed a parsed message to the board it came from
+        
+        Returns (global station, missing) if its sequence number shows that
+        messages were lost, with station None for the system stream, else None.
+        A lost station message triggers a REQUEST_STATION for just that station.
+        """
+        board = self.boards[board_index]
+        board.command_queue.observe(message)
+        
+        gap = board.sequence.check(message)
+        if gap is None:
+            return None
+        stream, missing = gap
+        if stream is SYSTEM_STREAM or not 0 <= stream < STATIONS_PER_BOARD:
+            return None, missing
+        self._resync_station(board, stream)
+        return board.first_station + stream, missing
+    
+    def _resync_station(self, board, station):
+        """Re-request one station's state unless a request is already in flight"""
+        if station in board.resyncing or not board.connected:
+            return
+        board.resyncing.add(station)
+        board.resyncs += 1
+        board.command_queue.submit("REQUEST_STATION", station, lambda result: board.resyncing.discard(station))
+    
+    def link_stats(self):
+        """Per-board connection state, telemetry format, byte, decoder and drop counters"""
+        stats = []
+        for board in self.boards:
+            entry = {"board": board.index, "port": board.port, "connected": board.connected,
+                     "resyncs": board.resyncs, "reconnects": board.reconnects}
+            entry.update(board.serial_manager.telemetry_stats())
+            entry.update(board.sequence.stats())
+            stats.append(entry)
+        return stats
+    
+    def pending_count(self):
+        return sum(board.command_queue.pending_count() for board in self.boards)
+    
+    def command_stats(self):
+        """Command statistics summed over all boards"""
+        merged = {}
+        for board in self.boards:
+            for name, stats in board.command_queue.stats().items():
+                total = merged.setdefault(name, {"sent": 0, "acknowledged": 0, "refused": 0, "timeouts": 0,
+                                                 "write_failures": 0, "max_latency": None, "last_latency": None,
+                                                 "_latency_sum": 0.0})
+                for key in ("sent", "acknowledged", "refused", "timeouts", "write_failures"):
+                    total[key] += stats[key]
+                if stats["mean_latency"] is not None:
+                    total["_latency_sum"] += stats["mean_latency"] * stats["acknowledged"]
+                if stats["max_latency"] is not None and (total["max_latency"] is None
+                                                         or stats["max_latency"] > total["max_latency"]):
+                    total["max_latency"] = stats["max_latency"]
+                if stats["last_latency"] is not None:
+                    total["last_latency"] = stats["last_latency"]
+        for total in merged.values():
+            latency_sum = total.pop("_latency_sum")
+            total["mean_latency"] = latency_sum / total["acknowledged"] if total["acknowledged"] else None
+        return merged
+
+def format_link_stats(stats):
+    """One line per board from BoardManager.link_stats()"""
+    return "\n".join(
+        f"Board {entry['board'] + 1} {entry['format']}: dropped={entry['dropped']} gaps={entry['gaps']} "
+        f"resyncs={entry['resyncs']} resets={entry['resets']} crc_errors={entry['crc_errors']} "
+        f"skipped_bytes={entry['skipped_bytes']}"
+        for entry in stats)
@@ -0,0 +1,281 @@
+import queue
+import threading
+import time
+from collections import namedtuple
+from messages import CycleMessage, StationMessage, SystemStateMessage, EventMessage
+from telemetry import BINARY_ENABLED_EVENT, BINARY_DISABLED_EVENT
+from constants import COMMAND_TIMEOUTS, COMMAND_DEFAULT_TIMEOUT, COMMAND_POLL_INTERVAL
+
+# Outcome passed to a command's on_done callback. latency is seconds from
+# write to acknowledgement (None if the command never got that far).
+CommandResult = namedtuple("CommandResult", "command ok latency reason")
+
+class Command:
+    """A command sent to the board and the state needed to match its response"""
+    __slots__ = ("name", "arg", "timeout", "on_done", "created", "sent_at", "progress")
+    
+    def __init__(self, name, arg=None, timeout=None, on_done=None):
+        self.name = name
+        self.arg = arg
+        self.timeout = timeout if timeout is not None else COMMAND_TIMEOUTS.get(name, COMMAND_DEFAULT_TIMEOUT)
+        self.on_done = on_done
+        self.created = time.monotonic()
+        self.sent_at = None
+        self.progress = None
+    
+    @property
+    def text(self):
+        """Command as sent on the wire, without the newline"""
+        return self.name if self.arg is None else f"{self.name}:{self.arg}"
+    
+    def encode(self):
+        return f"{self.text}\n".encode()
+
+# Response matchers: return True (acknowledged), False (refused by the board)
+# or None (message is unrelated). Event texts come from the firmware sources.
+
+def _match_start(command, message):
+    if isinstance(message, SystemStateMessage) and message.running:
+        return True
+    if isinstance(message, EventMessage):
+        if message.text == "System is already running.":
+            return True
+        if message.text.startswith("Unable to start system"):
+            return False
+    return None
+
+def _match_stop(command, message):
+    if isinstance(message, SystemStateMessage) and not message.running:
+        return True
+    if isinstance(message, EventMessage) and message.text == "System is already stopped.":
+        return True
+    return None
+
+def _match_enable(command, message):
+    return _match_station_enabled(command, message, True)
+
+def _match_disable(command, message):
+    return _match_station_enabled(command, message, False)
+
+def _match_station_enabled(command, message, enabled):
+    if isinstance(message, StationMessage) and message.station == command.arg and message.enabled == enabled:
+        return True
+    if isinstance(message, EventMessage):
+        if message.text == f"Station {command.arg} is already {'enabled' if enabled else 'disabled'}":
+            return True
+        if message.text == f"Invalid station index: {command.arg}":
+            return False
+    return None
+
+def _match_reset_cycle(command, message):
+    if isinstance(message, StationMessage) and message.station == command.arg and message.cycles == 0:
+        return True
+    if isinstance(message, EventMessage) and message.text == f"Reset cycle count for station {command.arg}":
+        return True
+    return None
+
+def _match_reset_fail(command, message):
+    if isinstance(message, StationMessage) and message.station == command.arg and message.failures == 0:
+        return True
+    if isinstance(message, EventMessage) and message.text == f"Reset failure count for station {command.arg}":
+        return True
+    return None
+
+def _match_request_state(command, message):
+    # The reply is SYSTEM_STATE followed by STATION:0..n. The firmware also
+    # repeats SYSTEM_STATE while stopped, so wait for the STATION:0 that follows it.
+    if isinstance(message, SystemStateMessage):
+        command.progress = True
+    elif isinstance(message, StationMessage) and command.progress and message.station == 0:
+        return True
+    elif not isinstance(message, CycleMessage):
+        command.progress = None
+    return None
+
+def _match_request_station(command, message):
+    if isinstance(message, StationMessage) and message.station == command.arg:
+        return True
+    if isinstance(message, EventMessage) and message.text == f"Invalid station index: {command.arg}":
+        return False
+    return None
+
+def _match_sequence(command, message):
+    if isinstance(message, EventMessage):
+        if message.text == f"Sequence numbers {'enabled' if command.arg else 'disabled'}":
+            return True
+    return None
+
+def _match_binary(command, message):
+    # Firmware without binary support refuses through the unrecognized-command event
+    if isinstance(message, EventMessage):
+        if message.text == (BINARY_ENABLED_EVENT if command.arg else BINARY_DISABLED_EVENT):
+            return True
+    return None
+
+_MATCHERS = {
+    "START": _match_start,
+    "STOP": _match_stop,
+    "ENABLE": _match_enable,
+    "DISABLE": _match_disable,
+    "RESET_CYCLE": _match_reset_cycle,
+    "RESET_FAIL": _match_reset_fail,
+    "REQUEST_STATE": _match_request_state,
+    "REQUEST_STATION": _match_request_station,
+    "SEQUENCE": _match_sequence,
+    "BINARY": _match_binary,
+}
+
+class CommandQueue:
+    """Sends commands from a worker thread and matches them to the board's responses
+    
+    submit() returns immediately. The worker writes the command (retrying
+    failed writes), then the command stays in flight until observe() sees a
+    matching SYSTEM_STATE/STATION/EVENT message or its timeout expires.
+    on_done is called with a CommandResult from whichever thread completes
+    the command, so GUI callers should forward it through a queued signal.
+    """
+    _STOP = object()
+    
+    def __init__(self, serial_manager, write_retries=3, retry_delay=0.1):
+        self.serial_manager = serial_manager
+        self.write_retries = write_retries
+        self.retry_delay = retry_delay
+        
+        self._outgoing = queue.Queue()
+        self._in_flight = []
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._thread = None
+    
+    def start(self):
+        """Start the worker thread"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="CommandQueue", daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        """Stop the worker thread; in-flight commands are abandoned"""
+        thread = self._thread
+        if thread is None:
+            return
+        self._thread = None
+        self._outgoing.put(self._STOP)
+        thread.join(COMMAND_POLL_INTERVAL * 10)
+    
+    def submit(self, name, arg=None, on_done=None, timeout=None):
+        """Queue a command for sending and return its Command object"""
+        if name not in _MATCHERS:
+            raise ValueError(f"Unknown command: {name}")
+        command = Command(name, arg, timeout, on_done)
+        self._outgoing.put(command)
+        return command
+    
+    def observe(self, message):
+        """Feed a parsed message from the board; completes any commands it acknowledges"""
+        if not self._in_flight:
+            return
+        
+        completed = []
+        with self._lock:
+            for command in self._in_flight:
+                if isinstance(message, EventMessage) and message.text == f"Error: Unrecognized command - {command.text}":
+                    completed.append((command, False, message.text))
+                    continue
+                result = _MATCHERS[command.name](command, message)
+                if result is not None:
+                    reason = None if result else (message.text if isinstance(message, EventMessage) else "refused")
+                    completed.append((command, result, reason))
+            if completed:
+                done = {id(command) for command, _, _ in completed}
+                self._in_flight = [c for c in self._in_flight if id(c) not in done]
+        
+        now = time.monotonic()
+        for command, ok, reason in completed:
+            self._finish(command, ok, now - command.sent_at, reason)
+    
+    def pending_count(self):
+        """Number of commands queued or waiting for a response"""
+        return self._outgoing.qsize() + len(self._in_flight)
+    
+    def stats(self):
+        """Per-command counts and acknowledgement latency (seconds)"""
+        with self._lock:
+            stats = {name: dict(values) for name, values in self._stats.items()}
+        for values in stats.values():
+            total = values.pop("total_latency")
+            acked = values["acknowledged"]
+            values["mean_latency"] = total / acked if acked else None
+        return stats
+    
+    def _run(self):
+        """Worker thread body: write queued commands and expire ones that time out"""
+        while True:
+            try:
+                command = self._outgoing.get(timeout=COMMAND_POLL_INTERVAL)
+            except queue.Empty:
+                command = None
+            
+            if command is self._STOP:
+                return
+            if command is not None:
+                self._send(command)
+            self._expire()
+    
+    def _send(self, command):
+        """Write a command, retrying on failure, and put it in flight"""
+        data = command.encode()
+        for attempt in range(self.write_retries):
+            if attempt:
+                time.sleep(self.retry_delay)
+            
+            # Put it in flight before writing so a fast reply can't be missed
+            command.sent_at = time.monotonic()
+            with self._lock:
+                self._in_flight.append(command)
+            if self.serial_manager.write(data):
+                return
+            with self._lock:
+                # A stale reply may already have completed it; then there is nothing to retry
+                if command not in self._in_flight:
+                    return
+                self._in_flight.remove(command)
+        
+        self._finish(command, False, None, "write failed")
+    
+    def _expire(self):
+        """Fail commands that have waited longer than their timeout"""
+        if not self._in_flight:
+            return
+        now = time.monotonic()
+        with self._lock:
+            expired = [c for c in self._in_flight if now - c.sent_at > c.timeout]
+            if expired:
+                self._in_flight = [c for c in self._in_flight if now - c.sent_at <= c.timeout]
+        for command in expired:
+            self._finish(command, False, None, f"no response within {command.timeout:.1f} s")
+    
+    def _finish(self, command, ok, latency, reason):
+        """Record statistics and notify the submitter"""
+        with self._lock:
+            stats = self._stats.setdefault(command.name, {
+                "sent": 0, "acknowledged": 0, "refused": 0, "timeouts": 0, "write_failures": 0,
+                "total_latency": 0.0, "max_latency": None, "last_latency": None,
+            })
+            stats["sent"] += 1
+            if latency is not None:
+                if ok:
+                    stats["acknowledged"] += 1
+                    stats["total_latency"] += latency
+                    stats["last_latency"] = latency
+                    if stats["max_latency"] is None or latency > stats["max_latency"]:
+                        stats["max_latency"] = latency
+                else:
+                    stats["refused"] += 1
+            elif reason == "write failed":
+                stats["write_failures"] += 1
+            else:
+                stats["timeouts"] += 1
+        
+        if command.on_done:
+            command.on_done(CommandResult(command, ok, latency, reason))
@@ -1,13 +1,93 @@
+import os
+
 # Serial communication settings
 SERIAL_BAUDRATE = 115200
 SERIAL_TIMEOUT = 0.1
-SERIAL_CHECK_INTERVAL = 100  # ms
+SERIAL_MAX_LINE_LENGTH = 4096  # bytes buffered before a partial line is discarded
+SERIAL_SETTLE_TIME = 0.5  # s to wait after opening the port
+SERIAL_BINARY_TELEMETRY = True  # ask boards for binary frames on connect (ASCII if unsupported)
+SERIAL_SEQUENCE_NUMBERS = True  # ask boards to number ASCII lines for gap detection
+
+# Port discovery and reconnection settings
+PORT_WATCH_INTERVAL = 1.0  # s between checks for attached/removed USB serial devices
+RECONNECT_INITIAL_DELAY = 0.5  # s before the first attempt to reopen a lost board
+RECONNECT_MAX_DELAY = 30.0  # s; the retry delay doubles up to this
+
+# Board settings
+STATIONS_PER_BOARD = 4  # matches STATION_COUNT in arduino/config.h
+
+# Command settings
+COMMAND_DEFAULT_TIMEOUT = 2.0  # s to wait for the board to acknowledge a command
+COMMAND_TIMEOUTS = {
+    "REQUEST_STATE": 3.0,
+}
+COMMAND_POLL_INTERVAL = 0.05  # s between timeout checks in the command worker
 
 # GUI settings
 WINDOW_TITLE = "Keyswitch Tester"
 WINDOW_MIN_WIDTH = 800
 WINDOW_MIN_HEIGHT = 250
 
+# Log view settings
+LOG_VIEW_MAX_LINES = 2000  # oldest lines are dropped beyond this
+LOG_VIEW_REFRESH_INTERVAL = 50  # ms between batched display updates
+
+# Station display settings
+STATION_REFRESH_INTERVAL = 66  # ms; caps station repaints at ~15 Hz
+
+# Latency diagnostics settings
+DIAGNOSTICS_REFRESH_INTERVAL = 1000  # ms between diagnostics table updates
+LATENCY_PROBE_INTERVAL = 10000  # ms between REQUEST_STATE round-trip probes
+
+# Metrics endpoint settings (enabled with --metrics-port)
+METRICS_HOST = "127.0.0.1"  # bind address; "0.0.0.0" lets other hosts scrape the rig
+METRICS_UPDATE_INTERVAL = 1000  # ms between link counter, rate, queue depth and event-loop lag updates
+
+# Live state server settings (enabled with --live-port)
+LIVE_STATE_HOST = "0.0.0.0"  # read-only, so reachable from other hosts by default; "127.0.0.1" keeps it local
+LIVE_STATE_HISTORY = 1024  # change events kept for viewers that fall behind or reconnect
+LIVE_STATE_KEEPALIVE = 15.0  # s between keepalive comments on an idle event stream
+
+# Separate I/O process settings (enabled with --io-process)
+IO_RING_BYTES = 4 * 1024 * 1024  # shared-memory ring of parsed records (~100k messages)
+IO_RING_WAIT = 0.2  # s the GUI's ring reader waits for data before checking for shutdown
+IO_STATS_INTERVAL = 1.0  # s between link, command and log writer statistics sent to the GUI
+IO_START_TIMEOUT = 30.0  # s to wait for the I/O process to open the log and report ready
+IO_STOP_TIMEOUT = 10.0  # s to wait for it to flush the log and cycle store on exit
+
+# Current trend plot settings
+TREND_CAPACITY = 262144  # cycles kept per station (2 MB of float32 keyswitch + starter current)
+TREND_REFRESH_INTERVAL = 1000  # ms between trend plot redraws while shown
+TREND_DECIMATION = "minmax"  # "minmax" (fastest) or "lttb" (smoother shape, slower)
+TREND_COLORS = ("#2196F3", "#4CAF50", "#f44336", "#FFB71B", "#9C27B0", "#00BCD4", "#795548", "#607D8B")
+
+# Drift detection settings
+KEYSWITCH_CURRENT_THRESHOLD = 5.0  # A; matches arduino/config.h (a cycle below this fails)
+STARTER_CURRENT_THRESHOLD = 20.0  # A; matches arduino/config.h
+DRIFT_CHECK_INTERVAL = 1000  # ms between passes over newly recorded cycles
+DRIFT_BASELINE_CYCLES = 200  # first cycles of a switch used as its reference mean/std
+DRIFT_WINDOW = 100  # cycles in the rolling mean/std
+DRIFT_EWMA_ALPHA = 0.02  # EWMA smoothing factor (~50-cycle memory)
+DRIFT_CUSUM_K = 1.0  # CUSUM allowance, in baseline standard deviations (half the smallest shift of interest)
+DRIFT_CUSUM_H = 10.0  # CUSUM decision interval, in baseline standard deviations (false alarms ~1 in 10^9 cycles)
+DRIFT_MARGIN = 0.15  # warn when the EWMA comes within this fraction of the failure threshold
+DRIFT_NOISE_RATIO = 3.0  # warn when the rolling std exceeds the baseline std by this factor
+DRIFT_MIN_STD = 0.02  # A; floor for the baseline std so very stable readings don't alarm on noise
+
+# Log file settings
+LOGS_DIR = (os.environ.get("KEYSWITCH_LOGS_DIR") or
+            os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "logs"))
+LOG_QUEUE_SIZE = 10000  # lines buffered for the writer thread before dropping
+LOG_FLUSH_INTERVAL = 0.5  # s between group commits
+LOG_FLUSH_LINES = 500  # flush early once this many lines are pending
+LOG_ROTATE_BYTES = 64 * 1024 * 1024  # start a new file past this size
+LOG_ROTATE_SECONDS = 24 * 60 * 60  # start a new file after this long
+
+# Cycle record store settings
+CYCLE_STORE_FLUSH_INTERVAL = 1.0  # s between batched writes
+CYCLE_STORE_FLUSH_RECORDS = 256  # write early once this many records are buffered
+CYCLE_STORE_FSYNC_INTERVAL = 10.0  # s between fsyncs (bounds data lost on power failure)
+
 # Colors
 COLOR_PRIMARY = "#2196F3"    # Blue
 COLOR_SUCCESS = "#4CAF50"    # Green
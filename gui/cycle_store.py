@@ -0,0 +1,185 @@
+import os
+import struct
+import threading
+import time
+from constants import CYCLE_STORE_FLUSH_INTERVAL, CYCLE_STORE_FSYNC_INTERVAL, CYCLE_STORE_FLUSH_RECORDS
+
+# File layout: one header followed by fixed-width little-endian records
+FILE_MAGIC = b"KSCY"
+FILE_VERSION = 1
+HEADER = struct.Struct("<4sHHd")  # magic, version, record size, created (epoch seconds)
+RECORD = struct.Struct("<dHHIIff")  # timestamp, station, enabled, cycles, failures, keyswitch A, starter A
+
+# Equivalent NumPy dtype, so a store can be mapped with
+# numpy.memmap(path, dtype=RECORD_DTYPE, mode='r', offset=HEADER.size)
+RECORD_DTYPE = [
+    ("timestamp", "<f8"),
+    ("station", "<u2"),
+    ("enabled", "<u2"),
+    ("cycles", "<u4"),
+    ("failures", "<u4"),
+    ("keyswitch_current", "<f4"),
+    ("starter_current", "<f4"),
+]
+
+class CycleStore:
+    """Append-only binary store of CYCLE records for one session
+    
+    append() only packs the record into an in-memory buffer; a background
+    thread writes the buffer out in batches and fsyncs periodically, so a
+    crash loses at most CYCLE_STORE_FSYNC_INTERVAL seconds of records. If a
+    write fails (a full disk) the records stay buffered and are retried on
+    the next flush; the error is counted and reported through take_errors().
+    """
+    def __init__(self, path, flush_interval=CYCLE_STORE_FLUSH_INTERVAL,
+                 fsync_interval=CYCLE_STORE_FSYNC_INTERVAL, flush_records=CYCLE_STORE_FLUSH_RECORDS):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.flush_bytes = flush_records * RECORD.size
+        self.records = 0
+        self.write_errors = 0
+        
+        self._fd = None
+        self._buffer = bytearray()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._errors = []
+        self._failing = False
+    
+    def open(self):
+        """Create the store file, write the header and start the flush thread"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        os.write(self._fd, HEADER.pack(FILE_MAGIC, FILE_VERSION, RECORD.size, time.time()))
+        os.fsync(self._fd)
+        
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="CycleStore", daemon=True)
+        self._thread.start()
+        return self.path
+    
+    def append(self, timestamp, station, enabled, cycles, failures, keyswitch_current, starter_current):
+        """Buffer one cycle record; returns False if the values do not fit the record format"""
+        try:
+            record = RECORD.pack(timestamp, station, 1 if enabled else 0, cycles, failures,
+                                 keyswitch_current, starter_current)
+        except struct.error:
+            return False
+        with self._lock:
+            self._buffer += record
+            full = len(self._buffer) >= self.flush_bytes
+        self.records += 1
+        if full:
+            self._wake.set()
+        return True
+    
+    def take_errors(self):
+        """Return and clear error messages reported by the flush thread"""
+        with self._lock:
+            errors, self._errors = self._errors, []
+        return errors
+    
+    def close(self):
+        """Write out everything buffered, fsync and close the file"""
+        thread = self._thread
+        if thread is None:
+            return
+        self._thread = None
+        self._stop.set()
+        self._wake.set()
+        thread.join()
+        
+        self._write_pending()
+        try:
+            os.fsync(self._fd)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+    
+    def _run(self):
+        """Flush thread body: write batches, fsync on a slower cadence"""
+        last_fsync = time.monotonic()
+        dirty = False
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            
+            dirty = self._write_pending() or dirty
+            now = time.monotonic()
+            if dirty and now - last_fsync >= self.fsync_interval:
+                try:
+                    os.fsync(self._fd)
+                except OSError:
+                    pass
+                last_fsync = now
+                dirty = False
+    
+    def _write_pending(self):
+        """Write the buffered records with one system call; returns True if anything was written"""
+        with self._lock:
+            if not self._buffer:
+                return False
+            data, self._buffer = self._buffer, bytearray()
+        view = memoryview(data)
+        try:
+            while view:
+                written = os.write(self._fd, view)
+                view = view[written:]
+        except OSError as e:
+            # Keep what was not written in front of anything appended since, to retry on the next flush
+            with self._lock:
+                self._buffer[:0] = view
+                self.write_errors += 1
+                if not self._failing:
+                    self._errors.append(f"Failed to write to cycle store: {str(e)} (records kept in memory, retrying)")
+                self._failing = True
+            return len(view) < len(data)
+        if self._failing:
+            with self._lock:
+                self._errors.append("Cycle store writes resumed")
+                self._failing = False
+        return True
+
+def read_header(path):
+    """Return (version, record_size, created) for a store, raising ValueError if it is not one"""
+    with open(path, 'rb') as f:
+        header = f.read(HEADER.size)
+    if len(header) < HEADER.size:
+        raise ValueError(f"{path} is too short to be a cycle store")
+    magic, version, record_size, created = HEADER.unpack(header)
+    if magic != FILE_MAGIC:
+        raise ValueError(f"{path} is not a cycle store")
+    if record_size != RECORD.size:
+        raise ValueError(f"{path} uses unsupported record size {record_size}")
+    return version, record_size, created
+
+def record_count(path):
+    """Number of complete records in a store (a torn trailing record is ignored)"""
+    return max(0, os.path.getsize(path) - HEADER.size) // RECORD.size
+
+def iter_records(path, chunk_records=4096):
+    """Yield record tuples from a store without loading it into memory"""
+    read_header(path)
+    count = record_count(path)
+    with open(path, 'rb') as f:
+        f.seek(HEADER.size)
+        while count > 0:
+            n = min(count, chunk_records)
+            chunk = f.read(n * RECORD.size)
+            n = len(chunk) // RECORD.size
+            if n == 0:
+                break
+            yield from RECORD.iter_unpack(chunk[:n * RECORD.size])
+            count -= n
+
+def load_records(path):
+    """Memory-map a store as a NumPy structured array (requires numpy)"""
+    import numpy as np
+    read_header(path)
+    count = record_count(path)
+    if count == 0:
+        return np.zeros(0, dtype=RECORD_DTYPE)
+    return np.memmap(path, dtype=RECORD_DTYPE, mode='r', offset=HEADER.size, shape=(count,))
@@ -0,0 +1,264 @@
+"""Host-side detection of switches drifting toward failure (no Qt dependency)
+
+The firmware only fails a cycle once its peak current drops below a fixed
+threshold. For each station's keyswitch and starter current this tracks an
+EWMA, a rolling mean/std and a one-sided CUSUM against the switch's own
+baseline (its first DRIFT_BASELINE_CYCLES cycles), and raises an alert when
+
+- shift: the CUSUM detects a sustained drop of the mean below the baseline,
+- margin: the EWMA comes within DRIFT_MARGIN of the firmware threshold,
+- noise: the rolling std grows to DRIFT_NOISE_RATIO times the baseline std.
+
+The statistics are computed with whole-array NumPy operations over however
+many new cycles there are, carrying the running state between calls, so
+feeding a session cycle by cycle, in batches, or all at once gives the same
+results. Each alert is raised once per switch until reset().
+"""
+import math
+from collections import namedtuple
+import numpy as np
+from constants import (KEYSWITCH_CURRENT_THRESHOLD, STARTER_CURRENT_THRESHOLD, DRIFT_BASELINE_CYCLES,
+                       DRIFT_WINDOW, DRIFT_EWMA_ALPHA, DRIFT_CUSUM_K, DRIFT_CUSUM_H, DRIFT_MARGIN,
+                       DRIFT_NOISE_RATIO, DRIFT_MIN_STD)
+
+DRIFT_FIELDS = ("keyswitch_current", "starter_current")
+DRIFT_THRESHOLDS = {
+    "keyswitch_current": KEYSWITCH_CURRENT_THRESHOLD,
+    "starter_current": STARTER_CURRENT_THRESHOLD,
+}
+ALERT_KINDS = ("shift", "margin", "noise")
+
+# sample is the 0-based index of the cycle (per station, in arrival order) that raised the alert
+DriftAlert = namedtuple("DriftAlert", "station field kind sample value message")
+
+def ewma(values, alpha, initial=None):
+    """Exponentially weighted moving average, continuing from `initial` (default: the first value)
+
+    Uses the closed form e[i] = b^(i+1) e0 + a b^i cumsum(x[j] b^-j) with
+    b = 1 - alpha over chunks short enough for b^-j to stay well-conditioned.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    result = np.empty_like(values)
+    if not len(values):
+        return result
+    if initial is None:
+        initial = values[0]
+
+    decay = 1.0 - alpha
+    chunk = len(values) if decay == 1.0 else max(1, min(len(values), int(18.0 / -math.log(decay))))
+    powers = decay ** np.arange(chunk)
+    inverse = 1.0 / powers
+    for start in range(0, len(values), chunk):
+        block = values[start:start + chunk]
+        n = len(block)
+        result[start:start + n] = (powers[:n] * (decay * initial) +
+                                   alpha * powers[:n] * np.cumsum(block * inverse[:n]))
+        initial = result[start + n - 1]
+    return result
+
+def cusum(increments, initial=0.0):
+    """One-sided CUSUM s[i] = max(0, s[i-1] + increments[i]), continuing from `initial`
+
+    Vectorized through the identity s[i] = D[i] - min(-initial, min(D[:i+1]))
+    where D is the cumulative sum of the increments.
+    """
+    totals = np.cumsum(np.asarray(increments, dtype=np.float64))
+    if not len(totals):
+        return totals
+    return totals - np.minimum(np.minimum.accumulate(totals), -initial)
+
+def rolling_mean_std(values, window, history=None):
+    """Mean and population std of the last `window` samples at each position
+
+    history holds the samples that came before `values` (only the last
+    window - 1 are used); positions with fewer than `window` samples
+    available are NaN.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if history is not None and len(history):
+        history = np.asarray(history, dtype=np.float64)[-(window - 1):] if window > 1 else history[:0]
+    else:
+        history = values[:0]
+    data = np.concatenate((history, values))
+    mean = np.full(len(values), np.nan)
+    std = np.full(len(values), np.nan)
+    if len(data) < window or not len(values):
+        return mean, std
+
+    # Centre the data first so the running sums don't lose precision
+    centred = data - data[0]
+    sums = np.concatenate(([0.0], np.cumsum(centred)))
+    squares = np.concatenate(([0.0], np.cumsum(centred * centred)))
+    window_sums = sums[window:] - sums[:-window]
+    window_squares = squares[window:] - squares[:-window]
+    window_mean = window_sums / window
+
+    # Window k ends at data[k + window - 1]; map it onto positions in values
+    offset = len(history)
+    first = max(0, window - 1 - offset)
+    windows = slice(first + offset - (window - 1), len(data) - window + 1)
+    mean[first:] = window_mean[windows] + data[0]
+    std[first:] = np.sqrt(np.maximum(window_squares[windows] / window - window_mean[windows] ** 2, 0.0))
+    return mean, std
+
+class _FieldState:
+    """Running state of one station's current field"""
+    __slots__ = ("samples", "baseline", "baseline_mean", "baseline_std", "ewma", "cusum",
+                 "history", "mean", "std", "alerted")
+
+    def __init__(self):
+        self.samples = 0
+        self.baseline = []  # arrays collected until DRIFT_BASELINE_CYCLES samples are in
+        self.baseline_mean = None
+        self.baseline_std = None
+        self.ewma = None
+        self.cusum = 0.0
+        self.history = np.zeros(0)
+        self.mean = math.nan
+        self.std = math.nan
+        self.alerted = set()
+
+class DriftDetector:
+    """Tracks drift statistics for every station's keyswitch and starter current
+
+    update() takes any number of new cycles for one station at once and
+    returns the alerts they raised; work per cycle is constant.
+    """
+    def __init__(self, stations, baseline=DRIFT_BASELINE_CYCLES, window=DRIFT_WINDOW, alpha=DRIFT_EWMA_ALPHA,
+                 cusum_k=DRIFT_CUSUM_K, cusum_h=DRIFT_CUSUM_H, margin=DRIFT_MARGIN,
+                 noise_ratio=DRIFT_NOISE_RATIO, thresholds=DRIFT_THRESHOLDS):
+        self.baseline = baseline
+        self.window = window
+        self.alpha = alpha
+        self.cusum_k = cusum_k
+        self.cusum_h = cusum_h
+        self.margin = margin
+        self.noise_ratio = noise_ratio
+        self.thresholds = dict(thresholds)
+        self.states = [{field: _FieldState() for field in DRIFT_FIELDS} for _ in range(stations)]
+
+    @property
+    def stations(self):
+        return len(self.states)
+
+    def reset(self, station):
+        """Forget a station's history, e.g. after its switch was replaced"""
+        self.states[station] = {field: _FieldState() for field in DRIFT_FIELDS}
+
+    def update(self, station, keyswitch_current, starter_current):
+        """Process new cycles for a 0-based station (scalars or equal-length arrays) and return new alerts"""
+        alerts = []
+        for field, values in zip(DRIFT_FIELDS, (keyswitch_current, starter_current)):
+            values = np.atleast_1d(np.asarray(values, dtype=np.float64))
+            if len(values):
+                alerts += self._update_field(station, field, self.states[station][field], values)
+        return alerts
+
+    def _update_field(self, station, field, state, values):
+        first_sample = state.samples
+        state.samples += len(values)
+
+        smoothed = ewma(values, self.alpha, state.ewma)
+        state.ewma = float(smoothed[-1])
+        means, stds = rolling_mean_std(values, self.window, state.history)
+        state.history = np.concatenate((state.history, values))[-(self.window - 1):] if self.window > 1 else values[:0]
+        if not math.isnan(means[-1]):
+            state.mean, state.std = float(means[-1]), float(stds[-1])
+
+        # Nothing is judged until the switch's own baseline is known
+        start = 0
+        if state.baseline_mean is None:
+            collected = sum(len(block) for block in state.baseline)
+            start = min(len(values), self.baseline - collected)
+            state.baseline.append(values[:start])
+            if collected + start < self.baseline:
+                return []
+            baseline = np.concatenate(state.baseline)
+            state.baseline = []
+            state.baseline_mean = float(baseline.mean())
+            state.baseline_std = max(float(baseline.std()), DRIFT_MIN_STD)
+            if start == len(values):
+                return []
+
+        judged = values[start:]
+        increments = (state.baseline_mean - judged) / state.baseline_std - self.cusum_k
+        scores = cusum(increments, state.cusum)
+        state.cusum = float(scores[-1])
+
+        threshold = self.thresholds[field]
+        conditions = {
+            "shift": scores > self.cusum_h,
+            "margin": smoothed[start:] < threshold * (1.0 + self.margin),
+            "noise": stds[start:] > self.noise_ratio * state.baseline_std,
+        }
+        alerts = []
+        for kind in ALERT_KINDS:
+            if kind in state.alerted:
+                continue
+            hits = np.flatnonzero(conditions[kind])
+            if not len(hits):
+                continue
+            index = int(hits[0])
+            state.alerted.add(kind)
+            position = start + index
+            sample = first_sample + position
+            if kind == "shift":
+                value = float(means[position]) if not math.isnan(means[position]) else float(smoothed[position])
+                message = (f"mean dropped from {state.baseline_mean:.2f} A to {value:.2f} A "
+                           f"(CUSUM {float(scores[index]):.1f} sigma)")
+            elif kind == "margin":
+                value = float(smoothed[position])
+                message = f"EWMA {value:.2f} A is within {self.margin:.0%} of the {threshold:.1f} A failure threshold"
+            else:
+                value = float(stds[position])
+                message = (f"rolling std {value:.3f} A is {value / state.baseline_std:.1f}x "
+                           f"the baseline {state.baseline_std:.3f} A")
+            alerts.append(DriftAlert(station, field, kind, sample, value, message))
+        alerts.sort(key=lambda alert: alert.sample)
+        return alerts
+
+    def summary(self, station):
+        """Current statistics of one station as {field: {...}}"""
+        return {field: {
+            "samples": state.samples,
+            "baseline_mean": state.baseline_mean,
+            "baseline_std": state.baseline_std,
+            "ewma": state.ewma,
+            "rolling_mean": None if math.isnan(state.mean) else state.mean,
+            "rolling_std": None if math.isnan(state.std) else state.std,
+            "cusum": state.cusum,
+            "alerts": sorted(state.alerted),
+        } for field, state in self.states[station].items()}
+
+def format_alert(alert, station_id=None):
+    """One log line for an alert; station_id defaults to the 1-based station number"""
+    field = alert.field.replace("_current", "")
+    station_id = station_id if station_id is not None else alert.station + 1
+    return f"WARNING: Station {station_id} {field} current drift ({alert.kind}) after {alert.sample + 1} cycles: {alert.message}"
+
+def analyse_records(records, detector=None):
+    """Batch mode: run a whole session's CYCLE records through a detector in one pass per station
+
+    records is a cycle store array (see cycle_store.load_records). Returns
+    (detector, alerts) with alerts ordered by station and cycle. Wherever a
+    station's cycle counter goes down its count was reset (a new switch), so
+    the station is reset in the detector there, as the live GUI does on
+    RESET_CYCLE.
+    """
+    stations = np.asarray(records["station"])
+    count = int(stations.max()) + 1 if len(stations) else 0
+    if detector is None:
+        detector = DriftDetector(count)
+    alerts = []
+    for station in range(min(count, detector.stations)):
+        mask = stations == station
+        if not mask.any():
+            continue
+        keyswitch = records["keyswitch_current"][mask]
+        starter = records["starter_current"][mask]
+        resets = np.flatnonzero(np.diff(np.asarray(records["cycles"][mask], dtype=np.int64)) < 0) + 1
+        for start, end in zip(np.concatenate(([0], resets)), np.concatenate((resets, [len(keyswitch)]))):
+            if start:
+                detector.reset(station)
+            alerts += detector.update(station, keyswitch[start:end], starter[start:end])
+    return detector, alerts
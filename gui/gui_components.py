@@ -1,14 +1,19 @@
 from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, 
-                             QPushButton, QLabel, QTextEdit, QFileDialog,
-                             QGridLayout, QFrame, QSlider, QCheckBox, QAbstractButton, QMessageBox)
-from PySide6.QtCore import QDateTime, Qt, Signal, Property, QRect, QSize, QPropertyAnimation, QEasingCurve
-from PySide6.QtGui import QPainter, QColor, QPen, QBrush, QFont, QPaintEvent
-import os
+                             QPushButton, QLabel, QPlainTextEdit, QFileDialog,
+                             QGridLayout, QFrame, QSlider, QCheckBox, QAbstractButton, QMessageBox,
+                             QScrollArea)
+from PySide6.QtCore import Qt, Signal, Property, QRect, QSize, QPropertyAnimation, QEasingCurve, QTimer, QPointF
+from PySide6.QtGui import QPainter, QColor, QPen, QBrush, QFont, QPaintEvent, QPolygonF
+from log_format import LogTimestamp
+from log_writer import LogWriter
+from latency import STAGE_DESCRIPTIONS
+from trends import TREND_FIELDS, DECIMATORS
 from constants import (
+    LOG_VIEW_MAX_LINES, LOG_VIEW_REFRESH_INTERVAL, LOGS_DIR, STATIONS_PER_BOARD,
+    DIAGNOSTICS_REFRESH_INTERVAL, TREND_REFRESH_INTERVAL, TREND_DECIMATION, TREND_COLORS,
     START_BUTTON_STYLE, RESET_BUTTON_STYLE, LOG_BUTTON_STYLE, 
     TOGGLE_BUTTON_STYLE, STATION_FRAME_STYLE, STATION_LABEL_STYLE,
-    COLOR_SUCCESS, COLOR_ERROR, COLOR_WARNING, COLOR_TEXT_LIGHT,
-    COLOR_TEXT_DARK, CONNECT_BUTTON_STYLE
+    COLOR_WARNING, COLOR_TEXT_DARK, CONNECT_BUTTON_STYLE
 )
 
 class ToggleSwitch(QAbstractButton):
@@ -86,8 +91,23 @@ class ToggleSwitch(QAbstractButton):
             self.clicked.emit()
 
 class SerialLogWidget(QWidget):
-    def __init__(self):
+    def __init__(self, commit_latency=None, log_writer=None):
         super().__init__()
+        self.timestamp = LogTimestamp()
+        
+        # Passed to each LogWriter to time its group commits
+        self.commit_latency = commit_latency
+        
+        # A writer owned elsewhere (the I/O process) is used instead of opening one
+        self.shared_writer = log_writer
+        
+        # Messages waiting for the next display refresh
+        self.pending_lines = []
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setSingleShot(True)
+        self.refresh_timer.setInterval(LOG_VIEW_REFRESH_INTERVAL)
+        self.refresh_timer.timeout.connect(self.flush_display)
+        
         self.setup_ui()
         self.start_auto_logging()
     
@@ -114,84 +134,101 @@ class SerialLogWidget(QWidget):
         
         layout.addLayout(header_layout)
         
-        # Text display
-        self.text_display = QTextEdit()
+        # Text display (oldest lines are dropped once the block limit is reached)
+        self.text_display = QPlainTextEdit()
         self.text_display.setReadOnly(True)
+        self.text_display.setMaximumBlockCount(LOG_VIEW_MAX_LINES)
+        self.text_display.setUndoRedoEnabled(False)
         self.text_display.setStyleSheet("background-color: white; border: 1px solid #e0e0e0; border-radius: 3px;")
         self.text_display.setMaximumHeight(160)
         layout.addWidget(self.text_display)
         
         # Initialize logging variables
-        self.log_file = None
-        self.log_file_path = None
+        self.log_writer = None
+    
+    @property
+    def log_file_path(self):
+        """Path of the log file currently being written"""
+        return self.log_writer.path if self.log_writer else None
     
-    def append_message(self, message):
-        """Append a message to the log"""
-        timestamp = QDateTime.currentDateTime().toString("yyyy-MM-dd HH:mm:ss.zzz")
-        formatted_message = f"[{timestamp}] {message}"
+    def append_message(self, message, to_file=True):
+        """Append a message to the log (to_file=False only shows it)"""
+        formatted_message = f"[{self.timestamp.now()}] {message}"
         
-        # Add to display
-        self.text_display.append(formatted_message)
+        # Queue for display; the view is updated once per refresh interval
+        self.show_line(formatted_message)
         
-        # Save to file if log file is open
-        if self.log_file:
-            try:
-                self.log_file.write(formatted_message + "\n")
-                self.log_file.flush()
-            except Exception as e:
-                self.text_display.append(f"[ERROR] Failed to write to log file: {str(e)}")
-                self.restart_auto_logging()
+        # Hand off to the writer thread; this never blocks on the disk
+        if self.log_writer and to_file:
+            self.log_writer.write(formatted_message + "\n")
     
-    def start_auto_logging(self):
-        """Automatically start logging to a file in the logs directory"""
-        logs_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "logs")
-        os.makedirs(logs_dir, exist_ok=True)
+    def show_line(self, line):
+        """Queue a line for the display without touching the document yet"""
+        pending = self.pending_lines
+        pending.append(line)
         
-        default_filename = f"keyswitch_log_{QDateTime.currentDateTime().toString('yyyyMMdd_HHmmss')}.txt"
-        file_path = os.path.join(logs_dir, default_filename)
+        # Lines beyond the view's capacity would be trimmed on insert anyway
+        if len(pending) > LOG_VIEW_MAX_LINES:
+            del pending[:len(pending) - LOG_VIEW_MAX_LINES]
         
+        if not self.refresh_timer.isActive():
+            self.refresh_timer.start()
+    
+    def flush_display(self):
+        """Apply all queued lines to the view in a single document edit"""
+        # Surface any problems the writer thread ran into
+        if self.log_writer:
+            for error in self.log_writer.take_errors():
+                self.pending_lines.append(f"[ERROR] {error}")
+        
+        if not self.pending_lines:
+            return
+        text = "\n".join(self.pending_lines)
+        self.pending_lines = []
+        self.text_display.appendPlainText(text)
+    
+    def start_auto_logging(self):
+        """Automatically start logging to a file in the logs directory"""
         try:
-            # Close existing file if open
-            if self.log_file:
-                self.log_file.close()
+            # Close existing writer if open
+            self.close_log()
             
-            # Open new log file
-            self.log_file = open(file_path, 'a')
-            self.log_file_path = file_path
+            self.log_writer = self.shared_writer or LogWriter(LOGS_DIR, commit_latency=self.commit_latency)
+            file_path = self.log_writer.open()
             
-            # Add header to log file
-            header = f"=== Keyswitch Tester Log Started at {QDateTime.currentDateTime().toString('yyyy-MM-dd HH:mm:ss')} ===\n"
-            self.log_file.write(header)
-            self.log_file.flush()
-            
-            self.text_display.append(f"[INFO] Logging to {file_path}")
+            self.show_line(f"[INFO] Logging to {file_path}")
             return True
         except Exception as e:
-            self.text_display.append(f"[ERROR] Failed to open log file: {str(e)}")
+            self.log_writer = None
+            self.show_line(f"[ERROR] Failed to open log file: {str(e)}")
             return False
     
     def restart_auto_logging(self):
         """Restart logging if there was an error"""
-        if self.log_file:
+        self.start_auto_logging()
+    
+    def close_log(self):
+        """Flush pending lines to disk and stop the writer"""
+        if self.log_writer:
             try:
-                self.log_file.close()
+                self.log_writer.close()
             except Exception:
                 pass
-            self.log_file = None
-        
-        self.start_auto_logging()
+            self.log_writer = None
     
     def clear(self):
         """Clear the log"""
+        self.pending_lines = []
         self.text_display.clear()
         
-        if self.log_file:
-            try:
-                timestamp = QDateTime.currentDateTime().toString("yyyy-MM-dd HH:mm:ss.zzz")
-                self.log_file.write(f"[{timestamp}] === Log cleared ===\n")
-                self.log_file.flush()
-            except Exception:
-                pass
+        if self.log_writer:
+            self.log_writer.write(f"[{self.timestamp.now()}] === Log cleared ===\n")
+
+# Height of one station row in pixels
+STATION_ROW_HEIGHT = 70
+
+# Value labels shown with two decimal places
+CURRENT_FIELDS = ('current', 'keyswitch_current', 'starter_current')
 
 class StationStatusWidget(QWidget):
     # Signal emitted when a station's enabled state changes
@@ -200,7 +237,7 @@ class StationStatusWidget(QWidget):
     # Signal emitted when a reset is requested
     reset_requested = Signal(int, str)  # station_id, field_type ('cycle_count' or 'failure_count')
     
-    def __init__(self):
+    def __init__(self, station_count=STATIONS_PER_BOARD):
         super().__init__()
         
         # Define column structure
@@ -222,27 +259,48 @@ class StationStatusWidget(QWidget):
         header = self._create_header()
         main_layout.addWidget(header)
         
-        # Create station rows
+        # Create station rows (scrollable once several boards are attached)
         stations_container = QWidget()
-        stations_layout = QVBoxLayout(stations_container)
-        stations_layout.setContentsMargins(0, 0, 0, 0)
-        stations_layout.setSpacing(6)  # Increased spacing between station rows from 5 to 10
+        self.stations_layout = QVBoxLayout(stations_container)
+        self.stations_layout.setContentsMargins(0, 0, 0, 0)
+        self.stations_layout.setSpacing(6)  # Increased spacing between station rows from 5 to 10
+        self.stations_layout.addStretch()
+        
+        self.scroll_area = QScrollArea()
+        self.scroll_area.setWidget(stations_container)
+        self.scroll_area.setWidgetResizable(True)
+        self.scroll_area.setFrameShape(QFrame.NoFrame)
+        self.scroll_area.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
         
         # Storage for UI references
         self.value_labels = {}
         self.toggle_buttons = {}
+        self.station_rows = {}
+        self.station_count = 0
         
         # Create each station row
-        for station_id in range(1, 5):
-            row = self._create_station_row(station_id)
-            stations_layout.addWidget(row)
+        self.set_station_count(station_count)
         
-        main_layout.addWidget(stations_container)
+        main_layout.addWidget(self.scroll_area)
         
         # Set width based on columns
         total_width = sum(col["width"] for col in self.columns) + 40
         self.setFixedWidth(total_width)
     
+    def set_station_count(self, station_count):
+        """Show rows for stations 1..station_count, creating any that don't exist yet"""
+        for station_id in range(1, max(station_count, len(self.station_rows)) + 1):
+            if station_id not in self.station_rows:
+                row = self._create_station_row(station_id)
+                self.station_rows[station_id] = row
+                self.stations_layout.insertWidget(self.stations_layout.count() - 1, row)
+            self.station_rows[station_id].setVisible(station_id <= station_count)
+        self.station_count = station_count
+        
+        # Always show at least one board's worth of rows without scrolling
+        visible_rows = max(1, min(station_count, STATIONS_PER_BOARD))
+        self.scroll_area.setMinimumHeight(visible_rows * (STATION_ROW_HEIGHT + self.stations_layout.spacing()))
+    
     def _create_header(self):
         """Create the column headers"""
         header_widget = QWidget()
@@ -276,7 +334,7 @@ class StationStatusWidget(QWidget):
         frame = QFrame()
         frame.setFrameShape(QFrame.StyledPanel)
         frame.setStyleSheet(STATION_FRAME_STYLE)
-        frame.setFixedHeight(70)  # Set the height of station rows to 60 pixels
+        frame.setFixedHeight(STATION_ROW_HEIGHT)
         
         # Create layout
         layout = QGridLayout(frame)
@@ -291,6 +349,8 @@ class StationStatusWidget(QWidget):
         
         # Station label
         station_label = QLabel(f"Station {station_id}")
+        board_index, local_station = divmod(station_id - 1, STATIONS_PER_BOARD)
+        station_label.setToolTip(f"Board {board_index + 1}, station {local_station}")
         station_label.setStyleSheet(STATION_LABEL_STYLE)
         station_label.setAlignment(Qt.AlignCenter)
         layout.addWidget(station_label, 0, 0)
@@ -354,20 +414,36 @@ class StationStatusWidget(QWidget):
     
     def update_station_value(self, station_id, value_type, value):
         """Update a specific value for a station"""
-        if 1 <= station_id <= 4 and value_type in self.value_labels[station_id]:
+        if 1 <= station_id <= self.station_count and value_type in self.value_labels[station_id]:
             # Format current values with 2 decimal places
-            if value_type == 'current' and isinstance(value, (int, float)):
+            if value_type in CURRENT_FIELDS and isinstance(value, (int, float)):
                 display_value = f"{value:.2f}"
             else:
                 display_value = str(value)
-            self.value_labels[station_id][value_type].setText(display_value)
+            
+            # Skip setText (and the repaint it triggers) when nothing visible changes
+            label = self.value_labels[station_id][value_type]
+            if label.text() != display_value:
+                label.setText(display_value)
     
     def set_station_enabled(self, station_id, enabled):
         """Set the enabled state of a station's toggle button"""
-        if 1 <= station_id <= 4:
+        if 1 <= station_id <= self.station_count:
             button = self.toggle_buttons[station_id]
-            button.setChecked(enabled)
-            button.setText("ON" if enabled else "OFF")
+            if button.isChecked() != enabled:
+                button.setChecked(enabled)
+            text = "ON" if enabled else "OFF"
+            if button.text() != text:
+                button.setText(text)
+    
+    def apply_changes(self, changes):
+        """Apply {station_id: {field: value}} changes from a StationModel"""
+        for station_id, fields in changes.items():
+            for field, value in fields.items():
+                if field == 'enabled':
+                    self.set_station_enabled(station_id, value)
+                else:
+                    self.update_station_value(station_id, field, value)
     
     def _handle_reset_click(self, station_id, field_type):
         """Handle clicks on cycle count or failure count fields"""
@@ -421,24 +497,267 @@ class ControlWidget(QWidget):
         layout.addWidget(self.start_stop_btn)
     
     def update_state(self, is_running):
-        """Update the button state"""
-        self.connected = True
-        self.start_stop_btn.setCheckable(True)
+        """Update the button state; returns True if the displayed state changed"""
+        text = "Stop" if is_running else "Start"
+        if (self.connected and self.start_stop_btn.isChecked() == is_running
+                and self.start_stop_btn.text() == text):
+            return False
+        
+        if not self.connected:
+            # START_BUTTON_STYLE styles both states via :checked, so it is only applied once
+            self.connected = True
+            self.start_stop_btn.setCheckable(True)
+            self.start_stop_btn.setStyleSheet(START_BUTTON_STYLE)
         self.start_stop_btn.setChecked(is_running)
-        self.start_stop_btn.setText("Stop" if is_running else "Start")
-        self.start_stop_btn.setStyleSheet(f"""
-            QPushButton {{
-                background-color: {COLOR_ERROR if is_running else COLOR_SUCCESS};
-                color: {COLOR_TEXT_LIGHT};
-                border: none;
-                padding: 6px;
-                font-size: 14px;
-                font-weight: bold;
-                border-radius: 4px;
-                min-height: 32px;
-            }}
-        """)
+        self.start_stop_btn.setText(text)
+        return True
+    
+    def set_disconnected(self):
+        """Return the button to its initial Connect state"""
+        self.connected = False
+        self.start_stop_btn.setChecked(False)
+        self.start_stop_btn.setCheckable(False)
+        self.start_stop_btn.setText("Connect")
+        self.start_stop_btn.setStyleSheet(CONNECT_BUTTON_STYLE)
     
     def set_enabled(self, enabled):
         """Enable or disable the button"""
-        self.start_stop_btn.setEnabled(enabled) 
\ No newline at end of file
+        self.start_stop_btn.setEnabled(enabled)
+
+class DiagnosticsWidget(QWidget):
+    """Collapsible table of the per-stage latency histograms
+    
+    link_report, if given, returns extra text (e.g. drop counters) shown below the table.
+    """
+    dump_requested = Signal()
+    
+    def __init__(self, latency_stats, link_report=None):
+        super().__init__()
+        self.latency_stats = latency_stats
+        self.link_report = link_report
+        
+        # Only refreshed while the table is shown
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(DIAGNOSTICS_REFRESH_INTERVAL)
+        self.refresh_timer.timeout.connect(self.refresh)
+        
+        self.setup_ui()
+    
+    def setup_ui(self):
+        """Set up the user interface components"""
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(5, 0, 5, 5)
+        layout.setSpacing(3)
+        
+        header_layout = QHBoxLayout()
+        
+        title = QLabel("Latency")
+        title.setFont(QFont("Arial", 9, QFont.Bold))
+        header_layout.addWidget(title)
+        header_layout.addStretch()
+        
+        self.show_btn = QPushButton("Show")
+        self.show_btn.setCheckable(True)
+        self.show_btn.setStyleSheet(LOG_BUTTON_STYLE)
+        self.show_btn.toggled.connect(self.set_expanded)
+        header_layout.addWidget(self.show_btn)
+        
+        reset_btn = QPushButton("Reset")
+        reset_btn.setStyleSheet(LOG_BUTTON_STYLE)
+        reset_btn.clicked.connect(self.reset)
+        header_layout.addWidget(reset_btn)
+        
+        dump_btn = QPushButton("Dump")
+        dump_btn.setStyleSheet(LOG_BUTTON_STYLE)
+        dump_btn.clicked.connect(self.dump_requested.emit)
+        header_layout.addWidget(dump_btn)
+        
+        layout.addLayout(header_layout)
+        
+        self.table = QPlainTextEdit()
+        self.table.setReadOnly(True)
+        self.table.setFont(QFont("Monospace", 8))
+        self.table.setStyleSheet("background-color: white; border: 1px solid #e0e0e0; border-radius: 3px;")
+        self.table.setToolTip("\n".join(f"{stage}: {text}" for stage, text in STAGE_DESCRIPTIONS.items()))
+        self.table.setMaximumHeight(130)
+        self.table.setVisible(False)
+        layout.addWidget(self.table)
+    
+    def set_expanded(self, expanded):
+        """Show or hide the table"""
+        self.table.setVisible(expanded)
+        self.show_btn.setText("Hide" if expanded else "Show")
+        if expanded:
+            self.refresh()
+            self.refresh_timer.start()
+        else:
+            self.refresh_timer.stop()
+    
+    def refresh(self):
+        """Redraw the table from the current histograms"""
+        text = self.latency_stats.format_table()
+        if self.link_report:
+            link = self.link_report()
+            if link:
+                text += "\n\n" + link
+        self.table.setPlainText(text)
+    
+    def reset(self):
+        """Clear all histograms"""
+        self.latency_stats.reset()
+        if self.table.isVisible():
+            self.refresh()
+
+class TrendCanvas(QWidget):
+    """Plot of one current field for every station, drawn from a TrendBuffer
+    
+    Each station's series is decimated to about one bucket per pixel column
+    before drawing, so paint cost depends on the plot width, not on how many
+    cycles the session has recorded.
+    """
+    MARGIN_LEFT = 40
+    MARGIN = 6
+    
+    def __init__(self, trends, field=TREND_FIELDS[0]):
+        super().__init__()
+        self.trends = trends
+        self.field = field
+        self.decimate = DECIMATORS[TREND_DECIMATION]
+        self.setMinimumHeight(140)
+        self.setStyleSheet("background-color: white;")
+    
+    def paintEvent(self, event: QPaintEvent):
+        p = QPainter(self)
+        p.fillRect(self.rect(), QColor("white"))
+        p.setFont(QFont("Arial", 7))
+        
+        plot = QRect(self.MARGIN_LEFT, self.MARGIN, self.width() - self.MARGIN_LEFT - self.MARGIN,
+                     self.height() - 2 * self.MARGIN - 10)
+        if plot.width() < 10 or plot.height() < 10:
+            p.end()
+            return
+        
+        # Decimate first so the axis range comes from the points actually drawn
+        series = []
+        x_min = x_max = None
+        for station in range(self.trends.stations):
+            first, values = self.trends.series(self.field, station)
+            if len(values):
+                indices, points = self.decimate(values, plot.width())
+                series.append((station, first + indices, points))
+                x_min = first if x_min is None else min(x_min, first)
+                x_max = max(x_max or 0, first + len(values) - 1)
+        
+        p.setPen(QPen(QColor("#e0e0e0"), 1))
+        p.drawRect(plot)
+        if not series:
+            p.setPen(QColor("#999999"))
+            p.drawText(plot, Qt.AlignCenter, "No cycles recorded yet")
+            p.end()
+            return
+        
+        y_min = min(float(points.min()) for _, _, points in series)
+        y_max = max(float(points.max()) for _, _, points in series)
+        if y_max - y_min < 0.1:
+            y_min, y_max = y_min - 0.05, y_max + 0.05
+        x_scale = plot.width() / max(1, x_max - x_min)
+        y_scale = plot.height() / (y_max - y_min)
+        
+        p.setPen(QColor("#666666"))
+        p.drawText(0, plot.top(), self.MARGIN_LEFT - 4, 12, Qt.AlignRight | Qt.AlignTop, f"{y_max:.2f} A")
+        p.drawText(0, plot.bottom() - 12, self.MARGIN_LEFT - 4, 12, Qt.AlignRight | Qt.AlignBottom, f"{y_min:.2f} A")
+        p.drawText(plot.left(), plot.bottom() + 2, plot.width(), 12, Qt.AlignLeft, f"cycle {x_min + 1}")
+        p.drawText(plot.left(), plot.bottom() + 2, plot.width(), 12, Qt.AlignRight, f"cycle {x_max + 1}")
+        
+        # No antialiasing: with one min/max pair per pixel column it mostly blurs and costs ~10x
+        for station, indices, points in series:
+            xs = (indices - x_min) * x_scale + plot.left()
+            ys = plot.bottom() - (points - y_min) * y_scale
+            p.setPen(QPen(QColor(TREND_COLORS[station % len(TREND_COLORS)]), 0))
+            p.drawPolyline(QPolygonF([QPointF(x, y) for x, y in zip(xs.tolist(), ys.tolist())]))
+        p.end()
+
+class TrendWidget(QWidget):
+    """Collapsible per-station current trend plot with a keyswitch/starter selector"""
+    def __init__(self, trends):
+        super().__init__()
+        self.trends = trends
+        self._drawn_version = None
+        
+        # Only redrawn while the plot is shown and new cycles have arrived
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(TREND_REFRESH_INTERVAL)
+        self.refresh_timer.timeout.connect(self.refresh)
+        
+        self.setup_ui()
+    
+    def setup_ui(self):
+        """Set up the user interface components"""
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(5, 0, 5, 5)
+        layout.setSpacing(3)
+        
+        header_layout = QHBoxLayout()
+        
+        title = QLabel("Current trends")
+        title.setFont(QFont("Arial", 9, QFont.Bold))
+        header_layout.addWidget(title)
+        
+        self.legend = QLabel()
+        self.legend.setFont(QFont("Arial", 8))
+        header_layout.addWidget(self.legend)
+        header_layout.addStretch()
+        
+        self.field_btn = QPushButton("Keyswitch")
+        self.field_btn.setCheckable(True)
+        self.field_btn.setStyleSheet(LOG_BUTTON_STYLE)
+        self.field_btn.setToolTip("Switch between keyswitch and starter current")
+        self.field_btn.toggled.connect(self.set_starter)
+        header_layout.addWidget(self.field_btn)
+        
+        self.show_btn = QPushButton("Show")
+        self.show_btn.setCheckable(True)
+        self.show_btn.setStyleSheet(LOG_BUTTON_STYLE)
+        self.show_btn.toggled.connect(self.set_expanded)
+        header_layout.addWidget(self.show_btn)
+        
+        layout.addLayout(header_layout)
+        
+        self.canvas = TrendCanvas(self.trends)
+        self.canvas.setVisible(False)
+        layout.addWidget(self.canvas)
+        self._update_legend()
+    
+    def set_trends(self, trends):
+        """Plot a new buffer (e.g. after the station count changed)"""
+        self.trends = trends
+        self.canvas.trends = trends
+        self._update_legend()
+        self.refresh(force=True)
+    
+    def _update_legend(self):
+        self.legend.setText("  ".join(f'<span style="color:{TREND_COLORS[i % len(TREND_COLORS)]}">&#9632;</span> {i + 1}'
+                                      for i in range(self.trends.stations)))
+    
+    def set_starter(self, starter):
+        """Plot starter current instead of keyswitch current"""
+        self.canvas.field = TREND_FIELDS[1] if starter else TREND_FIELDS[0]
+        self.field_btn.setText("Starter" if starter else "Keyswitch")
+        self.refresh(force=True)
+    
+    def set_expanded(self, expanded):
+        """Show or hide the plot"""
+        self.canvas.setVisible(expanded)
+        self.show_btn.setText("Hide" if expanded else "Show")
+        if expanded:
+            self.refresh(force=True)
+            self.refresh_timer.start()
+        else:
+            self.refresh_timer.stop()
+    
+    def refresh(self, force=False):
+        """Repaint the plot if cycles were recorded since it was last drawn"""
+        if not self.canvas.isVisible() or (not force and self.trends.version == self._drawn_version):
+            return
+        self._drawn_version = self.trends.version
+        self.canvas.update()
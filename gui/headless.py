@@ -0,0 +1,524 @@
+"""Headless Keyswitch Tester runner for rigs without a display
+
+Reads the OpenRB board, logs to disk and records cycles exactly like the
+GUI, but runs on asyncio without importing Qt. Commands use the firmware
+syntax (START, STOP, ENABLE:0, RESET_CYCLE:2, REQUEST_STATE, ...) plus
+STATUS, STATS and QUIT, and are accepted on stdin and/or a Unix socket.
+With several boards, station arguments are global indices (board 2's
+station 0 is station 4) and other commands go to every board:
+
+    python gui/headless.py --socket /tmp/keyswitch.sock
+    echo START | socat - UNIX-CONNECT:/tmp/keyswitch.sock
+"""
+import argparse
+import asyncio
+import os
+import signal
+import sys
+import time
+
+from constants import (LOGS_DIR, STATIONS_PER_BOARD, DRIFT_CHECK_INTERVAL, METRICS_UPDATE_INTERVAL,
+                       STATION_REFRESH_INTERVAL)
+from board_manager import BoardManager, format_link_stats
+from port_watcher import PortWatcher
+from cycle_store import CycleStore
+from log_format import LogTimestamp, format_board_message
+from log_writer import LogWriter
+from metrics import HostMetrics, MetricsServer
+from live_state import LiveState, LiveStateServer
+from messages import (parse_message, format_message, MessageParseError, CycleMessage,
+                      StationMessage, SystemStateMessage)
+from station_model import StationModel
+from trends import TrendBuffer
+from drift import DriftDetector, format_alert
+
+class HeadlessTester:
+    """Host-side pipeline for one or more boards, driven by an asyncio event loop"""
+    def __init__(self, ports=None, logs_dir=LOGS_DIR, echo=True, metrics_port=None, live_port=None):
+        self.ports = list(ports or [])
+        self.logs_dir = logs_dir
+        self.echo = echo
+        self.metrics_port = metrics_port
+        self.live_port = live_port
+        
+        self.board_manager = BoardManager()
+        self.port_watcher = None
+        self.station_model = StationModel(range(1, STATIONS_PER_BOARD + 1))
+        self.trends = TrendBuffer(STATIONS_PER_BOARD)
+        self.drift = DriftDetector(STATIONS_PER_BOARD)
+        self.drift_checked = [0] * STATIONS_PER_BOARD
+        self.timestamp = LogTimestamp()
+        self.log_writer = None
+        self.cycle_store = None
+        self.board_running = {}
+        self.metrics = HostMetrics()
+        self.metrics_server = None
+        self.live_state = None
+        self.live_server = None
+        
+        # Parsed message type -> handler
+        self._message_handlers = {
+            CycleMessage: self._process_cycle_message,
+            StationMessage: self._process_station_message,
+            SystemStateMessage: self._process_system_state_message,
+        }
+        
+        self._loop = None
+        self._batches = None
+        self._stopped = None
+    
+    def open_storage(self):
+        """Open the session log file and cycle store"""
+        self.log_writer = LogWriter(self.logs_dir)
+        log_path = self.log_writer.open()
+        
+        store_path = os.path.join(self.logs_dir, f"keyswitch_cycles_{time.strftime('%Y%m%d_%H%M%S')}.kcyc")
+        self.cycle_store = CycleStore(store_path)
+        try:
+            self.cycle_store.open()
+        except Exception as e:
+            self.cycle_store = None
+            self.log_message(f"ERROR: Failed to open cycle store: {str(e)}")
+        
+        self.log_message(f"Logging to {log_path}")
+        if self.cycle_store:
+            self.log_message(f"Recording cycles to {store_path}")
+    
+    def close_storage(self):
+        """Flush and close the log file and cycle store"""
+        if self.cycle_store:
+            self.cycle_store.close()
+            self.report_cycle_store_errors()
+            self.cycle_store = None
+        if self.log_writer:
+            self.log_writer.close()
+            self.log_writer = None
+    
+    def report_cycle_store_errors(self):
+        """Log write failures reported by the cycle store's flush thread"""
+        if self.cycle_store:
+            for error in self.cycle_store.take_errors():
+                self.log_message(f"ERROR: {error}")
+    
+    def log_message(self, message):
+        """Write a timestamped message to the log file (and stdout when echoing)"""
+        line = f"[{self.timestamp.now()}] {message}"
+        if self.log_writer:
+            self.log_writer.write(line + "\n")
+            for error in self.log_writer.take_errors():
+                print(f"[ERROR] {error}", file=sys.stderr)
+        if self.echo:
+            print(line, flush=False)
+    
+    def handle_lines(self, board_index, lines):
+        """Log and process a batch of lines (or binary telemetry messages) from one board"""
+        self.metrics.observe_lines(board_index, len(lines))
+        tag = len(self.board_manager.boards) > 1
+        for line in lines:
+            text = line if isinstance(line, str) else format_message(line)
+            self.log_message(format_board_message(board_index, text) if tag else text)
+            self.process_serial_message(line, board_index)
+        self.report_cycle_store_errors()
+        if self.echo:
+            sys.stdout.flush()
+    
+    def process_serial_message(self, message, board_index=0):
+        """Parse one line and update host state, mirroring KeyswitchTesterGUI"""
+        try:
+            parsed = parse_message(message)
+            if board_index < len(self.board_manager.boards):
+                gap = self.board_manager.observe(board_index, parsed)
+                if gap:
+                    self._report_gap(board_index, *gap)
+            handler = self._message_handlers.get(type(parsed))
+            if handler:
+                handler(board_index, parsed)
+        except MessageParseError as e:
+            self.metrics.observe_parse_error()
+            self.log_message(f"ERROR: {e}")
+        except Exception as e:
+            self.log_message(f"ERROR: Failed to process message: {str(e)}")
+    
+    def _report_gap(self, board_index, station, missing):
+        """Log messages lost on the link (the board manager resyncs the station itself)"""
+        if station is None:
+            self.log_message(f"WARNING: {missing} message(s) lost from board {board_index + 1}")
+        else:
+            self.log_message(f"WARNING: {missing} message(s) lost for station {station + 1}, resyncing")
+    
+    def _station_id(self, board_index, station):
+        """Map a board's 0-based station index to a 1-based global id, or None if invalid"""
+        if not 0 <= station < STATIONS_PER_BOARD:
+            return None
+        station_id = board_index * STATIONS_PER_BOARD + station + 1
+        return station_id if self.station_model.has_station(station_id) else None
+    
+    def _process_cycle_message(self, board_index, message):
+        station_idx = self._station_id(board_index, message.station)
+        if station_idx is None:
+            self.log_message(f"ERROR: Invalid station number: {message.station} (must be 0-{STATIONS_PER_BOARD - 1})")
+            return
+        self.station_model.update(station_idx, enabled=message.enabled, cycle_count=message.cycles,
+                                  failure_count=message.failures,
+                                  keyswitch_current=message.keyswitch_current,
+                                  starter_current=message.starter_current)
+        self.trends.append(station_idx - 1, message.keyswitch_current, message.starter_current)
+        self.metrics.observe_cycle(station_idx, message)
+        if self.cycle_store and not self.cycle_store.append(
+                time.time(), station_idx - 1, message.enabled, message.cycles, message.failures,
+                message.keyswitch_current, message.starter_current):
+            self.log_message(f"ERROR: Cycle for station {station_idx} not recorded (values out of range)")
+    
+    def _process_station_message(self, board_index, message):
+        station_idx = self._station_id(board_index, message.station)
+        if station_idx is None:
+            self.log_message(f"ERROR: Invalid station number: {message.station} (must be 0-{STATIONS_PER_BOARD - 1})")
+            return
+        self.station_model.update(station_idx, enabled=message.enabled, cycle_count=message.cycles,
+                                  failure_count=message.failures)
+        self.metrics.observe_station(station_idx, message)
+    
+    def _process_system_state_message(self, board_index, message):
+        if self.board_running.get(board_index) != message.running:
+            self.board_running[board_index] = message.running
+            self.log_message(f"System state updated: {'running' if message.running else 'stopped'}" +
+                             (f" (board {board_index + 1})" if len(self.board_manager.boards) > 1 else ""))
+    
+    def check_drift(self):
+        """Analyse the cycles recorded since the last check and log any drift alerts, mirroring the GUI"""
+        for station in range(self.drift.stations):
+            first, keyswitch, starter = self.trends.since(station, self.drift_checked[station])
+            if not len(keyswitch):
+                continue
+            self.drift_checked[station] = first + len(keyswitch)
+            for alert in self.drift.update(station, keyswitch, starter):
+                self.log_message(format_alert(alert))
+    
+    def update_metrics(self):
+        """Refresh the link counters, rates, queue depths and event-loop lag in the metrics"""
+        self.metrics.update(self.board_manager.link_stats(), {
+            "serial_batches": self._batches.qsize() if self._batches else 0,
+            "log_writer": self.log_writer.queue_depth() if self.log_writer else 0,
+            "commands": self.board_manager.pending_count(),
+        }, self.running)
+    
+    @property
+    def running(self):
+        """True if any board is running, None before any board has reported"""
+        if not self.board_running:
+            return None
+        return any(self.board_running.values())
+    
+    async def execute(self, text):
+        """Run one command line and return the reply text"""
+        text = text.strip()
+        name, _, arg = text.partition(":")
+        name = name.upper()
+        
+        if name == "STATUS":
+            return self.format_status()
+        if name == "STATS":
+            return self.format_stats()
+        if name == "QUIT":
+            self.stop()
+            return "OK QUIT"
+        
+        try:
+            arg = int(arg) if arg else None
+        except ValueError:
+            return f"ERROR {text}: invalid station index"
+        
+        # Station arguments are global indices; other commands go to every board
+        futures = {}
+        def resolve(result):
+            future = futures.get(id(result.command))
+            if future is not None and not future.done():
+                future.set_result(result)
+        def on_done(result):
+            # Runs on a worker thread; resolve() runs on the loop after futures is filled in
+            self._loop.call_soon_threadsafe(resolve, result)
+        
+        try:
+            submitted = self.board_manager.submit(name, arg, on_done)
+        except ValueError as e:
+            return f"ERROR {text}: {e}"
+        if not submitted:
+            return f"ERROR {text}: not connected"
+        for _, command in submitted:
+            futures[id(command)] = self._loop.create_future()
+        
+        replies = []
+        for board_index, command in submitted:
+            result = await futures[id(command)]
+            board = f" (board {board_index + 1})" if len(submitted) > 1 else ""
+            if result.ok:
+                replies.append(f"OK {text}{board} ({result.latency * 1000:.0f} ms)")
+                if name == "RESET_CYCLE":
+                    # A new switch; judge it against its own baseline
+                    self.drift.reset(arg)
+            else:
+                replies.append(f"ERROR {text}{board}: {result.reason}")
+        return "\n".join(replies)
+    
+    def format_status(self):
+        """One line per station plus the run state"""
+        state = {None: "unknown", True: "running", False: "stopped"}[self.running]
+        lines = [f"System {state}"]
+        for station_id, values in self.station_model.snapshot().items():
+            if not values:
+                lines.append(f"Station {station_id}: no data")
+                continue
+            lines.append(
+                f"Station {station_id}: {'ON' if values.get('enabled') else 'OFF'} "
+                f"cycles={values.get('cycle_count', 0)} failures={values.get('failure_count', 0)} "
+                f"keyswitch={values.get('keyswitch_current', 0.0):.2f}A "
+                f"starter={values.get('starter_current', 0.0):.2f}A"
+            )
+        return "\n".join(lines)
+    
+    def format_stats(self):
+        """Command acknowledgement statistics"""
+        lines = []
+        for name, stats in sorted(self.board_manager.command_stats().items()):
+            mean = stats["mean_latency"]
+            mean_text = f"{mean * 1000:.1f} ms" if mean is not None else "-"
+            lines.append(f"{name}: sent={stats['sent']} acked={stats['acknowledged']} "
+                         f"refused={stats['refused']} timeouts={stats['timeouts']} mean={mean_text}")
+        link = format_link_stats(self.board_manager.link_stats())
+        if link:
+            lines.append(link)
+        return "\n".join(lines) or "No commands sent"
+    
+    def stop(self):
+        """Ask run() to shut down"""
+        if self._stopped is not None and not self._stopped.is_set():
+            self._stopped.set()
+    
+    async def run(self, socket_path=None, use_stdin=True):
+        """Connect, process serial data and serve commands until stopped"""
+        self._loop = asyncio.get_running_loop()
+        self._batches = asyncio.Queue()
+        self._stopped = asyncio.Event()
+        
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                self._loop.add_signal_handler(sig, self.stop)
+            except (NotImplementedError, RuntimeError):
+                pass
+        
+        self.open_storage()
+        tasks = []
+        server = None
+        try:
+            if not await self.connect():
+                return 1
+            
+            tasks.append(asyncio.create_task(self._process_batches()))
+            tasks.append(asyncio.create_task(self._check_drift_periodically()))
+            tasks.append(asyncio.create_task(self._update_metrics_periodically()))
+            if self.metrics_port is not None:
+                self.start_metrics_server()
+            if self.live_port is not None:
+                self.start_live_server()
+                tasks.append(asyncio.create_task(self._publish_live_state_periodically()))
+            if use_stdin:
+                tasks.append(asyncio.create_task(self._serve_stdin()))
+            if socket_path:
+                server = await self._serve_socket(socket_path)
+            
+            self.log_message(await self.execute("REQUEST_STATE"))
+            await self._stopped.wait()
+            return 0
+        finally:
+            for task in tasks:
+                task.cancel()
+            if server:
+                server.close()
+                try:
+                    os.remove(socket_path)
+                except OSError:
+                    pass
+            if self.port_watcher:
+                self.port_watcher.stop()
+            if self.metrics_server:
+                self.metrics_server.stop()
+            if self.live_server:
+                self.live_server.stop()
+            self.board_manager.disconnect()
+            self.log_message("Stopped")
+            self.close_storage()
+    
+    async def connect(self):
+        """Open every board's port (off the event loop) and start their reader threads"""
+        loop = self._loop
+        ports = self.ports
+        if not ports:
+            # Keep watching so a board that is unplugged can come back on a new device name
+            self.port_watcher = PortWatcher(lambda ports: loop.call_soon_threadsafe(self.board_manager.ports_changed))
+            self.board_manager.port_source = self.port_watcher.ports
+            self.port_watcher.start()
+            ports = await loop.run_in_executor(None, self.port_watcher.ports, 5.0)
+        if not ports:
+            self.log_message("ERROR: No OpenRB device found")
+            return False
+        
+        self.board_manager.on_lines = lambda board_index, lines: loop.call_soon_threadsafe(
+            self._batches.put_nowait, (board_index, lines))
+        self.board_manager.on_lost = lambda board_index: loop.call_soon_threadsafe(
+            self._connection_lost, board_index)
+        
+        self.log_message(f"Connecting to OpenRB on {', '.join(ports)}...")
+        results = await self._loop.run_in_executor(None, self.board_manager.connect, ports)
+        for port, connected in results.items():
+            if not connected:
+                self.log_message(f"ERROR: Failed to connect to {port}")
+        if not self.board_manager.connected:
+            return False
+        
+        for board in self.board_manager.boards:
+            self.log_message(f"Connected to OpenRB on {board.port}" +
+                             (f" (board {board.index + 1})" if len(self.board_manager.boards) > 1 else ""))
+        self.set_station_count(self.board_manager.station_count)
+        return True
+    
+    def set_station_count(self, station_count):
+        """Resize the station model and per-station analytics to station_count stations"""
+        self.station_model = StationModel(range(1, station_count + 1))
+        self.metrics.clear_stations()
+        if self.live_state:
+            self.live_state.reset(self.station_model.values)
+        self.trends = TrendBuffer(station_count)
+        self.drift = DriftDetector(station_count)
+        self.drift_checked = [0] * station_count
+    
+    def _connection_lost(self, board_index):
+        board = self.board_manager.boards[board_index]
+        self.log_message(f"ERROR: Lost connection to OpenRB device on {board.port}, reconnecting...")
+        self.board_manager.disconnect_board(board_index)
+        self.board_running.pop(board_index, None)
+        
+        loop = self._loop
+        self.board_manager.reconnect(board_index, lambda index: loop.call_soon_threadsafe(self._reconnected, index))
+    
+    def _reconnected(self, board_index):
+        """Pull the full state of a board that came back; messages sent while it was away are lost"""
+        board = self.board_manager.boards[board_index]
+        self.log_message(f"Reconnected to OpenRB on {board.port}" +
+                         (f" (board {board_index + 1})" if len(self.board_manager.boards) > 1 else ""))
+        
+        def on_done(result):
+            if not result.ok:
+                self._loop.call_soon_threadsafe(self.log_message, f"ERROR REQUEST_STATE: {result.reason}")
+        self.board_manager.submit("REQUEST_STATE", on_done=on_done, board_index=board_index)
+    
+    async def _process_batches(self):
+        """Consume line batches delivered by the reader thread"""
+        while True:
+            self.handle_lines(*await self._batches.get())
+    
+    async def _check_drift_periodically(self):
+        while True:
+            await asyncio.sleep(DRIFT_CHECK_INTERVAL / 1000)
+            self.check_drift()
+    
+    async def _update_metrics_periodically(self):
+        # The sleep overshoot is the event-loop lag
+        while True:
+            await asyncio.sleep(METRICS_UPDATE_INTERVAL / 1000)
+            self.update_metrics()
+    
+    def start_metrics_server(self):
+        """Serve the rig health metrics on a local HTTP port"""
+        self.metrics_server = MetricsServer(self.metrics, self.metrics_port)
+        try:
+            self.metrics_server.start()
+            self.log_message(f"Serving metrics on {self.metrics_server.url}")
+        except OSError as e:
+            self.metrics_server = None
+            self.log_message(f"ERROR: Failed to start metrics server on port {self.metrics_port}: {str(e)}")
+    
+    def start_live_server(self):
+        """Serve the station state read-only to remote viewers"""
+        self.live_state = LiveState(self.station_model.values)
+        self.live_state.publish(self.station_model.snapshot())
+        self.live_server = LiveStateServer(self.live_state, self.live_port)
+        try:
+            self.live_server.start()
+            self.log_message(f"Serving live station state on {self.live_server.url}")
+        except OSError as e:
+            self.live_state = self.live_server = None
+            self.log_message(f"ERROR: Failed to start live state server on port {self.live_port}: {str(e)}")
+    
+    async def _publish_live_state_periodically(self):
+        # Coalesced like the GUI's station display refresh
+        while True:
+            await asyncio.sleep(STATION_REFRESH_INTERVAL / 1000)
+            if self.live_state:
+                self.live_state.publish(self.station_model.take_changes(), running=self.running)
+    
+    async def _serve_stdin(self):
+        """Execute commands typed on stdin; EOF just stops reading"""
+        reader = asyncio.StreamReader()
+        try:
+            await self._loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+        except (OSError, ValueError):
+            return
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            text = line.decode(errors='replace').strip()
+            if text:
+                asyncio.create_task(self._reply_stdout(text))
+    
+    async def _reply_stdout(self, text):
+        reply = await self.execute(text)
+        self.log_message(f"Command {text}: {reply.splitlines()[0]}")
+        print(reply, flush=True)
+    
+    async def _serve_socket(self, socket_path):
+        """Accept line-based commands on a Unix socket, one reply per command"""
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        
+        async def handle_client(reader, writer):
+            try:
+                while True:
+                    line = await reader.readline()
+                    if not line:
+                        break
+                    text = line.decode(errors='replace').strip()
+                    if not text:
+                        continue
+                    reply = await self.execute(text)
+                    self.log_message(f"Command {text}: {reply.splitlines()[0]}")
+                    writer.write(reply.encode() + b"\n")
+                    await writer.drain()
+            except (ConnectionError, asyncio.IncompleteReadError):
+                pass
+            finally:
+                writer.close()
+        
+        server = await asyncio.start_unix_server(handle_client, socket_path)
+        self.log_message(f"Accepting commands on {socket_path}")
+        return server
+
+def main():
+    """Headless entry point"""
+    parser = argparse.ArgumentParser(description="Run the keyswitch tester without a GUI")
+    parser.add_argument("--port", action="append", default=[],
+                        help="serial port of an OpenRB board; repeat for several boards (default: auto-detect all)")
+    parser.add_argument("--socket", help="Unix socket path to accept commands on")
+    parser.add_argument("--no-stdin", action="store_true", help="do not read commands from stdin")
+    parser.add_argument("--logs-dir", default=LOGS_DIR, help="directory for log files and cycle stores")
+    parser.add_argument("--quiet", action="store_true", help="do not echo log lines to stdout")
+    parser.add_argument("--metrics-port", type=int, help="serve Prometheus metrics on this local HTTP port")
+    parser.add_argument("--live-port", type=int, help="serve the live station state to browsers on this HTTP port")
+    args = parser.parse_args()
+    
+    tester = HeadlessTester(args.port, args.logs_dir, echo=not args.quiet, metrics_port=args.metrics_port,
+                            live_port=args.live_port)
+    return asyncio.run(tester.run(args.socket, use_stdin=not args.no_stdin))
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,553 @@
+"""Serial I/O in a separate process, feeding the GUI through shared memory (no Qt dependency)
+
+With --io-process the boards, the session log file and the cycle store are
+owned by a child process, so a stalled GUI thread (a modal dialog, a slow
+repaint) or GIL contention with the widgets cannot hold up reading the
+ports or capturing data. The child parses each line, runs gap detection
+and command acknowledgement, logs it and records cycles, then passes the
+parsed message to the GUI as a packed record in a SharedRing. Commands,
+results, connection changes and statistics travel over a Pipe.
+
+In the GUI, RemoteBoardManager stands in for BoardManager and
+RemoteLogWriter for the LogWriter of SerialLogWidget.
+"""
+import itertools
+import multiprocessing
+import os
+import signal
+import struct
+import threading
+import time
+
+from constants import (LOGS_DIR, STATIONS_PER_BOARD, IO_RING_BYTES, IO_RING_WAIT, IO_STATS_INTERVAL,
+                       IO_START_TIMEOUT, IO_STOP_TIMEOUT)
+from board_manager import BoardManager
+from command_queue import Command, CommandResult
+from cycle_store import CycleStore
+from log_format import LogTimestamp, format_board_message, split_log_line
+from log_writer import LogWriter
+from messages import (parse_message, format_message, MessageParseError, CycleMessage, StationMessage,
+                      SystemStateMessage, EventMessage)
+from port_watcher import PortWatcher
+from ring_buffer import SharedRing
+
+# Record kinds; every record starts with kind, board index, seq (-1 for none)
+# and the perf_counter() time the line was read, which is CLOCK_MONOTONIC
+# and so comparable between processes on Linux
+RECORD_CYCLE = 1
+RECORD_STATION = 2
+RECORD_SYSTEM_STATE = 3
+RECORD_EVENT = 4
+RECORD_LINE = 5  # unparsed text; the GUI parses it (and reports any error) itself
+
+_HEADER = struct.Struct("<BBqd")
+_CYCLE = struct.Struct("<BBqdBBIIdd")
+_STATION = struct.Struct("<BBqdBBII")
+_SYSTEM_STATE = struct.Struct("<BBqdB")
+
+def encode_record(board_index, read_at, message):
+    """Pack a parsed message (or line text) from a board into a ring record"""
+    seq = getattr(message, 'seq', None)
+    seq = -1 if seq is None else seq
+    try:
+        if isinstance(message, CycleMessage):
+            return _CYCLE.pack(RECORD_CYCLE, board_index, seq, read_at, message.station, message.enabled,
+                               message.cycles, message.failures, message.keyswitch_current, message.starter_current)
+        if isinstance(message, StationMessage):
+            return _STATION.pack(RECORD_STATION, board_index, seq, read_at, message.station, message.enabled,
+                                 message.cycles, message.failures)
+        if isinstance(message, SystemStateMessage):
+            return _SYSTEM_STATE.pack(RECORD_SYSTEM_STATE, board_index, seq, read_at, message.running)
+        if isinstance(message, EventMessage):
+            return _HEADER.pack(RECORD_EVENT, board_index, seq, read_at) + message.text.encode()
+    except struct.error:
+        # Out-of-range fields; the GUI reports the line as it would have in-process
+        pass
+    return _HEADER.pack(RECORD_LINE, board_index, -1, read_at) + format_message(message).encode()
+
+def decode_record(record):
+    """Unpack a ring record into (board index, read_at, message tuple or line text)"""
+    kind, board_index, seq, read_at = _HEADER.unpack_from(record)
+    seq = None if seq < 0 else seq
+    if kind == RECORD_CYCLE:
+        station, enabled, cycles, failures, keyswitch, starter = _CYCLE.unpack(record)[4:]
+        return board_index, read_at, CycleMessage(station, bool(enabled), cycles, failures, keyswitch, starter, seq)
+    if kind == RECORD_STATION:
+        station, enabled, cycles, failures = _STATION.unpack(record)[4:]
+        return board_index, read_at, StationMessage(station, bool(enabled), cycles, failures, seq)
+    if kind == RECORD_SYSTEM_STATE:
+        return board_index, read_at, SystemStateMessage(bool(_SYSTEM_STATE.unpack(record)[4]), seq)
+    text = record[_HEADER.size:].decode('utf-8', errors='replace')
+    if kind == RECORD_EVENT:
+        return board_index, read_at, EventMessage(text, seq)
+    return board_index, read_at, text
+
+class IOWorker:
+    """The I/O process: reads the boards, writes the log and cycle store and fills the ring"""
+    def __init__(self, conn, ring, logs_dir, ports):
+        self.conn = conn
+        self.ring = ring
+        self.logs_dir = logs_dir
+        self.ports = ports
+        self._send_lock = threading.Lock()
+
+        # Taken by each board's reader thread, so the ring sees a single producer
+        self._lock = threading.RLock()
+        self.timestamp = LogTimestamp()
+        self.log_writer = None
+        self.cycle_store = None
+        self.dropped = 0  # records the ring had no room for since the last report
+
+        self.board_manager = BoardManager(self.handle_lines, lambda index: self.send("lost", index))
+        self.port_watcher = None
+        if not ports:
+            # A lost board may come back on a different device name
+            self.port_watcher = PortWatcher(lambda ports: self.board_manager.ports_changed())
+            self.board_manager.port_source = self.port_watcher.ports
+
+    def send(self, *message):
+        """Send a message to the GUI from any thread; False once the GUI has gone"""
+        with self._send_lock:
+            try:
+                self.conn.send(message)
+                return True
+            except OSError:
+                return False
+
+    def log(self, message):
+        """Write one of this process's own messages to the log file and show it in the GUI"""
+        self.send("show", self.write_log(message))
+
+    def write_log(self, message):
+        """Write a timestamped host message to the log file; returns the line"""
+        with self._lock:
+            line = f"[{self.timestamp.now()}] {message}"
+            if self.log_writer:
+                self.log_writer.write(line + "\n")
+        return line
+
+    def open_storage(self):
+        """Open the session log file and cycle store; returns their paths and any errors"""
+        try:
+            self.log_writer = LogWriter(self.logs_dir)
+            log_path, log_error = self.log_writer.open(), None
+        except Exception as e:
+            self.log_writer = None
+            log_path, log_error = None, str(e)
+
+        store_path = os.path.join(self.logs_dir, f"keyswitch_cycles_{time.strftime('%Y%m%d_%H%M%S')}.kcyc")
+        self.cycle_store = CycleStore(store_path)
+        try:
+            self.cycle_store.open()
+            store_error = None
+        except Exception as e:
+            self.cycle_store = None
+            store_error = str(e)
+        return log_path, log_error, store_path, store_error
+
+    def handle_lines(self, board_index, lines):
+        """Reader-thread callback: log, parse and record a batch, then pass it to the GUI"""
+        read_at = time.perf_counter()
+        with self._lock:
+            tag = len(self.board_manager.boards) > 1
+            records = []
+            for line in lines:
+                text = line if isinstance(line, str) else format_message(line)
+                if self.log_writer:
+                    self.log_writer.write(f"[{self.timestamp.now()}] "
+                                          f"{format_board_message(board_index, text) if tag else text}\n")
+                # One bad line must not end the board's reader thread
+                try:
+                    records.append(encode_record(board_index, read_at, self.process_message(board_index, line)))
+                except Exception as e:
+                    self.log(f"ERROR: Failed to process message: {str(e)}")
+
+            # Never wait for the GUI; it only misses display updates, the data is already captured
+            self.dropped += len(records) - self.ring.put(records)
+
+    def process_message(self, board_index, line):
+        """Parse one line, feed its board and record cycles; returns what the GUI should get"""
+        try:
+            parsed = parse_message(line)
+        except MessageParseError:
+            return line
+
+        if board_index < len(self.board_manager.boards):
+            gap = self.board_manager.observe(board_index, parsed)
+            if gap:
+                station, missing = gap
+                if station is None:
+                    self.log(f"WARNING: {missing} message(s) lost from board {board_index + 1}")
+                else:
+                    self.log(f"WARNING: {missing} message(s) lost for station {station + 1}, resyncing")
+
+        if isinstance(parsed, CycleMessage) and self.cycle_store and 0 <= parsed.station < STATIONS_PER_BOARD:
+            station = board_index * STATIONS_PER_BOARD + parsed.station
+            if not self.cycle_store.append(time.time(), station, parsed.enabled, parsed.cycles, parsed.failures,
+                                           parsed.keyswitch_current, parsed.starter_current):
+                self.log(f"ERROR: Cycle for station {station + 1} not recorded (values out of range)")
+        return parsed
+
+    def board_states(self):
+        return [(board.port, board.connected) for board in self.board_manager.boards]
+
+    def send_stats(self):
+        """Report link, command and log writer statistics, cycle store errors and any records the GUI missed"""
+        with self._lock:
+            dropped, self.dropped = self.dropped, 0
+        if dropped:
+            self.log(f"WARNING: {dropped} message(s) not shown (display too far behind)")
+        if self.cycle_store:
+            for error in self.cycle_store.take_errors():
+                self.log(f"ERROR: {error}")
+        log_writer = self.log_writer
+        self.send("stats", self.board_manager.link_stats(), self.board_manager.pending_count(),
+                  self.board_manager.command_stats(), log_writer.queue_depth() if log_writer else 0,
+                  log_writer.take_errors() if log_writer else [], self.board_states())
+
+    def handle_request(self, name, *args):
+        """Carry out one request from the GUI"""
+        board_manager = self.board_manager
+        if name == "connect":
+            results = board_manager.connect(args[0])
+            self.send("connected", results, self.board_states())
+        elif name == "submit":
+            token, command, station, board_index = args
+            on_done = lambda result: self.send("done", token, result.ok, result.latency, result.reason)
+            try:
+                submitted = board_manager.submit(command, station, on_done, board_index)
+            except (ValueError, IndexError) as e:
+                self.send("done", token, False, None, str(e))
+                return
+            if not submitted:
+                self.send("done", token, False, None, "not connected")
+        elif name == "disconnect":
+            board_manager.disconnect()
+        elif name == "disconnect_board":
+            board_manager.disconnect_board(args[0])
+        elif name == "reconnect":
+            board_manager.reconnect(args[0], lambda index: self.send("reconnected", index, self.board_states()))
+        elif name == "ports_changed":
+            board_manager.ports_changed()
+        elif name == "log":
+            # The GUI has already shown it
+            self.write_log(args[0])
+
+    def run(self):
+        """Serve the GUI's requests until it asks to stop or goes away"""
+        self.send("ready", *self.open_storage())
+        if self.port_watcher:
+            self.port_watcher.start()
+
+        next_stats = time.monotonic() + IO_STATS_INTERVAL
+        while True:
+            try:
+                if self.conn.poll(max(0.0, next_stats - time.monotonic())):
+                    request = self.conn.recv()
+                    if request[0] == "stop":
+                        break
+                    self.handle_request(*request)
+            except (EOFError, OSError):
+                break
+            if time.monotonic() >= next_stats:
+                self.send_stats()
+                next_stats = time.monotonic() + IO_STATS_INTERVAL
+        self.close()
+
+    def close(self):
+        """Release the ports and flush the log and cycle store"""
+        if self.port_watcher:
+            self.port_watcher.stop()
+        self.board_manager.disconnect()
+        if self.cycle_store:
+            self.cycle_store.close()
+            for error in self.cycle_store.take_errors():
+                self.write_log(f"ERROR: {error}")
+        if self.log_writer:
+            self.log_writer.close()
+        self.ring.close()
+        self.conn.close()
+
+def run_io_process(conn, ring_name, condition, logs_dir, ports):
+    """Entry point of the I/O process"""
+    # Ctrl+C in the terminal reaches the whole process group; the GUI decides when to stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    IOWorker(conn, SharedRing(condition, name=ring_name), logs_dir, ports).run()
+
+class RemoteBoard:
+    """The GUI's view of a board in the I/O process"""
+    def __init__(self, index, port, connected):
+        self.index = index
+        self.port = port
+        self.connected = connected
+
+class RemoteLogWriter:
+    """The I/O process's log file as SerialLogWidget sees it
+
+    Lines are re-stamped by the I/O process as it writes them, so the file
+    stays in time order with the board lines it logs itself.
+    """
+    def __init__(self, manager):
+        self._manager = manager
+        self.path = None
+        self.error = None
+        self.depth = 0
+        self.errors = []
+
+    def open(self):
+        if self.error:
+            raise OSError(self.error)
+        return self.path
+
+    def write(self, line):
+        timestamp, message = split_log_line(line)
+        self._manager.send("log", message)
+
+    def queue_depth(self):
+        """Lines waiting in the I/O process's writer, as of its last report"""
+        return self.depth
+
+    def take_errors(self):
+        errors, self.errors = self.errors, []
+        return errors
+
+    def close(self):
+        """The I/O process closes the file when it stops"""
+        pass
+
+class RemoteBoardManager:
+    """Stands in for BoardManager in the GUI when the boards are owned by the I/O process
+
+    Commands are routed by the same rules and completed through the same
+    on_done(CommandResult) callbacks; on_lines(board_index, lines, read_at),
+    on_lost(board_index) and on_line(text) are called from background
+    threads. on_line gets lines the I/O process has already logged, for
+    display only. observe() is a no-op: the I/O process does gap detection
+    and command matching before messages reach the GUI. Statistics are as
+    of the I/O process's last report.
+    """
+    def __init__(self, logs_dir=LOGS_DIR, ports=None, ring_bytes=IO_RING_BYTES):
+        self.logs_dir = logs_dir
+        self.ports = list(ports or [])
+        self.ring_bytes = ring_bytes
+        self.on_lines = None
+        self.on_lost = None
+        self.on_line = None
+        self.port_source = None  # unused; the I/O process watches the ports itself
+        self.boards = []
+        self.log_writer = RemoteLogWriter(self)
+        self.cycle_store_path = None
+        self.cycle_store_error = None
+        self.timestamp = LogTimestamp()
+
+        self._process = None
+        self._conn = None
+        self._ring = None
+        self._send_lock = threading.Lock()
+        self._stopping = False
+        self._threads = []
+
+        self._tokens = itertools.count()
+        self._pending = {}  # token -> Command awaiting its result
+        self._reconnect_callbacks = {}
+        self._connect_done = threading.Event()
+        self._connect_results = {}
+        self._link_stats = []
+        self._pending_count = 0
+        self._command_stats = {}
+
+    def start(self):
+        """Start the I/O process and wait until it has opened the log and cycle store
+
+        Raises RuntimeError if it fails to start; the paths (or errors) are
+        in log_writer and cycle_store_path/cycle_store_error.
+        """
+        # Not forked: this process has Qt and its threads loaded
+        context = multiprocessing.get_context("spawn")
+        condition = context.Condition()
+        self._ring = SharedRing(condition, self.ring_bytes)
+        self._conn, child_conn = context.Pipe()
+        self._process = context.Process(target=run_io_process, name="KeyswitchIO", daemon=True,
+                                        args=(child_conn, self._ring.name, condition, self.logs_dir, self.ports))
+        self._process.start()
+        child_conn.close()
+
+        if not self._conn.poll(IO_START_TIMEOUT):
+            self.stop()
+            raise RuntimeError("I/O process did not start")
+        try:
+            (_, self.log_writer.path, self.log_writer.error,
+             self.cycle_store_path, self.cycle_store_error) = self._conn.recv()
+        except EOFError:
+            self.stop()
+            raise RuntimeError("I/O process exited during startup")
+
+        for target, name in ((self._receive, "IOControl"), (self._consume, "IORing")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        """Ask the I/O process to close the ports and flush its files, then release the ring"""
+        if self._process is None:
+            return
+        self._stopping = True
+        self.send("stop")
+        self._process.join(IO_STOP_TIMEOUT)
+        if self._process.is_alive():
+            self._process.terminate()
+            self._process.join()
+        self._conn.close()
+        for thread in self._threads:
+            thread.join()
+        self._ring.close()
+        self._process = None
+
+    def send(self, *message):
+        """Send a request to the I/O process; False if it has gone"""
+        with self._send_lock:
+            try:
+                self._conn.send(message)
+                return True
+            except OSError:
+                return False
+
+    def _receive(self):
+        """Control thread: dispatch the I/O process's messages until the pipe closes"""
+        while True:
+            try:
+                name, *args = self._conn.recv()
+            except (EOFError, OSError):
+                break
+            getattr(self, f"_on_{name}")(*args)
+
+        if not self._stopping:
+            for board in self.boards:
+                board.connected = False
+            if self.on_line:
+                self.on_line(f"[{self.timestamp.now()}] ERROR: I/O process exited; restart the application")
+        # No results will come for commands still waiting
+        for token in list(self._pending):
+            self._on_done(token, False, None, "I/O process not running")
+        self._connect_done.set()
+
+    def _consume(self):
+        """Ring thread: hand each board's run of records to on_lines"""
+        ring = self._ring
+        while not self._stopping:
+            records = ring.get(IO_RING_WAIT)
+            if not records or not self.on_lines:
+                continue
+            decoded = [decode_record(record) for record in records]
+            for board_index, group in itertools.groupby(decoded, key=lambda item: item[0]):
+                group = list(group)
+                self.on_lines(board_index, [message for _, _, message in group], group[0][1])
+
+    def _set_boards(self, states):
+        self.boards = [RemoteBoard(index, port, connected) for index, (port, connected) in enumerate(states)]
+
+    def _on_connected(self, results, states):
+        self._set_boards(states)
+        self._connect_results = results
+        self._connect_done.set()
+
+    def _on_done(self, token, ok, latency, reason):
+        command = self._pending.pop(token, None)
+        if command is not None and command.on_done:
+            command.on_done(CommandResult(command, ok, latency, reason))
+
+    def _on_lost(self, index):
+        if index < len(self.boards):
+            self.boards[index].connected = False
+        if self.on_lost:
+            self.on_lost(index)
+
+    def _on_reconnected(self, index, states):
+        self._set_boards(states)
+        callback = self._reconnect_callbacks.pop(index, None)
+        if callback:
+            callback(index)
+
+    def _on_show(self, line):
+        if self.on_line:
+            self.on_line(line)
+
+    def _on_stats(self, link_stats, pending_count, command_stats, log_depth, log_errors, states):
+        self._link_stats = link_stats
+        self._pending_count = pending_count
+        self._command_stats = command_stats
+        self.log_writer.depth = log_depth
+        self.log_writer.errors += log_errors
+        # Boards this side has just marked lost stay lost until the I/O process reconnects them
+        lost = {board.index for board in self.boards if not board.connected}
+        self._set_boards((port, connected and index not in lost) for index, (port, connected) in enumerate(states))
+
+    def connect(self, ports):
+        """Open the ports in the I/O process; blocks (call it off the GUI thread) and returns {port: connected}"""
+        self._connect_done.clear()
+        self._connect_results = {}
+        if self.send("connect", list(ports)):
+            self._connect_done.wait()
+        return self._connect_results
+
+    def disconnect(self):
+        self.send("disconnect")
+        self.boards = []
+
+    def disconnect_board(self, index):
+        self.boards[index].connected = False
+        self.send("disconnect_board", index)
+
+    def reconnect(self, index, on_reconnected=None):
+        if on_reconnected:
+            self._reconnect_callbacks[index] = on_reconnected
+        self.send("reconnect", index)
+
+    def ports_changed(self):
+        self.send("ports_changed")
+
+    @property
+    def connected(self):
+        return any(board.connected for board in self.boards)
+
+    @property
+    def station_count(self):
+        return len(self.boards) * STATIONS_PER_BOARD
+
+    def locate(self, station):
+        """Map a global 0-based station index to (board, local station index)"""
+        board_index, local = divmod(station, STATIONS_PER_BOARD)
+        if station < 0 or board_index >= len(self.boards):
+            raise ValueError(f"Invalid station index: {station}")
+        return self.boards[board_index], local
+
+    def submit(self, name, station=None, on_done=None, board_index=None):
+        """Send a command through the I/O process; same routing and return value as BoardManager.submit"""
+        if station is not None:
+            board, local = self.locate(station)
+            targets = [(board, local, station, None)]
+        else:
+            boards = self.boards if board_index is None else [self.boards[board_index]]
+            targets = [(board, None, None, board.index) for board in boards if board.connected]
+
+        submitted = []
+        for board, arg, target_station, target_board in targets:
+            command = Command(name, arg, on_done=on_done)
+            token = next(self._tokens)
+            self._pending[token] = command
+            if not self.send("submit", token, name, target_station, target_board):
+                self._on_done(token, False, None, "I/O process not running")
+            submitted.append((board.index, command))
+        return submitted
+
+    def observe(self, board_index, message):
+        return None
+
+    def link_stats(self):
+        return self._link_stats
+
+    def pending_count(self):
+        return self._pending_count
+
+    def command_stats(self):
+        return self._command_stats
@@ -0,0 +1,128 @@
+"""Fixed-memory latency histograms for the host pipeline stages (no Qt dependency)"""
+import json
+import math
+import time
+
+# Bucket bounds grow geometrically from HISTOGRAM_MIN, giving about 10% resolution
+HISTOGRAM_MIN = 1e-6  # s
+HISTOGRAM_GROWTH = 1.2
+HISTOGRAM_BUCKETS = 102  # the last bucket collects everything above ~100 s
+
+_LOG_GROWTH = math.log(HISTOGRAM_GROWTH)
+
+# Stages timed by the GUI, in pipeline order
+STAGES = ("read", "parse", "model", "repaint", "log_write", "round_trip")
+
+STAGE_DESCRIPTIONS = {
+    "read": "reader thread -> GUI thread",
+    "parse": "parse_message",
+    "model": "message handler / model update",
+    "repaint": "model change -> station widgets",
+    "log_write": "log file group commit",
+    "round_trip": "REQUEST_STATE -> board reply",
+}
+
+def bucket_upper_bound(index):
+    """Upper bound in seconds of a histogram bucket"""
+    return HISTOGRAM_MIN * HISTOGRAM_GROWTH ** index
+
+class LatencyHistogram:
+    """Log-bucketed histogram of durations in seconds
+
+    Memory is fixed at HISTOGRAM_BUCKETS counters however many samples are
+    recorded; percentiles are accurate to one bucket.
+    """
+    __slots__ = ('counts', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.counts = [0] * HISTOGRAM_BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        """Add one sample"""
+        if seconds <= HISTOGRAM_MIN:
+            index = 0
+        else:
+            index = min(HISTOGRAM_BUCKETS - 1, int(math.log(seconds / HISTOGRAM_MIN) / _LOG_GROWTH) + 1)
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction of samples (capped at the maximum)"""
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target and count:
+                return min(bucket_upper_bound(index), self.max)
+        return self.max
+
+    def summary(self):
+        """Count, mean, p50/p90/p99 and max in seconds"""
+        return {
+            "count": self.count,
+            "mean": self.mean(),
+            "p50": self.percentile(0.50),
+            "p90": self.percentile(0.90),
+            "p99": self.percentile(0.99),
+            "max": self.max,
+        }
+
+    def to_dict(self):
+        """Summary plus the non-empty buckets as [upper bound, count] pairs"""
+        result = self.summary()
+        result["buckets"] = [[bucket_upper_bound(index), count]
+                             for index, count in enumerate(self.counts) if count]
+        return result
+
+class LatencyStats:
+    """One LatencyHistogram per pipeline stage"""
+    def __init__(self, stages=STAGES):
+        self.histograms = {stage: LatencyHistogram() for stage in stages}
+        self.since = time.time()
+
+    def histogram(self, stage):
+        return self.histograms[stage]
+
+    def record(self, stage, seconds):
+        self.histograms[stage].record(seconds)
+
+    def reset(self):
+        for histogram in self.histograms.values():
+            histogram.reset()
+        self.since = time.time()
+
+    def format_table(self):
+        """Plain-text table of every stage in milliseconds"""
+        lines = [f"{'stage':<11}{'count':>9}{'mean':>9}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}"]
+        for stage, histogram in self.histograms.items():
+            s = histogram.summary()
+            lines.append(f"{stage:<11}{s['count']:>9}" +
+                         "".join(f"{s[key] * 1000:>9.2f}" for key in ("mean", "p50", "p90", "p99", "max")))
+        lines.append(f"(ms, since {time.strftime('%H:%M:%S', time.localtime(self.since))})")
+        return "\n".join(lines)
+
+    def dump(self, path):
+        """Write every histogram to a JSON file"""
+        data = {
+            "created": time.time(),
+            "since": self.since,
+            "units": "seconds",
+            "stages": {stage: dict(histogram.to_dict(), description=STAGE_DESCRIPTIONS.get(stage, ""))
+                       for stage, histogram in self.histograms.items()},
+        }
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=2)
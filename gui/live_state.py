@@ -0,0 +1,236 @@
+"""Read-only live station state for remote viewers, served over HTTP (no Qt dependency)
+
+The host publishes the station changes it already coalesces for the
+display (StationModel.take_changes()). Each change is JSON-encoded once,
+on the host thread, into a numbered Server-Sent Event kept in a short
+history; the full snapshot is re-encoded at most once per change, by
+whichever request first needs it. Clients only ever get those shared
+bytes, so the number of viewers adds no work on the host thread.
+
+    GET /        a small page that renders the stations live
+    GET /state   the snapshot as JSON (ETag is the version)
+    GET /events  SSE: a "snapshot" event, then one "change" event per update;
+                 reconnecting with Last-Event-ID resumes from the history
+"""
+import collections
+import http.server
+import json
+import threading
+
+from constants import LIVE_STATE_HOST, LIVE_STATE_HISTORY, LIVE_STATE_KEEPALIVE
+
+class LiveState:
+    """The published station state: a cached snapshot plus numbered change events
+
+    publish() and reset() are called from the host thread; the rest is
+    used by the server's client threads.
+    """
+    def __init__(self, station_ids=(), history=LIVE_STATE_HISTORY):
+        self.version = 0
+        self.closed = False
+        self._stations = {}
+        self._system = {"running": None}
+        self._snapshot = None  # (version, JSON bytes), rebuilt lazily
+        self._events = collections.deque(maxlen=history)  # (version, SSE bytes)
+        self._changed = threading.Condition()
+        self.reset(station_ids)
+
+    def reset(self, station_ids):
+        """Start over with empty stations (e.g. after the namespace was resized); clients get a new snapshot"""
+        with self._changed:
+            self._stations = {station_id: {} for station_id in station_ids}
+            self.version += 1
+            self._snapshot = None
+            # A gap in the history makes followers resync from the snapshot
+            self._events.clear()
+            self._changed.notify_all()
+
+    def publish(self, changes=None, **system):
+        """Publish {station_id: {field: value}} changes and/or system fields (e.g. running=True)"""
+        changes = {station_id: {field: _publishable(value) for field, value in fields.items()}
+                   for station_id, fields in (changes or {}).items() if station_id in self._stations}
+        system = {key: value for key, value in system.items() if self._system.get(key) != value}
+        if not changes and not system:
+            return
+        with self._changed:
+            self.version += 1
+            for station_id, fields in changes.items():
+                self._stations[station_id].update(fields)
+            self._system.update(system)
+            delta = {"version": self.version, "stations": changes, "system": system}
+            self._events.append((self.version, _event("change", self.version, delta)))
+            self._changed.notify_all()
+
+    def snapshot(self):
+        """(version, JSON bytes) of the whole state, encoded once per version"""
+        with self._changed:
+            if self._snapshot is None or self._snapshot[0] != self.version:
+                data = {"version": self.version, "stations": self._stations, "system": self._system}
+                self._snapshot = (self.version, json.dumps(data, separators=(",", ":")).encode())
+            return self._snapshot
+
+    def events_after(self, version, timeout):
+        """SSE bytes of the changes after version, waiting up to timeout for one
+
+        Returns (new version, list of events) or (version, None) when the
+        history no longer reaches back to version and the client needs a
+        snapshot.
+        """
+        with self._changed:
+            if self.version == version and not self.closed:
+                self._changed.wait(timeout)
+            if self.version == version:
+                return version, []
+            # Also covers a Last-Event-ID from before the host restarted
+            if not self._events or self._events[0][0] > version + 1 or version > self.version:
+                return version, None
+            return self.version, [event for event_version, event in self._events if event_version > version]
+
+    def close(self):
+        """Wake every waiting client so its stream ends"""
+        with self._changed:
+            self.closed = True
+            self._changed.notify_all()
+
+def _publishable(value):
+    # Binary telemetry carries float32 currents; don't publish their rounding noise
+    return round(value, 4) if isinstance(value, float) else value
+
+def _event(name, version, data):
+    return f"id: {version}\nevent: {name}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode()
+
+class LiveStateServer:
+    """Serves a LiveState to any number of viewers from background threads
+
+    Port 0 picks a free port; the bound port is in .port after start().
+    """
+    def __init__(self, state, port, host=LIVE_STATE_HOST):
+        self.state = state
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        """Bind the port and start serving; raises OSError if the port is taken"""
+        state = self.state
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                path = self.path.split("?", 1)[0]
+                if path == "/":
+                    self._send(200, "text/html; charset=utf-8", VIEWER_PAGE)
+                elif path == "/state":
+                    version, body = state.snapshot()
+                    if self.headers.get("If-None-Match") == f'"{version}"':
+                        self._send(304, None, b"", {"ETag": f'"{version}"'})
+                    else:
+                        self._send(200, "application/json", body, {"ETag": f'"{version}"'})
+                elif path == "/events":
+                    self._stream()
+                else:
+                    self._send(404, "text/plain", b"not found\n")
+
+            def _send(self, status, content_type, body, headers=None):
+                self.send_response(status)
+                if content_type:
+                    self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("Cache-Control", "no-cache")
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _stream(self):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+                try:
+                    # A reconnecting EventSource resumes after the last event it saw
+                    version, events = state.events_after(int(self.headers.get("Last-Event-ID", "")), 0)
+                except ValueError:
+                    version, events = -1, None
+                try:
+                    while not state.closed:
+                        if events is None:
+                            # New client, or one that fell behind the history
+                            version, body = state.snapshot()
+                            self.wfile.write(b"id: %d\nevent: snapshot\ndata: %s\n\n" % (version, body))
+                        elif events:
+                            self.wfile.write(b"".join(events))
+                        else:
+                            # Keeps proxies from closing an idle stream and finds dead clients
+                            self.wfile.write(b": keepalive\n\n")
+                        self.wfile.flush()
+                        version, events = state.events_after(version, LIVE_STATE_KEEPALIVE)
+                except (ConnectionError, OSError):
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = http.server.ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="LiveStateServer", daemon=True)
+        self._thread.start()
+        return self.port
+
+    @property
+    def url(self):
+        host = "localhost" if self.host in ("", "0.0.0.0") else self.host
+        return f"http://{host}:{self.port}/"
+
+    def stop(self):
+        if self._server is None:
+            return
+        self.state.close()
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+        self._server = None
+
+VIEWER_PAGE = b"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Keyswitch Tester</title>
+<style>
+body { font-family: Arial, sans-serif; background: #f9f9f9; color: #333; }
+table { border-collapse: collapse; background: white; }
+th, td { border: 1px solid #e0e0e0; padding: 6px 12px; text-align: right; }
+th { color: #2196F3; }
+.off { color: #999; }
+</style></head>
+<body>
+<h3>Keyswitch Tester <span id="state">connecting...</span></h3>
+<table><thead><tr><th>Station</th><th>Cycle Count</th><th>Failures</th><th>KSwitch (A)</th>
+<th>Starter (A)</th><th>Enabled</th></tr></thead><tbody id="stations"></tbody></table>
+<script>
+let state = {stations: {}, system: {}};
+function render() {
+  const running = state.system.running;
+  document.getElementById("state").textContent = running == null ? "" : running ? "(running)" : "(stopped)";
+  const fixed = v => v == null ? "-" : v.toFixed(2);
+  document.getElementById("stations").innerHTML = Object.keys(state.stations).map(id => {
+    const s = state.stations[id];
+    return `<tr class="${s.enabled === false ? "off" : ""}"><td>Station ${id}</td><td>${s.cycle_count ?? "-"}</td>` +
+           `<td>${s.failure_count ?? "-"}</td><td>${fixed(s.keyswitch_current)}</td>` +
+           `<td>${fixed(s.starter_current)}</td><td>${s.enabled == null ? "-" : s.enabled ? "ON" : "OFF"}</td></tr>`;
+  }).join("");
+}
+const events = new EventSource("events");
+events.addEventListener("snapshot", e => { state = JSON.parse(e.data); render(); });
+events.addEventListener("change", e => {
+  const delta = JSON.parse(e.data);
+  for (const id in delta.stations) Object.assign(state.stations[id] ??= {}, delta.stations[id]);
+  Object.assign(state.system, delta.system);
+  render();
+});
+events.onerror = () => { document.getElementById("state").textContent = "(reconnecting...)"; };
+</script>
+</body></html>
+"""
@@ -0,0 +1,66 @@
+import gzip
+import time
+
+# Matches the Qt "yyyy-MM-dd HH:mm:ss" prefix used in log files
+LOG_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+class LogTimestamp:
+    """Cheap 'yyyy-MM-dd HH:mm:ss.zzz' timestamps for log lines
+    
+    The date/time part is only re-rendered when the second changes, so
+    formatting a burst of messages costs one integer compare and an f-string each.
+    """
+    def __init__(self):
+        self._second = None
+        self._prefix = ""
+    
+    def now(self):
+        """Return the current time formatted for a log line"""
+        return self.format(time.time())
+    
+    def format(self, timestamp):
+        """Format a time.time() value"""
+        # Rounded, not truncated: float error would otherwise log many times 1 ms early
+        second, millis = divmod(round(timestamp * 1000), 1000)
+        if second != self._second:
+            self._second = second
+            self._prefix = time.strftime(LOG_TIMESTAMP_FORMAT, time.localtime(second))
+        return f"{self._prefix}.{millis:03d}"
+
+# "[yyyy-MM-dd HH:mm:ss.zzz] " prefix written in front of every log message
+LOG_PREFIX_LENGTH = 26
+
+# Sidecar index file of a log (see log_index.py), removed when the log is compressed
+LOG_INDEX_SUFFIX = ".idx"
+
+def split_log_line(line):
+    """Split a log file line into (timestamp text, message); timestamp is None for header lines"""
+    if len(line) >= LOG_PREFIX_LENGTH and line[0] == "[" and line[24] == "]":
+        return line[1:24], line[LOG_PREFIX_LENGTH:].rstrip("\r\n")
+    return None, line.rstrip("\r\n")
+
+def open_log(path):
+    """Open a plain or gzip-rotated log file for reading as text"""
+    if path.endswith(".gz"):
+        return gzip.open(path, 'rt', encoding='utf-8', errors='replace')
+    return open(path, 'r', encoding='utf-8', errors='replace')
+
+def iter_log_messages(path):
+    """Yield the message part of every timestamped line in a log file"""
+    with open_log(path) as f:
+        for line in f:
+            timestamp, message = split_log_line(line)
+            if timestamp is not None:
+                yield message
+
+def format_board_message(board_index, message):
+    """Tag a board's message for the log when more than one board is attached"""
+    return f"[B{board_index + 1}] {message}"
+
+def split_board_tag(message):
+    """Split a logged message into (0-based board index, message); untagged messages belong to board 0"""
+    if message.startswith("[B"):
+        end = message.find("] ", 2)
+        if end > 2 and message[2:end].isdigit():
+            return int(message[2:end]) - 1, message[end + 2:]
+    return 0, message
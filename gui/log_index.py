@@ -0,0 +1,321 @@
+"""Sidecar index for plain-text session logs (no Qt dependency; requires numpy)
+
+A log file keyswitch_log_*.txt gets a keyswitch_log_*.txt.idx next to it
+holding one fixed-width record per line: timestamp, byte offset, message
+type, board and station. The index is built in one streaming pass (lines are
+split and their timestamps parsed with vectorized NumPy operations, a chunk
+at a time) and extended from where it stopped when the log has grown.
+Queries filter the memory-mapped records and read only the matching lines
+from the memory-mapped log.
+
+Timestamps are the log's local wall-clock times as seconds on a naive
+(timezone-free) scale; use parse_log_time() for query bounds.
+"""
+import bisect
+import calendar
+import mmap
+import os
+import re
+import struct
+import time
+import zlib
+import numpy as np
+from constants import STATIONS_PER_BOARD
+from log_format import LOG_PREFIX_LENGTH, LOG_TIMESTAMP_FORMAT, LOG_INDEX_SUFFIX
+
+INDEX_MAGIC = b"KSLX"
+INDEX_VERSION = 1
+# magic, version, record size, records, indexed bytes, CRC of the log's first line, sorted flag, last timestamp
+INDEX_HEADER = struct.Struct("<4sHHQQIB3xd")
+INDEX_RECORD_DTYPE = np.dtype([
+    ("timestamp", "<f8"),
+    ("offset", "<u8"),
+    ("type", "u1"),
+    ("board", "u1"),
+    ("station", "<i2"),  # 0-based global station, -1 if the line names none
+])
+INDEX_CHUNK_BYTES = 16 * 1024 * 1024
+_HEAD_BYTES = 256
+
+# Line types, by code
+LINE_TYPES = ("OTHER", "CYCLE", "STATION", "SYSTEM_STATE", "EVENT", "ERROR", "WARNING")
+LINE_OTHER, LINE_CYCLE, LINE_STATION, LINE_SYSTEM_STATE, LINE_EVENT, LINE_ERROR, LINE_WARNING = range(len(LINE_TYPES))
+
+# Firmware events name 0-based local stations; host messages use 1-based global station ids
+_EVENT_STATION = re.compile(rb"[Ss]tation (?:index: )?(\d+)")
+_HOST_STATION = re.compile(rb"[Ss]tation (\d+)")
+
+# Byte offsets of the timestamp fields within "[yyyy-MM-dd HH:mm:ss.zzz]"
+_DIGITS = np.array([1, 2, 3, 4, 6, 7, 9, 10, 12, 13, 15, 16, 18, 19, 21, 22, 23])
+_SEPARATORS = np.array([0, 5, 8, 11, 14, 17, 20, 24])
+_SEPARATOR_BYTES = np.frombuffer(b"[-- ::.]", dtype=np.uint8)
+
+def parse_log_time(text):
+    """Parse 'yyyy-mm-dd HH:MM:SS[.fff]' (or a date alone) onto the index's timestamp scale"""
+    text = text.strip()
+    whole, _, fraction = text.partition(".")
+    for layout in (LOG_TIMESTAMP_FORMAT, "%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            seconds = calendar.timegm(time.strptime(whole, layout))
+            break
+        except ValueError:
+            continue
+    else:
+        raise ValueError(f"Invalid time: {text!r} (expected yyyy-mm-dd HH:MM:SS)")
+    return seconds + (float(f"0.{fraction}") if fraction.isdigit() else 0.0)
+
+def format_log_time(seconds):
+    """Inverse of parse_log_time, to millisecond precision"""
+    whole, millis = divmod(round(seconds * 1000), 1000)
+    return f"{time.strftime(LOG_TIMESTAMP_FORMAT, time.gmtime(whole))}.{millis:03d}"
+
+def _days_from_civil(year, month, day):
+    """Days since 1970-01-01 for proleptic Gregorian dates (vectorized)"""
+    year = year - (month <= 2)
+    era = year // 400
+    year_of_era = year - era * 400
+    day_of_year = (153 * (month + np.where(month > 2, -3, 9)) + 2) // 5 + day - 1
+    day_of_era = year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year
+    return era * 146097 + day_of_era - 719468
+
+def index_chunk(chunk, base_offset=0, last_timestamp=np.nan):
+    """Build the records for a chunk of complete lines starting at byte base_offset
+
+    Lines before the first timestamped one get last_timestamp (the previous
+    chunk's last), or the first timestamp in the chunk when that is NaN.
+    """
+    data = np.frombuffer(chunk, dtype=np.uint8)
+    ends = np.flatnonzero(data == 10)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    lengths = ends - starts
+    # Padding lets fixed-offset reads run past the last line; results there are masked by length
+    data = np.concatenate((data, np.zeros(LOG_PREFIX_LENGTH + 32, dtype=np.uint8)))
+
+    records = np.zeros(len(starts), dtype=INDEX_RECORD_DTYPE)
+    records["offset"] = starts + base_offset
+    records["station"] = -1
+
+    # Timestamped lines: separators in place and every field a digit
+    stamped = lengths >= LOG_PREFIX_LENGTH
+    stamped &= (data[starts[:, None] + _SEPARATORS] == _SEPARATOR_BYTES).all(axis=1)
+    digits = data[starts[:, None] + _DIGITS].astype(np.int64) - 48
+    stamped &= ((digits >= 0) & (digits <= 9)).all(axis=1)
+
+    lines = np.flatnonzero(stamped)
+    d = digits[lines]
+    year = d[:, 0] * 1000 + d[:, 1] * 100 + d[:, 2] * 10 + d[:, 3]
+    seconds = (_days_from_civil(year, d[:, 4] * 10 + d[:, 5], d[:, 6] * 10 + d[:, 7]) * 86400 +
+               (d[:, 8] * 10 + d[:, 9]) * 3600 + (d[:, 10] * 10 + d[:, 11]) * 60 + d[:, 12] * 10 + d[:, 13])
+    timestamps = np.full(len(starts), np.nan)
+    timestamps[lines] = seconds + (d[:, 14] * 100 + d[:, 15] * 10 + d[:, 16]) / 1000.0
+
+    # Lines without a timestamp (headers) take the previous line's, or the first one's at the start of the log
+    filled = np.where(stamped, np.arange(len(starts)), -1)
+    np.maximum.accumulate(filled, out=filled)
+    if np.isnan(last_timestamp) and len(lines):
+        last_timestamp = timestamps[lines[0]]
+    records["timestamp"] = np.where(filled >= 0, timestamps[np.maximum(filled, 0)], last_timestamp)
+
+    # Optional "[Bn] " board tag after the prefix (one or two digits)
+    position = starts[lines] + LOG_PREFIX_LENGTH
+    remaining = lengths[lines] - LOG_PREFIX_LENGTH
+    tagged = (data[position] == ord("[")) & (data[position + 1] == ord("B"))
+    first_digit = data[position + 2] - 48
+    second_digit = data[position + 3] - 48
+    one = tagged & (first_digit <= 9) & (data[position + 3] == ord("]")) & (data[position + 4] == ord(" "))
+    two = (tagged & (first_digit <= 9) & (second_digit <= 9) &
+           (data[position + 4] == ord("]")) & (data[position + 5] == ord(" ")))
+    boards = np.where(one, first_digit, np.where(two, first_digit.astype(np.int64) * 10 + second_digit, 1)) - 1
+    boards = np.clip(boards, 0, 255)
+    skip = np.where(one, 5, np.where(two, 6, 0))
+    position = position + skip
+    remaining = remaining - skip
+    records["board"][lines] = boards
+
+    def at(offset, char):
+        return data[position + offset] == ord(char)
+
+    types = np.full(len(lines), LINE_OTHER, dtype=np.uint8)
+    types[at(0, "C") & at(1, "Y") & at(5, ":") & (remaining > 6)] = LINE_CYCLE
+    types[at(0, "S") & at(1, "T") & at(7, ":") & (remaining > 8)] = LINE_STATION
+    types[at(0, "S") & at(1, "Y") & at(2, "S") & at(12, ":") & (remaining > 13)] = LINE_SYSTEM_STATE
+    types[at(0, "E") & at(1, "V") & at(5, ":") & (remaining > 6)] = LINE_EVENT
+    types[at(0, "E") & at(1, "R") & at(2, "R") & (remaining >= 5)] = LINE_ERROR
+    types[at(0, "W") & at(1, "A") & at(2, "R") & (remaining >= 7)] = LINE_WARNING
+    records["type"][lines] = types
+
+    # CYCLE/STATION carry the board's 0-based station right after the first colon
+    stations = np.full(len(lines), -1, dtype=np.int64)
+    for code, offset in ((LINE_CYCLE, 6), (LINE_STATION, 8)):
+        digit = data[position + offset].astype(np.int64) - 48
+        valid = (types == code) & (digit >= 0) & (digit <= 9) & at(offset + 1, ":")
+        stations[valid] = boards[valid] * STATIONS_PER_BOARD + digit[valid]
+    records["station"][lines] = stations
+
+    # Free-text lines are rare; look for a station number in each one
+    for line in np.flatnonzero(np.isin(records["type"], (LINE_EVENT, LINE_ERROR, LINE_WARNING))):
+        text = chunk[starts[line] + LOG_PREFIX_LENGTH:ends[line]]
+        if records["type"][line] == LINE_EVENT:
+            match = _EVENT_STATION.search(text)
+            if match:
+                records["station"][line] = int(records["board"][line]) * STATIONS_PER_BOARD + int(match.group(1))
+        else:
+            match = _HOST_STATION.search(text)
+            if match and int(match.group(1)) > 0:
+                records["station"][line] = int(match.group(1)) - 1
+    return records
+
+class LogIndex:
+    """Index of one plain-text log file, kept in `<log>.idx`
+
+    update() brings the index up to date with the log and returns how many
+    lines were added; query() returns the record numbers of matching lines
+    and lines() reads them from the log.
+    """
+    def __init__(self, log_path, index_path=None):
+        if log_path.endswith(".gz"):
+            raise ValueError(f"{log_path} is compressed; decompress it to index it")
+        self.log_path = log_path
+        self.index_path = index_path or log_path + LOG_INDEX_SUFFIX
+        self.records = np.zeros(0, dtype=INDEX_RECORD_DTYPE)
+        self.indexed_bytes = 0
+        self.sorted = True
+        self.last_timestamp = np.nan
+        self._head_crc = 0
+
+    def _log_head_crc(self, f):
+        """CRC of the log's first line, used to notice a log replaced under the same name"""
+        f.seek(0)
+        head = f.read(_HEAD_BYTES)
+        end = head.find(b"\n")
+        return zlib.crc32(head[:end + 1]) if end >= 0 else 0
+
+    def _read_header(self):
+        """Header fields of the existing index, or None if it is missing or unusable"""
+        try:
+            with open(self.index_path, 'rb') as f:
+                header = f.read(INDEX_HEADER.size)
+        except OSError:
+            return None
+        if len(header) < INDEX_HEADER.size:
+            return None
+        magic, version, record_size, records, indexed, head_crc, is_sorted, last = INDEX_HEADER.unpack(header)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION or record_size != INDEX_RECORD_DTYPE.itemsize:
+            return None
+        return records, indexed, head_crc, bool(is_sorted), last
+
+    def update(self, rebuild=False):
+        """Index lines appended since the last update (or everything); returns the number added"""
+        size = os.path.getsize(self.log_path)
+        with open(self.log_path, 'rb') as log:
+            head_crc = self._log_head_crc(log)
+            header = None if rebuild else self._read_header()
+            if header is not None:
+                count, indexed, stored_crc, is_sorted, last = header
+                # The record count in the header is authoritative; anything after it is a torn append
+                if (indexed > size or (indexed and stored_crc != head_crc) or
+                        os.path.getsize(self.index_path) < INDEX_HEADER.size + count * INDEX_RECORD_DTYPE.itemsize):
+                    header = None
+            if header is None:
+                count, indexed, is_sorted, last = 0, 0, True, np.nan
+
+            mode = 'r+b' if header is not None else 'w+b'
+            added = 0
+            with open(self.index_path, mode) as index:
+                if header is None:
+                    index.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, INDEX_RECORD_DTYPE.itemsize,
+                                                  0, 0, 0, 1, np.nan))
+                index.truncate(INDEX_HEADER.size + count * INDEX_RECORD_DTYPE.itemsize)
+                index.seek(0, os.SEEK_END)
+
+                log.seek(indexed)
+                carry = b""
+                while True:
+                    block = log.read(INDEX_CHUNK_BYTES)
+                    if not block:
+                        break
+                    block = carry + block
+                    end = block.rfind(b"\n") + 1
+                    carry = block[end:]
+                    if not end:
+                        continue
+                    chunk_records = index_chunk(block[:end], indexed, last)
+                    timestamps = chunk_records["timestamp"]
+                    if is_sorted and len(timestamps):
+                        is_sorted = not timestamps[0] < last and not (np.diff(timestamps) < 0).any()
+                    last = timestamps[-1]
+                    index.write(chunk_records.tobytes())
+                    indexed += end
+                    count += len(chunk_records)
+                    added += len(chunk_records)
+
+                # A partial last line is left for the next update
+                index.seek(0)
+                index.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, INDEX_RECORD_DTYPE.itemsize,
+                                              count, indexed, head_crc, 1 if is_sorted else 0, last))
+
+        self.indexed_bytes = indexed
+        self.sorted = is_sorted
+        self.last_timestamp = last
+        self._head_crc = head_crc
+        self._map(count)
+        return added
+
+    def _map(self, count):
+        if count:
+            self.records = np.memmap(self.index_path, dtype=INDEX_RECORD_DTYPE, mode='r',
+                                     offset=INDEX_HEADER.size, shape=(count,))
+        else:
+            self.records = np.zeros(0, dtype=INDEX_RECORD_DTYPE)
+
+    def __len__(self):
+        return len(self.records)
+
+    def query(self, start=None, end=None, types=None, stations=None, boards=None, first=0):
+        """Record numbers of lines in [start, end] matching the filters, from record `first` on
+
+        types are LINE_TYPES names or codes; stations and boards are 0-based.
+        """
+        records = self.records[first:]
+        lo, hi = 0, len(records)
+        timestamps = records["timestamp"]
+        if self.sorted:
+            # Binary search the time range instead of scanning it (bisect touches ~log2(n) records;
+            # np.searchsorted would first copy the whole strided column)
+            if start is not None:
+                lo = bisect.bisect_left(timestamps, start)
+            if end is not None:
+                hi = bisect.bisect_right(timestamps, end, lo)
+            mask = np.ones(max(0, hi - lo), dtype=bool)
+        else:
+            mask = np.ones(hi, dtype=bool)
+            if start is not None:
+                mask &= timestamps >= start
+            if end is not None:
+                mask &= timestamps <= end
+            lo = 0
+        window = records[lo:lo + len(mask)]
+        if types is not None:
+            codes = [LINE_TYPES.index(t.upper()) if isinstance(t, str) else t for t in types]
+            mask &= np.isin(window["type"], codes)
+        if stations is not None:
+            mask &= np.isin(window["station"], list(stations))
+        if boards is not None:
+            mask &= np.isin(window["board"], list(boards))
+        return np.flatnonzero(mask) + lo + first
+
+    def lines(self, numbers):
+        """Yield the text of the given record numbers, read through a memory map of the log"""
+        if not len(numbers):
+            return
+        with open(self.log_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            offsets = self.records["offset"]
+            for number in numbers:
+                offset = int(offsets[number])
+                end = view.find(b"\n", offset)
+                yield view[offset:end if end >= 0 else len(view)].decode('utf-8', errors='replace').rstrip("\r")
+
+    def type_counts(self):
+        """{type name: line count}"""
+        counts = np.bincount(self.records["type"], minlength=len(LINE_TYPES))
+        return {name: int(count) for name, count in zip(LINE_TYPES, counts)}
@@ -0,0 +1,233 @@
+import atexit
+import gzip
+import os
+import queue
+import shutil
+import threading
+import time
+from log_format import LogTimestamp, LOG_TIMESTAMP_FORMAT, LOG_INDEX_SUFFIX
+from constants import (LOG_QUEUE_SIZE, LOG_FLUSH_INTERVAL, LOG_FLUSH_LINES,
+                       LOG_ROTATE_BYTES, LOG_ROTATE_SECONDS)
+
+class LogWriter:
+    """Writes log lines to rotating files from a background thread
+    
+    write() never blocks: lines go into a bounded queue and the writer thread
+    commits them in groups, flushing every LOG_FLUSH_INTERVAL seconds or
+    LOG_FLUSH_LINES lines. Files are rotated by size or age and rotated
+    segments are gzipped on a separate thread. If commit_latency is given
+    (anything with a record(seconds) method), the duration of each group
+    commit is recorded into it.
+    """
+    _STOP = object()
+    
+    def __init__(self, directory, prefix="keyswitch_log", max_bytes=LOG_ROTATE_BYTES,
+                 max_age=LOG_ROTATE_SECONDS, flush_interval=LOG_FLUSH_INTERVAL,
+                 flush_lines=LOG_FLUSH_LINES, queue_size=LOG_QUEUE_SIZE, commit_latency=None):
+        self.directory = directory
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.flush_interval = flush_interval
+        self.flush_lines = flush_lines
+        self.commit_latency = commit_latency
+        
+        self.path = None
+        self.dropped = 0
+        self.segment = 0
+        
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._file = None
+        self._file_bytes = 0
+        self._file_opened = 0.0
+        self._timestamp = LogTimestamp()
+        self._errors = []
+        self._errors_lock = threading.Lock()
+        self._dropped_lock = threading.Lock()
+        self._thread = None
+        self._compressors = []
+    
+    def open(self):
+        """Open the first log file and start the writer thread"""
+        os.makedirs(self.directory, exist_ok=True)
+        self._open_segment()
+        self._thread = threading.Thread(target=self._run, name="LogWriter", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+        return self.path
+    
+    def write(self, line):
+        """Queue a line (including its newline) for writing; returns False if it was dropped"""
+        try:
+            self._queue.put_nowait(line)
+            return True
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+            return False
+    
+    def queue_depth(self):
+        """Number of lines waiting to be written"""
+        return self._queue.qsize()
+    
+    def take_errors(self):
+        """Return and clear error messages reported by the writer thread"""
+        with self._errors_lock:
+            errors, self._errors = self._errors, []
+        return errors
+    
+    def close(self, timeout=5.0):
+        """Flush everything queued, close the file and wait for pending compression"""
+        thread = self._thread
+        if thread is None:
+            return
+        self._thread = None
+        atexit.unregister(self.close)
+        
+        # The stop marker must not be dropped, so this put may block briefly
+        self._queue.put(self._STOP)
+        thread.join(timeout)
+        
+        for compressor in self._compressors:
+            compressor.join(timeout)
+        self._compressors = []
+    
+    def _run(self):
+        """Writer thread body: group-commit queued lines until the stop marker arrives"""
+        last_flush = time.monotonic()
+        unflushed = 0
+        
+        while True:
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                batch = []
+            
+            # Drain whatever else is already queued into the same commit
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            stopping = self._STOP in batch
+            if stopping:
+                batch = [line for line in batch if line is not self._STOP]
+            
+            with self._dropped_lock:
+                dropped, self.dropped = self.dropped, 0
+            if dropped:
+                batch.append(f"[{self._timestamp.now()}] === {dropped} log lines dropped (writer queue full) ===\n")
+            
+            commit_start = time.perf_counter()
+            if batch:
+                self._write_batch(batch)
+                unflushed += len(batch)
+            
+            now = time.monotonic()
+            if unflushed and (stopping or unflushed >= self.flush_lines or now - last_flush >= self.flush_interval):
+                self._flush()
+                last_flush = now
+                unflushed = 0
+            if batch and self.commit_latency is not None:
+                self.commit_latency.record(time.perf_counter() - commit_start)
+            
+            if stopping:
+                self._close_file()
+                return
+            
+            if self._file_bytes >= self.max_bytes or now - self._file_opened >= self.max_age:
+                self._rotate()
+    
+    def _write_batch(self, batch):
+        """Write a group of lines with one call, reopening the file if the write fails"""
+        data = "".join(batch)
+        try:
+            if self._file is None:
+                self._open_segment()
+            self._file.write(data)
+            # Rotation is by size on disk, so count encoded bytes
+            self._file_bytes += len(data) if data.isascii() else len(data.encode(self._file.encoding, 'replace'))
+        except Exception as e:
+            self._report_error(f"Failed to write to log file: {str(e)}")
+            self._close_file()
+    
+    def _flush(self):
+        """Push buffered data to the operating system"""
+        if self._file:
+            try:
+                self._file.flush()
+            except Exception as e:
+                self._report_error(f"Failed to flush log file: {str(e)}")
+                self._close_file()
+    
+    def _open_segment(self):
+        """Open a new timestamped log file"""
+        stamp = time.strftime("%Y%m%d_%H%M%S")
+        path = os.path.join(self.directory, f"{self.prefix}_{stamp}.txt")
+        suffix = 1
+        while os.path.exists(path) or os.path.exists(path + ".gz"):
+            path = os.path.join(self.directory, f"{self.prefix}_{stamp}_{suffix}.txt")
+            suffix += 1
+        
+        self._file = open(path, 'a')
+        self._file_bytes = 0
+        self._file_opened = time.monotonic()
+        self.path = path
+        
+        started = time.strftime(LOG_TIMESTAMP_FORMAT)
+        if self.segment == 0:
+            header = f"=== Keyswitch Tester Log Started at {started} ===\n"
+        else:
+            header = f"=== Keyswitch Tester Log Continued at {started} (segment {self.segment + 1}) ===\n"
+        self._file.write(header)
+        self._file.flush()
+        self.segment += 1
+    
+    def _close_file(self):
+        """Close the current file, ignoring errors"""
+        if self._file:
+            try:
+                self._file.close()
+            except Exception:
+                pass
+            self._file = None
+    
+    def _rotate(self):
+        """Start a new segment and compress the previous one in the background"""
+        finished = self.path
+        self._flush()
+        self._close_file()
+        try:
+            self._open_segment()
+        except Exception as e:
+            self._report_error(f"Failed to open log file: {str(e)}")
+        
+        if finished and os.path.exists(finished):
+            self._compressors = [t for t in self._compressors if t.is_alive()]
+            compressor = threading.Thread(target=self._compress, args=(finished,), name="LogCompressor")
+            compressor.start()
+            self._compressors.append(compressor)
+    
+    def _compress(self, path):
+        """Gzip a finished segment; the original is only removed once the archive is complete"""
+        temp_path = path + ".gz.tmp"
+        try:
+            with open(path, 'rb') as source, gzip.open(temp_path, 'wb') as target:
+                shutil.copyfileobj(source, target, 1024 * 1024)
+            os.replace(temp_path, path + ".gz")
+            os.remove(path)
+            # An index built while the segment was live no longer has a log to point into
+            if os.path.exists(path + LOG_INDEX_SUFFIX):
+                os.remove(path + LOG_INDEX_SUFFIX)
+        except Exception as e:
+            self._report_error(f"Failed to compress {path}: {str(e)}")
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+    
+    def _report_error(self, message):
+        """Record an error for the owner to pick up with take_errors()"""
+        with self._errors_lock:
+            self._errors.append(message)
@@ -1,25 +1,92 @@
 import sys
+import argparse
 import time
 import os
+import threading
 from PySide6.QtWidgets import (QApplication, QMainWindow, QVBoxLayout, QWidget, 
                               QMessageBox, QHBoxLayout, QSplitter, QFrame)
-from PySide6.QtCore import QTimer, Qt
+from PySide6.QtCore import QTimer, Qt, Signal
 
 from constants import (WINDOW_TITLE, WINDOW_MIN_WIDTH, WINDOW_MIN_HEIGHT,
-                      SERIAL_CHECK_INTERVAL, MAIN_WINDOW_STYLE)
-from serial_communication import SerialManager
-from gui_components import ControlWidget, SerialLogWidget, StationStatusWidget
+                      MAIN_WINDOW_STYLE, LOGS_DIR, STATION_REFRESH_INTERVAL,
+                      STATIONS_PER_BOARD, LATENCY_PROBE_INTERVAL, DRIFT_CHECK_INTERVAL,
+                      METRICS_UPDATE_INTERVAL)
+from log_format import format_board_message
+from board_manager import BoardManager, format_link_stats
+from io_process import RemoteBoardManager
+from port_watcher import PortWatcher
+from cycle_store import CycleStore
+from latency import LatencyStats
+from metrics import HostMetrics, MetricsServer
+from live_state import LiveState, LiveStateServer
+from station_model import StationModel
+from trends import TrendBuffer
+from drift import DriftDetector, format_alert
+from messages import (parse_message, format_message, MessageParseError, CycleMessage,
+                      StationMessage, SystemStateMessage)
+from gui_components import ControlWidget, SerialLogWidget, StationStatusWidget, DiagnosticsWidget, TrendWidget
 
 class KeyswitchTesterGUI(QMainWindow):
-    # Define message types for cleaner code
-    COMMAND_START = b"START\n"
-    COMMAND_STOP = b"STOP\n"
+    # Emitted from background threads; Qt queues delivery onto the GUI thread
+    serial_lines_received = Signal(int, list, float)  # board index, lines, perf_counter() when read
+    serial_connection_lost = Signal(int)  # board index
+    connection_finished = Signal(object)  # {port: connected}
+    board_reconnected = Signal(int)  # board index
+    ports_changed = Signal(list)  # attached OpenRB ports
+    command_finished = Signal(object, object)  # callback, CommandResult
+    io_line_shown = Signal(str)  # line already logged by the I/O process
     
-    def __init__(self):
+    def __init__(self, ports=None, metrics_port=None, live_port=None, io_process=False):
         super().__init__()
+        
+        # Ports to attach; auto-detected when empty
+        self.ports = list(ports or [])
+        
+        # Boards, log file and cycle store owned by a separate process (--io-process)
+        self.io_process = None
+        io_error = None
+        if io_process:
+            self.io_process = RemoteBoardManager(LOGS_DIR, self.ports)
+            try:
+                self.io_process.start()
+            except (RuntimeError, OSError) as e:
+                self.io_process, io_error = None, str(e)
+        
+        # Rig health counters, served over HTTP when a metrics port is given
+        self.metrics = HostMetrics()
+        self.metrics_server = None
+        self._batches_received = {}  # board index -> batches emitted by its reader thread
+        self._batches_handled = 0
+        
+        # Station state published to remote viewers when a live port is given
+        self.live_state = None
+        self.live_server = None
+        
+        # Parsed message type -> handler
+        self._message_handlers = {
+            CycleMessage: self._process_cycle_message,
+            StationMessage: self._process_station_message,
+            SystemStateMessage: self._process_system_state_message,
+        }
+        
+        # Per-stage latency histograms shown in the diagnostics panel
+        self.latency = LatencyStats()
+        
+        # Current of every cycle this session, for the trend plot
+        self.trends = TrendBuffer(STATIONS_PER_BOARD)
+        self.drift = DriftDetector(STATIONS_PER_BOARD)
+        self.drift_checked = [0] * STATIONS_PER_BOARD  # cycles per station already analysed
+        
         self.setup_ui()
         self.setup_connections()
+        if io_error:
+            self.log_message(f"ERROR: Failed to start I/O process, reading boards in the GUI: {io_error}")
+        self.init_cycle_store()
         self.init_serial()
+        if metrics_port is not None:
+            self.start_metrics_server(metrics_port)
+        if live_port is not None:
+            self.start_live_server(live_port)
     
     def setup_ui(self):
         """Set up the user interface"""
@@ -58,9 +125,19 @@ class KeyswitchTesterGUI(QMainWindow):
         right_layout.addWidget(self.control_widget)
         
         # Serial log widget
-        self.serial_log = SerialLogWidget()
+        self.serial_log = SerialLogWidget(self.latency.histogram("log_write"),
+                                          self.io_process.log_writer if self.io_process else None)
         right_layout.addWidget(self.serial_log)
         
+        # Per-station current trend plot
+        self.trend_plot = TrendWidget(self.trends)
+        right_layout.addWidget(self.trend_plot)
+        
+        # Latency diagnostics panel
+        self.diagnostics = DiagnosticsWidget(self.latency,
+                                             lambda: format_link_stats(self.board_manager.link_stats()))
+        right_layout.addWidget(self.diagnostics)
+        
         main_layout.addWidget(right_widget)
         
         # Set stretch factors
@@ -76,232 +153,495 @@ class KeyswitchTesterGUI(QMainWindow):
         # Connect reset requested signal
         self.station_status.reset_requested.connect(self.handle_reset_request)
         
-        # Initialize timer for serial reading
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.read_serial)
-        self.timer.start(SERIAL_CHECK_INTERVAL)
+        # Station display is refreshed from the model at a capped rate
+        self.station_model = StationModel(range(1, STATIONS_PER_BOARD + 1))
+        self.station_refresh_timer = QTimer(self)
+        self.station_refresh_timer.setSingleShot(True)
+        self.station_refresh_timer.setInterval(STATION_REFRESH_INTERVAL)
+        self.station_refresh_timer.timeout.connect(self.refresh_station_display)
+        self._display_dirty_since = 0.0
+        
+        # Periodic host <-> board round-trip probe
+        self.probes_pending = 0
+        self.latency_probe_timer = QTimer(self)
+        self.latency_probe_timer.setInterval(LATENCY_PROBE_INTERVAL)
+        self.latency_probe_timer.timeout.connect(self.probe_latency)
+        self.latency_probe_timer.start()
+        self.diagnostics.dump_requested.connect(self.dump_latency)
+        
+        # New cycles are run through the drift detector in batches
+        self.drift_timer = QTimer(self)
+        self.drift_timer.setInterval(DRIFT_CHECK_INTERVAL)
+        self.drift_timer.timeout.connect(self.check_drift)
+        self.drift_timer.start()
+        
+        # Metrics are refreshed on a single-shot timer, so its delay measures event-loop lag
+        self.metrics_timer = QTimer(self)
+        self.metrics_timer.setSingleShot(True)
+        self.metrics_timer.setTimerType(Qt.PreciseTimer)
+        self.metrics_timer.setInterval(METRICS_UPDATE_INTERVAL)
+        self.metrics_timer.timeout.connect(self.update_metrics)
+        self.metrics_timer.start()
+        
+        # Serial data arrives in batches from the reader threads
+        self.serial_lines_received.connect(self.handle_serial_lines)
+        self.serial_connection_lost.connect(self.handle_connection_lost)
+        self.connection_finished.connect(self.handle_connection_finished)
+        self.board_reconnected.connect(self.handle_board_reconnected)
+        self.ports_changed.connect(self.handle_ports_changed)
+        self.command_finished.connect(self.handle_command_finished)
+        self.io_line_shown.connect(self.serial_log.show_line)
     
     def init_serial(self):
         """Initialize serial communications"""
-        # Initialize serial manager
-        self.serial_manager = SerialManager()
-        
-        # Initial OpenRB check
-        port = self.serial_manager.get_openrb_port()
-        if port:
-            self.log_message(f"OpenRB device found on port: {port}")
+        # One connection, reader and command pipeline per attached board
+        if self.io_process:
+            self.board_manager = self.io_process
+            self.board_manager.on_lines = self._lines_from_reader
+            self.board_manager.on_lost = self.serial_connection_lost.emit
+            self.board_manager.on_line = self.io_line_shown.emit
         else:
+            self.board_manager = BoardManager(self._lines_from_reader, self.serial_connection_lost.emit)
+        self.board_running = {}
+        
+        if self.ports:
+            self.port_watcher = None
+            self.log_message(f"OpenRB device found on port: {', '.join(self.ports)}")
+            return
+        
+        # Ports are enumerated on a background thread and kept up to date as boards come and go
+        self.port_watcher = PortWatcher(self.ports_changed.emit)
+        self.board_manager.port_source = self.port_watcher.ports
+        self._ports_reported = False
+        self.port_watcher.start()
+    
+    def handle_ports_changed(self, ports):
+        """Report attached OpenRB ports and let reconnecting boards retry right away"""
+        if ports:
+            self.log_message(f"OpenRB device found on port: {', '.join(ports)}")
+        elif not self._ports_reported:
             self.log_message("No OpenRB device found. Connect device and try again.")
+        else:
+            self.log_message("No OpenRB device attached")
+        self._ports_reported = True
+        self.board_manager.ports_changed()
+    
+    def _lines_from_reader(self, board_index, lines, read_at=None):
+        """Reader-thread callback: stamp the batch and queue it for the GUI thread"""
+        # Each board's entry is only written by its own reader thread (or the I/O ring's)
+        self._batches_received[board_index] = self._batches_received.get(board_index, 0) + 1
+        self.serial_lines_received.emit(board_index, lines, read_at or time.perf_counter())
+    
+    def init_cycle_store(self):
+        """Open the binary cycle record store for this session"""
+        if self.io_process:
+            # Opened by the I/O process, which records the cycles itself
+            self.cycle_store = None
+            if self.io_process.cycle_store_error:
+                self.log_message(f"ERROR: Failed to open cycle store: {self.io_process.cycle_store_error}")
+            else:
+                self.log_message(f"Recording cycles to {self.io_process.cycle_store_path}")
+            return
+        
+        file_path = os.path.join(LOGS_DIR, f"keyswitch_cycles_{time.strftime('%Y%m%d_%H%M%S')}.kcyc")
+        self.cycle_store = CycleStore(file_path)
+        try:
+            self.cycle_store.open()
+            self.log_message(f"Recording cycles to {file_path}")
+        except Exception as e:
+            self.cycle_store = None
+            self.log_message(f"ERROR: Failed to open cycle store: {str(e)}")
+    
+    def start_metrics_server(self, port):
+        """Serve the rig health metrics on a local HTTP port"""
+        self.metrics_server = MetricsServer(self.metrics, port)
+        try:
+            self.metrics_server.start()
+            self.log_message(f"Serving metrics on {self.metrics_server.url}")
+        except OSError as e:
+            self.metrics_server = None
+            self.log_message(f"ERROR: Failed to start metrics server on port {port}: {str(e)}")
+    
+    def start_live_server(self, port):
+        """Serve the station state read-only to remote viewers"""
+        self.live_state = LiveState(self.station_model.values)
+        self.live_state.publish(self.station_model.snapshot())
+        self.live_server = LiveStateServer(self.live_state, port)
+        try:
+            self.live_server.start()
+            self.log_message(f"Serving live station state on {self.live_server.url}")
+        except OSError as e:
+            self.live_state = self.live_server = None
+            self.log_message(f"ERROR: Failed to start live state server on port {port}: {str(e)}")
+    
+    def update_metrics(self):
+        """Refresh the link counters, rates, queue depths and event-loop lag in the metrics"""
+        self.report_cycle_store_errors()
+        log_writer = self.serial_log.log_writer
+        self.metrics.update(self.board_manager.link_stats(), {
+            "serial_batches": sum(self._batches_received.values()) - self._batches_handled,
+            "log_view": len(self.serial_log.pending_lines),
+            "log_writer": log_writer.queue_depth() if log_writer else 0,
+            "commands": self.board_manager.pending_count(),
+        }, any(self.board_running.values()) if self.board_running else None)
+        self.metrics_timer.start()
+    
+    def report_cycle_store_errors(self):
+        """Log write failures reported by the cycle store's flush thread"""
+        if self.cycle_store:
+            for error in self.cycle_store.take_errors():
+                self.log_message(f"ERROR: {error}")
     
     def log_message(self, message):
         """Centralized logging method"""
         self.serial_log.append_message(message)
     
-    def send_command(self, command, retries=3, retry_delay=0.1):
-        """Send command to serial port with retries"""
-        if not self.serial_manager.serial_port:
+    def send_command(self, name, station=None, on_done=None, board_index=None):
+        """Queue a command; on_done(result) runs on the GUI thread once it is acknowledged or fails
+        
+        Station commands take a global 0-based station index and go to the board
+        that owns it; other commands go to board_index, or every connected board.
+        """
+        if not self.board_manager.connected:
             return False
-            
-        success = False
-        for _ in range(retries):
-            if self.serial_manager.write(command):
-                success = True
-                break  # Exit the loop once successful
-            time.sleep(retry_delay)
-            
-        return success
+        
+        callback = None
+        if on_done:
+            callback = lambda result: self.command_finished.emit(on_done, result)
+        return bool(self.board_manager.submit(name, station, callback, board_index))
+    
+    def handle_command_finished(self, on_done, result):
+        """Run a command's completion callback on the GUI thread"""
+        on_done(result)
     
     def handle_station_state_change(self, station_id, enabled):
         """Handle station enable/disable state changes"""
-        if not self.serial_manager.serial_port:
+        if not self.board_manager.connected:
             self.log_message("ERROR: Not connected to OpenRB device")
             self.station_status.set_station_enabled(station_id, not enabled)
             return
         
-        # Convert station_id to 0-based index for Arduino
-        station_idx = station_id - 1
+        # The toggle was changed locally, so the next board report must be applied
+        self.station_model.forget(station_id, 'enabled')
         
-        # Send enable/disable command
-        command = f"{'ENABLE' if enabled else 'DISABLE'}:{station_idx}\n".encode()
+        def on_done(result):
+            if result.ok:
+                self.log_message(f"Station {station_id} {'enabled' if enabled else 'disabled'}")
+            else:
+                self.log_message(f"ERROR: Station state change failed: {result.reason}")
+                self.station_status.set_station_enabled(station_id, not enabled)
         
-        if self.send_command(command):
-            self.log_message(f"Station {station_id} {'enabled' if enabled else 'disabled'}")
-        else:
-            self.log_message(f"ERROR: Failed to send station state change command")
-            self.station_status.set_station_enabled(station_id, not enabled)
+        # Convert station_id to 0-based index for Arduino
+        self.send_command('ENABLE' if enabled else 'DISABLE', station_id - 1, on_done)
     
     def handle_reset_request(self, station_id, field_type):
         """Handle requests to reset cycle count or failure count"""
-        if not self.serial_manager.serial_port:
+        if not self.board_manager.connected:
             self.log_message("ERROR: Not connected to OpenRB device")
             return
         
-        # Convert station_id to 0-based index for Arduino
-        station_idx = station_id - 1
-        
-        # Map field type to command
-        command_type = "RESET_CYCLE" if field_type == "cycle_count" else "RESET_FAIL"
+        field_name = field_type.replace('_', ' ')
         
-        # Create and send command
-        command = f"{command_type}:{station_idx}\n".encode()
+        def on_done(result):
+            if result.ok:
+                self.log_message(f"Reset {field_name} for Station {station_id}")
+                # A cycle count reset means a new switch; judge it against its own baseline
+                if field_type == "cycle_count":
+                    self.drift.reset(station_id - 1)
+            else:
+                self.log_message(f"ERROR: Reset {field_name} failed: {result.reason}")
         
-        if self.send_command(command):
-            self.log_message(f"Reset {field_type.replace('_', ' ')} for Station {station_id}")
-        else:
-            self.log_message(f"ERROR: Failed to send reset command for {field_type.replace('_', ' ')}")
+        # Map field type to command; convert station_id to 0-based index for Arduino
+        command_type = "RESET_CYCLE" if field_type == "cycle_count" else "RESET_FAIL"
+        self.send_command(command_type, station_id - 1, on_done)
     
     def connect_to_device(self):
-        """Attempt to connect to the OpenRB device"""
+        """Start connecting to all OpenRB devices in the background"""
         self.log_message("Looking for OpenRB device...")
-        port = self.serial_manager.get_openrb_port()
+        self.control_widget.set_enabled(False)
         
-        if not port:
+        # Port enumeration and the settle delay after opening must not block the GUI
+        threading.Thread(target=self._connect_worker, name="Connect", daemon=True).start()
+    
+    def _connect_worker(self):
+        """Find and open the ports off the GUI thread, then report back through a signal"""
+        ports = self.ports or self.port_watcher.ports(timeout=5.0)
+        self.connection_finished.emit(self.board_manager.connect(ports) if ports else {})
+    
+    def handle_connection_finished(self, results):
+        """Finish a background connection attempt on the GUI thread"""
+        self.control_widget.set_enabled(True)
+        
+        if not results:
             self.log_message("ERROR: No OpenRB device found")
-            return False
+            self.log_message("Failed to connect to device")
+            return
+        for port, connected in results.items():
+            if not connected:
+                self.log_message(f"ERROR: Failed to connect to {port}")
+        if not self.board_manager.connected:
+            self.log_message("Failed to connect to device")
+            return
         
-        self.log_message(f"Connecting to OpenRB on {port}...")
+        for board in self.board_manager.boards:
+            self.log_message(f"Connected to OpenRB on {board.port}" +
+                             (f" (board {board.index + 1})" if len(self.board_manager.boards) > 1 else ""))
         
-        if not self.serial_manager.connect(port):
-            self.log_message(f"ERROR: Failed to connect to {port}")
-            return False
+        # Size the station namespace to the attached boards
+        self.set_station_count(self.board_manager.station_count)
+        
+        # Probes in flight on a previous connection were abandoned with it
+        self.probes_pending = 0
         
-        self.log_message(f"Connected to OpenRB on {port}")
+        # Connection successful, update button to "Start"
+        self.control_widget.update_state(False)
         
         # Request current state from Arduino after successful connection
         self.request_current_state()
         
-        return True
-        
-    def request_current_state(self):
-        """Request current state from Arduino"""
+    def set_station_count(self, station_count):
+        """Resize the station model, widgets and per-station analytics to station_count stations"""
+        self.station_model = StationModel(range(1, station_count + 1))
+        self.station_status.set_station_count(station_count)
+        self.metrics.clear_stations()
+        if self.live_state:
+            self.live_state.reset(self.station_model.values)
+        self.board_running = {}
+        if self.trends.stations != station_count:
+            self.trends = TrendBuffer(station_count)
+            self.trend_plot.set_trends(self.trends)
+            self.drift = DriftDetector(station_count)
+            self.drift_checked = [0] * station_count
+    
+    def request_current_state(self, board_index=None):
+        """Request current state from Arduino (from one board, or all)"""
         self.log_message("Requesting current state from Arduino...")
-        command = b"REQUEST_STATE\n"
         
-        if self.send_command(command):
-            self.log_message("State request sent to Arduino")
-        else:
+        def on_done(result):
+            if result.ok:
+                self.log_message(f"State received from Arduino ({result.latency * 1000:.0f} ms)")
+            else:
+                self.log_message(f"ERROR: State request failed: {result.reason}")
+        
+        if not self.send_command("REQUEST_STATE", on_done=on_done, board_index=board_index):
             self.log_message("ERROR: Failed to send state request")
             
     def toggle_start_stop(self):
         """Toggle between connect, start, and stop states"""
         # If not connected (button shows "Connect"), try to connect
-        if not self.serial_manager.serial_port:
-            if self.connect_to_device():
-                # Connection successful, update button to "Start"
-                self.control_widget.update_state(False)  # Set to "Start" (not running)
-            else:
-                # Connection failed, keep as "Connect"
-                self.log_message("Failed to connect to device")
+        if not self.board_manager.connected:
+            self.connect_to_device()
             return
         
         # Already connected, handle Start/Stop toggling
         is_running = self.control_widget.start_stop_btn.isChecked()
-        command = self.COMMAND_START if is_running else self.COMMAND_STOP
         status = "Started" if is_running else "Stopped"
         
-        if self.send_command(command):
-            self.log_message(status)
-        else:
-            self.log_message("ERROR: Failed to send command")
-            if is_running:  # Only revert UI if we're trying to start
-                self.control_widget.update_state(False)
-                return
+        def on_done(result):
+            if result.ok:
+                self.log_message(status)
+            else:
+                self.log_message(f"ERROR: {'START' if is_running else 'STOP'} command failed: {result.reason}")
+                if is_running:  # Only revert UI if we're trying to start
+                    self.control_widget.update_state(False)
+        
+        self.send_command("START" if is_running else "STOP", on_done=on_done)
         
         # No need to call update_state here as it was already toggled by the button's checked state
     
-    def read_serial(self):
-        """Read and process data from the serial port"""
-        line = self.serial_manager.read_line()
-        if line:
-            self.log_message(line)
-            self.process_serial_message(line)
+    def handle_serial_lines(self, board_index, lines, received_at):
+        """Process a batch of lines (or binary telemetry messages) delivered by a board's reader thread"""
+        self.latency.record("read", time.perf_counter() - received_at)
+        self._batches_handled += 1
+        self.metrics.observe_lines(board_index, len(lines))
+        tag = len(self.board_manager.boards) > 1
+        # The I/O process has already written board lines to the log file
+        to_file = self.io_process is None
+        for line in lines:
+            text = line if isinstance(line, str) else format_message(line)
+            self.serial_log.append_message(format_board_message(board_index, text) if tag else text, to_file)
+            self.process_serial_message(line, board_index)
+    
+    def refresh_station_display(self):
+        """Push fields changed since the last refresh to the station widget"""
+        changes = self.station_model.take_changes()
+        if changes:
+            self.station_status.apply_changes(changes)
+            if self.live_state:
+                # Encoded once here, whatever the number of viewers
+                self.live_state.publish(changes)
+            self.latency.record("repaint", time.perf_counter() - self._display_dirty_since)
+    
+    def probe_latency(self):
+        """Time a REQUEST_STATE round trip to every board"""
+        # Skip while a probe is still outstanding or commands are queued
+        if self.probes_pending or not self.board_manager.connected or self.board_manager.pending_count():
+            return
+        
+        def on_done(result):
+            self.probes_pending = max(0, self.probes_pending - 1)
+            if result.ok:
+                self.latency.record("round_trip", result.latency)
+            else:
+                self.log_message(f"ERROR: Latency probe failed: {result.reason}")
+        
+        self.probes_pending = len(self.board_manager.submit("REQUEST_STATE", on_done=lambda result:
+                                                           self.command_finished.emit(on_done, result)))
+    
+    def check_drift(self):
+        """Analyse the cycles recorded since the last check and log any drift alerts"""
+        for station in range(self.drift.stations):
+            first, keyswitch, starter = self.trends.since(station, self.drift_checked[station])
+            if not len(keyswitch):
+                continue
+            self.drift_checked[station] = first + len(keyswitch)
+            for alert in self.drift.update(station, keyswitch, starter):
+                self.log_message(format_alert(alert))
+    
+    def dump_latency(self):
+        """Write the latency histograms to a JSON file in the logs directory"""
+        file_path = os.path.join(LOGS_DIR, f"keyswitch_latency_{time.strftime('%Y%m%d_%H%M%S')}.json")
+        try:
+            self.latency.dump(file_path)
+            self.log_message(f"Latency histograms written to {file_path}")
+        except Exception as e:
+            self.log_message(f"ERROR: Failed to write latency histograms: {str(e)}")
+    
+    def handle_connection_lost(self, board_index):
+        """Handle a board's reader reporting that its port has failed"""
+        board = self.board_manager.boards[board_index]
+        self.log_message(f"ERROR: Lost connection to OpenRB device on {board.port}, reconnecting...")
+        self.board_manager.disconnect_board(board_index)
+        self.board_running.pop(board_index, None)
+        if not self.board_manager.connected:
+            self.control_widget.set_disconnected()
+        
+        # Keeps retrying with backoff until the board is back or Connect is pressed
+        self.board_manager.reconnect(board_index, self.board_reconnected.emit)
+    
+    def handle_board_reconnected(self, board_index):
+        """Resume a board that came back after its port was lost"""
+        board = self.board_manager.boards[board_index]
+        self.log_message(f"Reconnected to OpenRB on {board.port}" +
+                         (f" (board {board_index + 1})" if len(self.board_manager.boards) > 1 else ""))
+        self.control_widget.update_state(any(self.board_running.values()))
+        
+        # Messages sent while the link was down are lost; pull the board's full state again
+        self.request_current_state(board_index)
+    
+    def closeEvent(self, event):
+        """Stop the serial readers, release the ports and flush the log on exit"""
+        if self.port_watcher:
+            self.port_watcher.stop()
+        if self.metrics_server:
+            self.metrics_server.stop()
+        if self.live_server:
+            self.live_server.stop()
+        self.board_manager.disconnect()
+        if self.cycle_store:
+            self.cycle_store.close()
+            self.report_cycle_store_errors()
+        self.serial_log.close_log()
+        if self.io_process:
+            self.io_process.stop()
+        super().closeEvent(event)
     
-    def process_serial_message(self, message):
+    def process_serial_message(self, message, board_index=0):
         """Process serial messages and update the station status if applicable"""
         try:
-            message = message.strip()
+            started = time.perf_counter()
+            parsed = parse_message(message)
+            parsed_at = time.perf_counter()
+            self.latency.record("parse", parsed_at - started)
             
-            # Handle CYCLE format: "CYCLE:station:enabled:cycles:fails:keyswitchCurrent:starterCurrent"
-            if message.startswith("CYCLE:"):
-                self._process_cycle_message(message)
-            # Handle system state updates
-            elif message.startswith("SYSTEM_STATE:"):
-                self._process_system_state_message(message)
-            # Handle station state updates
-            elif message.startswith("STATION:"):
-                self._process_station_message(message)
+            if board_index < len(self.board_manager.boards):
+                gap = self.board_manager.observe(board_index, parsed)
+                if gap:
+                    self._report_gap(board_index, *gap)
+            handler = self._message_handlers.get(type(parsed))
+            if handler:
+                handler(board_index, parsed)
+                self.latency.record("model", time.perf_counter() - parsed_at)
+                if self.station_model.has_changes() and not self.station_refresh_timer.isActive():
+                    self._display_dirty_since = parsed_at
+                    self.station_refresh_timer.start()
+        except MessageParseError as e:
+            self.metrics.observe_parse_error()
+            self.log_message(f"ERROR: {e}")
         except Exception as e:
             self.log_message(f"ERROR: Failed to process message: {str(e)}")
     
-    def _process_cycle_message(self, message):
-        """Process messages in the CYCLE:station:enabled:cycles:fails:keyswitchCurrent:starterCurrent format"""
-        parts = message.split(":")
-        
-        if len(parts) >= 7:  # Updated to expect 7 parts
-            # Extract values (station 0 = display station 1)
-            station_idx = int(parts[1]) + 1  # Convert to 1-based for display
-            station_enabled = parts[2] == "1"  # "1" = enabled, "0" = disabled
-            cycle_count = int(parts[3])
-            failure_count = int(parts[4])
-            keyswitch_current = float(parts[5])
-            starter_current = float(parts[6])
+    def _report_gap(self, board_index, station, missing):
+        """Log messages lost on the link (the board manager resyncs the station itself)"""
+        if station is None:
+            self.log_message(f"WARNING: {missing} message(s) lost from board {board_index + 1}")
+        else:
+            self.log_message(f"WARNING: {missing} message(s) lost for station {station + 1}, resyncing")
+    
+    def _station_id(self, board_index, station):
+        """Map a board's 0-based station index to a 1-based display id, or None if invalid"""
+        if not 0 <= station < STATIONS_PER_BOARD:
+            return None
+        station_id = board_index * STATIONS_PER_BOARD + station + 1
+        return station_id if self.station_model.has_station(station_id) else None
+    
+    def _process_cycle_message(self, board_index, message):
+        """Process a CYCLE:station:enabled:cycles:fails:keyswitchCurrent:starterCurrent message"""
+        station_idx = self._station_id(board_index, message.station)
+        
+        if station_idx is not None:
+            # Record all values at once; the display picks up changes on the next refresh
+            self.station_model.update(station_idx, enabled=message.enabled, cycle_count=message.cycles,
+                                      failure_count=message.failures,
+                                      keyswitch_current=message.keyswitch_current,
+                                      starter_current=message.starter_current)
+            self.trends.append(station_idx - 1, message.keyswitch_current, message.starter_current)
+            self.metrics.observe_cycle(station_idx, message)
             
-            # Validate station number (1-4 for display)
-            if 1 <= station_idx <= 4:
-                # Update all values at once
-                self.station_status.set_station_enabled(station_idx, station_enabled)
-                self.station_status.update_station_value(station_idx, 'cycle_count', cycle_count)
-                self.station_status.update_station_value(station_idx, 'failure_count', failure_count)
-                self.station_status.update_station_value(station_idx, 'keyswitch_current', keyswitch_current)
-                self.station_status.update_station_value(station_idx, 'starter_current', starter_current)
-            else:
-                self.log_message(f"ERROR: Invalid station number: {station_idx-1} (must be 0-3)")
+            if self.cycle_store and not self.cycle_store.append(
+                    time.time(), station_idx - 1, message.enabled, message.cycles, message.failures,
+                    message.keyswitch_current, message.starter_current):
+                self.log_message(f"ERROR: Cycle for station {station_idx} not recorded (values out of range)")
         else:
-            self.log_message(f"ERROR: Invalid CYCLE message format: {message}, expected 7 parts but got {len(parts)}")
+            self.log_message(f"ERROR: Invalid station number: {message.station} (must be 0-{STATIONS_PER_BOARD - 1})")
     
-    def _process_system_state_message(self, message):
+    def _process_system_state_message(self, board_index, message):
         """Process system state message from Arduino"""
-        parts = message.split(":")
-        
-        if len(parts) < 2:
-            self.log_message(f"ERROR: Invalid system state message format: {message}")
-            return
-            
-        try:
-            is_running = parts[1] == "1"  # "1" = running, "0" = stopped
-            self.control_widget.update_state(is_running)
+        # Shown as running while any board is running
+        self.board_running[board_index] = message.running
+        is_running = any(self.board_running.values())
+        if self.live_state:
+            self.live_state.publish(running=is_running)
+        
+        # The firmware repeats SYSTEM_STATE while stopped, so only report actual changes
+        if self.control_widget.update_state(is_running):
             self.log_message(f"System state updated: {'running' if is_running else 'stopped'}")
-        except ValueError as e:
-            self.log_message(f"ERROR: Invalid system state value: {e}")
     
-    def _process_station_message(self, message):
+    def _process_station_message(self, board_index, message):
         """Process station state message from Arduino"""
-        parts = message.split(":")
+        station_idx = self._station_id(board_index, message.station)
         
-        if len(parts) >= 5:
-            try:
-                station_idx = int(parts[1]) + 1  # Convert to 1-based for display
-                station_enabled = parts[2] == "1"  # "1" = enabled, "0" = disabled
-                cycle_count = int(parts[3])
-                failure_count = int(parts[4])
-                
-                # Validate station number (1-4 for display)
-                if 1 <= station_idx <= 4:
-                    # Update all values except currents which aren't included in station message
-                    self.station_status.set_station_enabled(station_idx, station_enabled)
-                    self.station_status.update_station_value(station_idx, 'cycle_count', cycle_count)
-                    self.station_status.update_station_value(station_idx, 'failure_count', failure_count)
-                else:
-                    self.log_message(f"ERROR: Invalid station number: {station_idx-1} (must be 0-3)")
-            except ValueError as e:
-                self.log_message(f"ERROR: Invalid station state value: {e}")
+        if station_idx is not None:
+            # Update all values except currents which aren't included in station message
+            self.station_model.update(station_idx, enabled=message.enabled, cycle_count=message.cycles,
+                                      failure_count=message.failures)
+            self.metrics.observe_station(station_idx, message)
         else:
-            self.log_message(f"ERROR: Invalid STATION message format: {message}, expected 5 parts but got {len(parts)}")
+            self.log_message(f"ERROR: Invalid station number: {message.station} (must be 0-{STATIONS_PER_BOARD - 1})")
 
 def main():
     """Application entry point"""
-    app = QApplication(sys.argv)
-    window = KeyswitchTesterGUI()
+    parser = argparse.ArgumentParser(description=WINDOW_TITLE)
+    parser.add_argument("--port", action="append", default=[],
+                        help="serial port of an OpenRB board; repeat for several boards (default: auto-detect all)")
+    parser.add_argument("--metrics-port", type=int, help="serve Prometheus metrics on this local HTTP port")
+    parser.add_argument("--live-port", type=int, help="serve the live station state to browsers on this HTTP port")
+    parser.add_argument("--io-process", action="store_true",
+                        help="read the boards and write the log and cycle store in a separate process")
+    args, qt_args = parser.parse_known_args()
+    
+    app = QApplication(sys.argv[:1] + qt_args)
+    window = KeyswitchTesterGUI(args.port, args.metrics_port, args.live_port, args.io_process)
     window.show()
     sys.exit(app.exec())
 
@@ -0,0 +1,99 @@
+from collections import namedtuple
+
+# Parsed forms of the lines sent by eventReporter.cpp. Station indices are
+# the firmware's 0-based values; conversion for display is left to the caller.
+# seq is the message's number within its stream ("#<seq>" suffix or binary
+# frame header), or None if the firmware did not send one.
+CycleMessage = namedtuple("CycleMessage", "station enabled cycles failures keyswitch_current starter_current seq",
+                          defaults=(None,))
+StationMessage = namedtuple("StationMessage", "station enabled cycles failures seq", defaults=(None,))
+SystemStateMessage = namedtuple("SystemStateMessage", "running seq", defaults=(None,))
+EventMessage = namedtuple("EventMessage", "text seq", defaults=(None,))
+UnknownMessage = namedtuple("UnknownMessage", "line")
+
+class MessageParseError(ValueError):
+    """Raised when a line has a known prefix but malformed fields"""
+
+def _parse_cycle(body, line, seq):
+    """CYCLE:station:enabled:cycles:fails:keyswitchCurrent:starterCurrent"""
+    parts = body.split(":")
+    if len(parts) < 6:
+        raise MessageParseError(f"Invalid CYCLE message format: {line}, expected 7 parts but got {len(parts) + 1}")
+    try:
+        return CycleMessage(int(parts[0]), parts[1] == "1", int(parts[2]), int(parts[3]),
+                            float(parts[4]), float(parts[5]), seq)
+    except ValueError as e:
+        raise MessageParseError(f"Invalid CYCLE value: {e}") from None
+
+def _parse_station(body, line, seq):
+    """STATION:station:enabled:cycles:fails"""
+    parts = body.split(":")
+    if len(parts) < 4:
+        raise MessageParseError(f"Invalid STATION message format: {line}, expected 5 parts but got {len(parts) + 1}")
+    try:
+        return StationMessage(int(parts[0]), parts[1] == "1", int(parts[2]), int(parts[3]), seq)
+    except ValueError as e:
+        raise MessageParseError(f"Invalid station state value: {e}") from None
+
+def _parse_system_state(body, line, seq):
+    """SYSTEM_STATE:running"""
+    return SystemStateMessage(body == "1", seq)
+
+def _parse_event(body, line, seq):
+    """EVENT:free text"""
+    return EventMessage(body, seq)
+
+# Prefix (text before the first ':') -> field parser
+_PARSERS = {
+    "CYCLE": _parse_cycle,
+    "STATION": _parse_station,
+    "SYSTEM_STATE": _parse_system_state,
+    "EVENT": _parse_event,
+}
+
+def parse_message(line):
+    """Parse one line (str or bytes) from the board into a message tuple
+    
+    Unrecognised lines come back as UnknownMessage; lines with a known prefix
+    but bad fields raise MessageParseError. Messages already decoded from
+    binary telemetry are returned unchanged.
+    """
+    if not isinstance(line, str):
+        if isinstance(line, _MESSAGE_TYPES):
+            return line
+        line = bytes(line).decode('utf-8', errors='replace')
+    line = line.strip()
+    
+    # Optional "#<seq>" suffix
+    seq = None
+    if "#" in line:
+        mark = line.rfind("#")
+        if line[mark + 1:].isdigit():
+            seq = int(line[mark + 1:])
+            line = line[:mark]
+    
+    prefix, separator, body = line.partition(":")
+    parser = _PARSERS.get(prefix) if separator else None
+    if parser is None:
+        return UnknownMessage(line)
+    return parser(body, line, seq)
+
+_MESSAGE_TYPES = (CycleMessage, StationMessage, SystemStateMessage, EventMessage, UnknownMessage)
+
+# Message type -> canonical ASCII line, as eventReporter.cpp prints it
+_FORMATTERS = {
+    CycleMessage: lambda m: (f"CYCLE:{m.station}:{1 if m.enabled else 0}:{m.cycles}:{m.failures}:"
+                             f"{m.keyswitch_current:.2f}:{m.starter_current:.2f}"),
+    StationMessage: lambda m: f"STATION:{m.station}:{1 if m.enabled else 0}:{m.cycles}:{m.failures}",
+    SystemStateMessage: lambda m: f"SYSTEM_STATE:{1 if m.running else 0}",
+    EventMessage: lambda m: f"EVENT:{m.text}",
+    UnknownMessage: lambda m: m.line,
+}
+
+def format_message(message):
+    """Return the ASCII protocol line for a message tuple (lines are returned unchanged)"""
+    if isinstance(message, str):
+        return message
+    line = _FORMATTERS[type(message)](message)
+    seq = getattr(message, 'seq', None)
+    return line if seq is None else f"{line}#{seq}"
@@ -0,0 +1,279 @@
+"""Prometheus-style rig health metrics served over HTTP (no Qt dependency)
+
+Values are updated in place: per-message values (station counters and
+currents, lines, parse errors) as messages are processed, and link
+counters, rates, queue depths and event-loop lag once per
+METRICS_UPDATE_INTERVAL. A scrape only formats the stored numbers, so it
+costs the host's event loop nothing.
+
+    metrics = HostMetrics()
+    server = MetricsServer(metrics, 9108)
+    server.start()   # GET http://127.0.0.1:9108/metrics
+"""
+import http.server
+import math
+import threading
+import time
+
+from constants import METRICS_HOST, METRICS_UPDATE_INTERVAL
+
+# Prometheus text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+class MetricValue:
+    """One time series: a metric with fixed label values"""
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        self.value += amount
+
+class Metric:
+    """A counter or gauge, optionally split into series by labels
+
+    Label values are kept as given (e.g. ints) and only turned into text when
+    rendering, so labels() is a dict lookup on the hot path.
+    """
+    def __init__(self, name, kind, help_text, label_names=()):
+        self.name = name
+        self.kind = kind
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self.series = {}
+        if not self.label_names:
+            self.series[()] = MetricValue()
+
+    def labels(self, *values):
+        series = self.series.get(values)
+        if series is None:
+            series = self.series.setdefault(values, MetricValue())
+        return series
+
+    def set(self, value):
+        self.series[()].value = value
+
+    def inc(self, amount=1):
+        self.series[()].value += amount
+
+    def clear(self):
+        """Drop every labelled series (e.g. for stations that no longer exist)"""
+        if self.label_names:
+            self.series = {}
+
+    def render(self, lines):
+        lines.append(f"# HELP {self.name} {self.help}")
+        lines.append(f"# TYPE {self.name} {self.kind}")
+        # A copy, since the host thread may add series while the server thread renders
+        for values, series in sorted(self.series.copy().items()):
+            if values:
+                labels = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, values))
+                lines.append(f"{self.name}{{{labels}}} {_format_value(series.value)}")
+            else:
+                lines.append(f"{self.name} {_format_value(series.value)}")
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value):
+    if isinstance(value, float):
+        if math.isnan(value):
+            return "NaN"
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        return repr(value)
+    return str(int(value))
+
+class MetricsRegistry:
+    """An ordered set of metrics rendered together"""
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, name, help_text, labels=()):
+        return self._add(Metric(name, "counter", help_text, labels))
+
+    def gauge(self, name, help_text, labels=()):
+        return self._add(Metric(name, "gauge", help_text, labels))
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """The text exposition of every metric"""
+        lines = []
+        for metric in self.metrics:
+            metric.render(lines)
+        return "\n".join(lines) + "\n"
+
+class HostMetrics(MetricsRegistry):
+    """The host pipeline's metrics, shared by KeyswitchTesterGUI and the headless runner
+
+    Stations and boards are labelled 1-based, as in the GUI. observe_*()
+    are called from the thread that processes messages; update() from a
+    timer on the same thread every `interval` seconds, which is also how
+    event-loop lag is measured: the time update() runs after it was due.
+    """
+    # BoardManager.link_stats() keys mirrored as counters
+    LINK_COUNTERS = (
+        ("reconnects", "keyswitch_serial_reconnects_total", "Times the board's port was reopened after being lost"),
+        ("dropped", "keyswitch_messages_lost_total", "Messages lost on the link, from sequence number gaps"),
+        ("resyncs", "keyswitch_station_resyncs_total", "Station state re-requests after a gap"),
+        ("crc_errors", "keyswitch_telemetry_crc_errors_total", "Binary telemetry frames with a bad CRC"),
+    )
+
+    def __init__(self, interval=METRICS_UPDATE_INTERVAL / 1000):
+        super().__init__()
+        self.interval = interval
+
+        self.station_cycles = self.gauge("keyswitch_station_cycles", "Cycle count reported by the board", ["station"])
+        self.station_failures = self.gauge("keyswitch_station_failures", "Failure count reported by the board",
+                                           ["station"])
+        self.station_enabled = self.gauge("keyswitch_station_enabled", "1 if the station is enabled", ["station"])
+        self.keyswitch_current = self.gauge("keyswitch_station_keyswitch_current_amps",
+                                            "Peak keyswitch current of the last cycle", ["station"])
+        self.starter_current = self.gauge("keyswitch_station_starter_current_amps",
+                                          "Peak starter current of the last cycle", ["station"])
+        self.cycle_messages = self.counter("keyswitch_cycle_messages_total", "CYCLE messages received",
+                                           ["station"])
+
+        self.lines = self.counter("keyswitch_serial_lines_total", "Lines or telemetry frames received", ["board"])
+        self.lines_rate = self.gauge("keyswitch_serial_lines_per_second", "Lines or frames received per second",
+                                     ["board"])
+        self.bytes = self.counter("keyswitch_serial_bytes_total", "Bytes read from the serial port", ["board"])
+        self.bytes_rate = self.gauge("keyswitch_serial_bytes_per_second", "Bytes read per second", ["board"])
+        self.parse_errors = self.counter("keyswitch_parse_errors_total", "Board messages that failed to parse")
+        self.link = {key: self.counter(name, help_text, ["board"]) for key, name, help_text in self.LINK_COUNTERS}
+
+        self.boards_connected = self.gauge("keyswitch_boards_connected", "Boards with an open port")
+        self.running = self.gauge("keyswitch_running", "1 if any board reports running, 0 if stopped, -1 if unknown")
+        self.queue_depth = self.gauge("keyswitch_queue_depth", "Items waiting in a host queue", ["queue"])
+        self.loop_lag = self.gauge("keyswitch_event_loop_lag_seconds",
+                                   "How late the last metrics update ran on the host event loop")
+        self.loop_lag_max = self.gauge("keyswitch_event_loop_lag_max_seconds", "Largest event-loop lag so far")
+        self.loop_lag_total = self.counter("keyswitch_event_loop_lag_seconds_total", "Sum of event-loop lag samples")
+
+        self._due = None
+        self._updated = None
+        self._sources = {}  # (board, key) -> last value of a source counter
+        self._lines_seen = {}  # board -> lines total at the last update
+
+    def observe_lines(self, board_index, count):
+        self.lines.labels(board_index + 1).inc(count)
+
+    def observe_parse_error(self):
+        self.parse_errors.inc()
+
+    def observe_cycle(self, station_id, message):
+        self.cycle_messages.labels(station_id).inc()
+        self.station_cycles.labels(station_id).set(message.cycles)
+        self.station_failures.labels(station_id).set(message.failures)
+        self.station_enabled.labels(station_id).set(int(message.enabled))
+        self.keyswitch_current.labels(station_id).set(message.keyswitch_current)
+        self.starter_current.labels(station_id).set(message.starter_current)
+
+    def observe_station(self, station_id, message):
+        self.station_cycles.labels(station_id).set(message.cycles)
+        self.station_failures.labels(station_id).set(message.failures)
+        self.station_enabled.labels(station_id).set(int(message.enabled))
+
+    def clear_stations(self):
+        """Forget per-station series after the station namespace was resized"""
+        for metric in (self.station_cycles, self.station_failures, self.station_enabled,
+                       self.keyswitch_current, self.starter_current, self.cycle_messages):
+            metric.clear()
+
+    def update(self, link_stats, queue_depths, running=None):
+        """Refresh link counters, rates, queue depths and the event-loop lag
+
+        link_stats is BoardManager.link_stats(), queue_depths maps a queue
+        name to its length and running is True, False or None (unknown).
+        """
+        now = time.perf_counter()
+        if self._due is not None:
+            lag = max(0.0, now - self._due)
+            self.loop_lag.set(lag)
+            self.loop_lag_total.inc(lag)
+            if lag > self.loop_lag_max.series[()].value:
+                self.loop_lag_max.set(lag)
+        elapsed = now - self._updated if self._updated is not None else None
+        self._updated = now
+
+        for entry in link_stats:
+            board = entry["board"] + 1
+            for key, metric in self.link.items():
+                metric.labels(board).inc(self._source_delta(board, key, entry.get(key, 0)))
+            read = self._source_delta(board, "bytes_read", entry.get("bytes_read", 0))
+            self.bytes.labels(board).inc(read)
+            if elapsed:
+                self.bytes_rate.labels(board).set(read / elapsed)
+        for (board,), series in self.lines.series.copy().items():
+            if elapsed:
+                self.lines_rate.labels(board).set((series.value - self._lines_seen.get(board, 0)) / elapsed)
+            self._lines_seen[board] = series.value
+
+        self.boards_connected.set(sum(1 for entry in link_stats if entry["connected"]))
+        self.running.set(-1 if running is None else int(running))
+        for name, depth in queue_depths.items():
+            self.queue_depth.labels(name).set(depth)
+        self._due = time.perf_counter() + self.interval
+
+    def _source_delta(self, board, key, value):
+        """Increase of a source counter since the last update (source counters restart on reconnect)"""
+        last = self._sources.get((board, key), 0)
+        self._sources[(board, key)] = value
+        return value - last if value >= last else value
+
+class MetricsServer:
+    """Serves a registry on GET /metrics from a background thread
+
+    Port 0 picks a free port; the bound port is in .port after start().
+    """
+    def __init__(self, registry, port, host=METRICS_HOST):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        """Bind the port and start serving; raises OSError if the port is taken"""
+        registry = self.registry
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = http.server.ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="MetricsServer", daemon=True)
+        self._thread.start()
+        return self.port
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}/metrics"
+
+    def stop(self):
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+        self._server = None
@@ -0,0 +1,73 @@
+import os
+import threading
+from serial_communication import SerialManager
+from constants import PORT_WATCH_INTERVAL
+
+# USB serial devices as listed in SYS_TTY_DIR
+SYS_TTY_DIR = "/sys/class/tty"
+USB_TTY_PREFIXES = ("ttyACM", "ttyUSB")
+
+class PortWatcher:
+    """Keeps a cached list of attached OpenRB ports up to date from a background thread
+
+    On Linux it lists /sys/class/tty every `interval` seconds and only runs the
+    slower pyserial enumeration when the set of USB serial devices changes;
+    elsewhere it enumerates on every poll. on_change(ports) is called from the
+    watcher thread whenever the OpenRB port list changes.
+    """
+    def __init__(self, on_change=None, interval=PORT_WATCH_INTERVAL):
+        self.on_change = on_change
+        self.interval = interval
+
+        self._ports = []
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start watching; the first scan happens on the watcher thread"""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="PortWatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        thread = self._thread
+        if thread is None:
+            return
+        self._thread = None
+        self._stop.set()
+        thread.join(self.interval * 2)
+
+    def ports(self, timeout=None):
+        """Cached OpenRB ports; waits up to timeout seconds for the first scan if it has not finished"""
+        if timeout is not None:
+            self._ready.wait(timeout)
+        return list(self._ports)
+
+    def _usb_ttys(self):
+        """Names of the USB serial devices, or None where /sys/class/tty is unavailable"""
+        try:
+            return sorted(name for name in os.listdir(SYS_TTY_DIR) if name.startswith(USB_TTY_PREFIXES))
+        except OSError:
+            return None
+
+    def _run(self):
+        serial_manager = SerialManager()
+        last_ttys = None
+        while True:
+            ttys = self._usb_ttys()
+            if ttys is None or ttys != last_ttys:
+                last_ttys = ttys
+                ports = serial_manager.get_openrb_ports()
+                if ports != self._ports:
+                    self._ports = ports
+                    if self.on_change and self._ready.is_set():
+                        self.on_change(list(ports))
+            if not self._ready.is_set():
+                self._ready.set()
+                if self.on_change:
+                    self.on_change(list(self._ports))
+            if self._stop.wait(self.interval):
+                return
@@ -0,0 +1,125 @@
+"""Single-producer, single-consumer ring of byte records in shared memory (no Qt dependency)"""
+import struct
+from multiprocessing import shared_memory
+
+# Header: bytes written, bytes read, records dropped because the ring was full, capacity
+_HEADER = struct.Struct("<QQQQ")
+_HEADER_SIZE = 64
+_WRITTEN = 0
+_READ = 8
+_DROPPED = 16
+_LENGTH = struct.Struct("<I")
+
+class SharedRing:
+    """Length-prefixed records passed between two processes through multiprocessing.shared_memory
+
+    Positions are byte counts since the ring was created, so wrapping needs
+    no marker; a record that crosses the end of the buffer is split. The
+    producer never blocks: put() drops what does not fit and counts it.
+    Positions are only published and read while holding `condition` (a
+    multiprocessing.Condition shared by both sides), whose semaphore also
+    orders the data copies against them, since plain stores to shared memory
+    are not ordered between cores on ARM. The consumer waits on it for data.
+
+    The side that passes capacity creates the ring (and unlinks it on
+    close); the other attaches by name.
+    """
+    def __init__(self, condition, capacity=None, name=None):
+        self.condition = condition
+        if name is None:
+            self._shm = shared_memory.SharedMemory(create=True, size=_HEADER_SIZE + capacity)
+            _HEADER.pack_into(self._shm.buf, 0, 0, 0, 0, capacity)
+            self.owner = True
+        else:
+            self._shm = _attach(name)
+            self.owner = False
+        self.name = self._shm.name
+        self.capacity = _HEADER.unpack_from(self._shm.buf, 0)[3]
+        self._data = self._shm.buf[_HEADER_SIZE:_HEADER_SIZE + self.capacity]
+        self._written, self._read = _HEADER.unpack_from(self._shm.buf, 0)[:2]
+
+    def put(self, records):
+        """Append records (bytes) and wake the consumer; returns how many fit"""
+        header = self._shm.buf
+        with self.condition:
+            read = struct.unpack_from("<Q", header, _READ)[0]
+        free = self.capacity - (self._written - read)
+        parts = []
+        for record in records:
+            size = _LENGTH.size + len(record)
+            if size > free:
+                break
+            parts.append(_LENGTH.pack(len(record)))
+            parts.append(record)
+            free -= size
+        count = len(parts) // 2
+        if parts:
+            self._copy_in(self._written, b"".join(parts))
+            self._written += self.capacity - (self._written - read) - free
+        with self.condition:
+            struct.pack_into("<Q", header, _WRITTEN, self._written)
+            if count < len(records):
+                dropped = struct.unpack_from("<Q", header, _DROPPED)[0]
+                struct.pack_into("<Q", header, _DROPPED, dropped + len(records) - count)
+            self.condition.notify()
+        return count
+
+    def get(self, timeout=None):
+        """Take every record written so far, waiting up to timeout for the first; returns a list of bytes"""
+        header = self._shm.buf
+        with self.condition:
+            written = struct.unpack_from("<Q", header, _WRITTEN)[0]
+            if written == self._read and timeout:
+                self.condition.wait(timeout)
+                written = struct.unpack_from("<Q", header, _WRITTEN)[0]
+        if written == self._read:
+            return []
+        data = self._copy_out(self._read, written - self._read)
+        with self.condition:
+            struct.pack_into("<Q", header, _READ, written)
+        self._read = written
+
+        records = []
+        offset = 0
+        while offset < len(data):
+            length = _LENGTH.unpack_from(data, offset)[0]
+            offset += _LENGTH.size
+            records.append(data[offset:offset + length])
+            offset += length
+        return records
+
+    @property
+    def dropped(self):
+        """Records put() could not fit so far"""
+        with self.condition:
+            return struct.unpack_from("<Q", self._shm.buf, _DROPPED)[0]
+
+    def _copy_in(self, position, data):
+        start = position % self.capacity
+        first = min(len(data), self.capacity - start)
+        self._data[start:start + first] = data[:first]
+        if first < len(data):
+            self._data[:len(data) - first] = data[first:]
+
+    def _copy_out(self, position, size):
+        start = position % self.capacity
+        first = min(size, self.capacity - start)
+        if first == size:
+            return bytes(self._data[start:start + size])
+        return bytes(self._data[start:]) + bytes(self._data[:size - first])
+
+    def close(self):
+        """Detach from the ring, and remove it if this side created it"""
+        self._data.release()
+        self._shm.close()
+        if self.owner:
+            self._shm.unlink()
+
+def _attach(name):
+    """Open an existing segment without taking it over for cleanup on exit"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13 attaching also registers the segment, which is
+        # harmless in a spawned child: it shares its parent's resource tracker
+        return shared_memory.SharedMemory(name=name)
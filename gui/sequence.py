@@ -0,0 +1,65 @@
+from messages import CycleMessage, StationMessage
+
+# Sequence numbers are 16-bit and wrap
+SEQUENCE_MODULUS = 0x10000
+
+# A jump forward larger than this is taken as a board reset or reordering, not loss
+SEQUENCE_MAX_GAP = SEQUENCE_MODULUS // 2
+
+# Stream key for SYSTEM_STATE and EVENT messages
+SYSTEM_STREAM = None
+
+class SequenceTracker:
+    """Detects lost messages from one board's per-stream sequence numbers
+    
+    The firmware numbers CYCLE/STATION messages per station and SYSTEM_STATE/
+    EVENT messages in one system stream. Messages without a number (older
+    firmware) are ignored.
+    """
+    def __init__(self):
+        self.last = {}
+        self.dropped = 0
+        self.gaps = 0
+        self.resets = 0
+        self.dropped_by_stream = {}
+    
+    def check(self, message):
+        """Record a message; returns (stream, missing) if messages were lost before it, else None
+        
+        stream is the firmware's 0-based station index, or SYSTEM_STREAM.
+        """
+        seq = getattr(message, 'seq', None)
+        if seq is None:
+            return None
+        stream = message.station if isinstance(message, (CycleMessage, StationMessage)) else SYSTEM_STREAM
+        
+        last = self.last.get(stream)
+        self.last[stream] = seq
+        if last is None:
+            return None
+        
+        missing = (seq - last - 1) % SEQUENCE_MODULUS
+        if missing == 0:
+            return None
+        if missing >= SEQUENCE_MAX_GAP:
+            # Duplicate, reordered or restarted numbering: start over from here
+            self.resets += 1
+            return None
+        
+        self.gaps += 1
+        self.dropped += missing
+        self.dropped_by_stream[stream] = self.dropped_by_stream.get(stream, 0) + missing
+        return stream, missing
+    
+    def reset(self):
+        """Forget the last numbers, e.g. after reconnecting"""
+        self.last = {}
+    
+    def stats(self):
+        """Drop counters"""
+        return {
+            "dropped": self.dropped,
+            "gaps": self.gaps,
+            "resets": self.resets,
+            "dropped_by_stream": dict(self.dropped_by_stream),
+        }
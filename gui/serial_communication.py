@@ -2,12 +2,27 @@ import serial
 import serial.tools.list_ports
 import time
 import os
-from constants import SERIAL_BAUDRATE, SERIAL_TIMEOUT
+import threading
+from constants import SERIAL_BAUDRATE, SERIAL_TIMEOUT, SERIAL_MAX_LINE_LENGTH, SERIAL_SETTLE_TIME
+from telemetry import FrameDecoder, BINARY_ENABLED_LINE
 
 class SerialManager:
     def __init__(self):
         self.serial_port = None
         self.serial_ports = []
+        
+        # Background reader state
+        self._reader_thread = None
+        self._reader_stop = threading.Event()
+        self._rx_buffer = bytearray()
+        
+        # Telemetry format: ASCII lines until the board acknowledges BINARY:1
+        self.binary = False
+        self._binary_requested = False
+        self._frames = FrameDecoder()
+        
+        # Bytes received over the manager's lifetime (written by the reader thread)
+        self.bytes_read = 0
 
     def get_available_ports(self):
         """Get list of available serial ports"""
@@ -16,25 +31,32 @@ class SerialManager:
         except Exception:
             return []
             
-    def get_openrb_port(self):
-        """Find a port with 'OpenRB' in the name or description"""
+    def get_openrb_ports(self):
+        """Find all ports with 'OpenRB' in the name or description"""
         try:
+            ports = []
             for port in serial.tools.list_ports.comports():
                 # Check device, name, description, hwid, etc. for "OpenRB"
                 port_info = f"{port.device} {port.name} {port.description} {port.hwid}".lower()
                 if "openrb" in port_info:
-                    return port.device
-                    
+                    ports.append(port.device)
+            
             # If no port with OpenRB in name is found, default to /dev/ttyACM0 if it exists
-            if os.path.exists("/dev/ttyACM0"):
-                return "/dev/ttyACM0"
-                
-            return None
+            if not ports and os.path.exists("/dev/ttyACM0"):
+                ports.append("/dev/ttyACM0")
+            
+            return sorted(ports)
         except Exception:
-            return None
+            return []
+    
+    def get_openrb_port(self):
+        """Find a port with 'OpenRB' in the name or description"""
+        ports = self.get_openrb_ports()
+        return ports[0] if ports else None
 
     def connect(self, port_name=None):
         """Connect to the specified serial port or auto-detect OpenRB"""
+        self.stop_reader()
         if self.serial_port is not None:
             try:
                 self.serial_port.close()
@@ -61,7 +83,7 @@ class SerialManager:
             )
             
             # Give the serial connection time to stabilize
-            time.sleep(0.5)
+            time.sleep(SERIAL_SETTLE_TIME)
             
             # Flush any pending data
             self.serial_port.reset_input_buffer()
@@ -80,6 +102,7 @@ class SerialManager:
 
     def disconnect(self):
         """Disconnect from the current serial port"""
+        self.stop_reader()
         if self.serial_port:
             try:
                 if self.serial_port.is_open:
@@ -116,4 +139,138 @@ class SerialManager:
                 return line.decode('utf-8', errors='replace').strip()
         except Exception:
             return None
-        return None 
\ No newline at end of file
+        return None
+    
+    def start_reader(self, on_lines, on_error=None):
+        """Start a background thread that drains the port and delivers complete lines in batches
+        
+        on_lines is called from the reader thread with a list of decoded lines. on_error
+        is called once if the port fails (e.g. the USB link drops) and the reader exits.
+        """
+        self.stop_reader()
+        if not self.serial_port or not self.serial_port.is_open:
+            return False
+        
+        self._reader_stop.clear()
+        self._rx_buffer.clear()
+        self.binary = False
+        self._binary_requested = False
+        self._frames = FrameDecoder()
+        self._reader_thread = threading.Thread(
+            target=self._reader_loop,
+            args=(self.serial_port, on_lines, on_error),
+            name="SerialReader",
+            daemon=True
+        )
+        self._reader_thread.start()
+        return True
+    
+    def stop_reader(self):
+        """Stop the background reader thread if it is running"""
+        thread = self._reader_thread
+        if thread is None:
+            return
+        self._reader_stop.set()
+        if thread is not threading.current_thread():
+            # read() returns within SERIAL_TIMEOUT, so this join is short
+            thread.join(SERIAL_TIMEOUT * 10)
+        self._reader_thread = None
+    
+    def request_binary(self, requested=True):
+        """Watch the incoming ASCII stream for the board's switch to binary frames
+        
+        Call before writing BINARY:1; call with False if the board refuses so
+        the reader stops looking.
+        """
+        self._binary_requested = requested
+    
+    def telemetry_stats(self):
+        """Current telemetry format, bytes received and binary decoder counters"""
+        return {
+            "format": "binary" if self.binary else "ascii",
+            "bytes_read": self.bytes_read,
+            "frames": self._frames.frames,
+            "crc_errors": self._frames.crc_errors,
+            "skipped_bytes": self._frames.skipped_bytes,
+        }
+    
+    def is_reading(self):
+        """Return True if the background reader thread is running"""
+        return self._reader_thread is not None and self._reader_thread.is_alive()
+    
+    def _reader_loop(self, port, on_lines, on_error):
+        """Reader thread body: block briefly for data, then drain everything in in_waiting
+        
+        Batches hold decoded lines (str) in ASCII mode and message tuples in binary mode.
+        """
+        while not self._reader_stop.is_set():
+            try:
+                # Blocks for at most SERIAL_TIMEOUT when the port is idle
+                data = port.read(port.in_waiting or 1)
+                if not data:
+                    continue
+                
+                # Pick up anything that arrived while we were waiting
+                waiting = port.in_waiting
+                if waiting:
+                    data += port.read(waiting)
+            except Exception:
+                if not self._reader_stop.is_set() and on_error:
+                    on_error()
+                return
+            
+            self.bytes_read += len(data)
+            lines = self._decode(data)
+            if lines:
+                on_lines(lines)
+    
+    def _decode(self, data):
+        """Turn received bytes into lines or messages, following switches between formats"""
+        if not self.binary:
+            return self._split_lines(data)
+        
+        messages = self._frames.feed(data)
+        remainder = self._frames.remainder
+        if remainder is not None:
+            # The board went back to ASCII after its last frame
+            self.binary = False
+            self._frames.remainder = None
+            self._rx_buffer.clear()
+            messages.extend(self._split_lines(remainder))
+        return messages
+    
+    def _split_lines(self, data):
+        """Append raw bytes to the receive buffer and return the complete lines it now holds"""
+        buffer = self._rx_buffer
+        buffer += data
+        
+        # Everything after the board's binary acknowledgement line is framed
+        binary_data = None
+        if self._binary_requested:
+            marker = buffer.find(BINARY_ENABLED_LINE)
+            newline = buffer.find(b"\n", marker) if marker >= 0 else -1
+            if newline >= 0:
+                binary_data = bytes(buffer[newline + 1:])
+                del buffer[newline + 1:]
+        
+        end = buffer.rfind(b"\n")
+        if end < 0:
+            # Drop a runaway partial line rather than letting the buffer grow without bound
+            if len(buffer) > SERIAL_MAX_LINE_LENGTH:
+                buffer.clear()
+            return []
+        
+        chunk = bytes(buffer[:end])
+        del buffer[:end + 1]
+        
+        lines = []
+        for raw in chunk.split(b"\n"):
+            line = raw.decode('utf-8', errors='replace').strip()
+            if line:
+                lines.append(line)
+        
+        if binary_data is not None:
+            self._binary_requested = False
+            self.binary = True
+            lines.extend(self._decode(binary_data))
+        return lines
@@ -0,0 +1,50 @@
+# Fields tracked per station, in display order
+STATION_FIELDS = ("enabled", "cycle_count", "failure_count", "keyswitch_current", "starter_current")
+
+class StationModel:
+    """Latest reported values for each station, recording which fields changed
+    
+    Updates only mark a field dirty when its value actually differs, so the
+    view can be refreshed at a fixed rate with just the fields that changed.
+    """
+    def __init__(self, station_ids):
+        self.values = {station_id: {} for station_id in station_ids}
+        self._dirty = {}
+    
+    def has_station(self, station_id):
+        """Return True if station_id is tracked by this model"""
+        return station_id in self.values
+    
+    def update(self, station_id, **fields):
+        """Record new values for a station; returns True if anything changed"""
+        current = self.values[station_id]
+        changed = False
+        for field, value in fields.items():
+            if current.get(field, _MISSING) != value:
+                current[field] = value
+                self._dirty.setdefault(station_id, {})[field] = value
+                changed = True
+        return changed
+    
+    def forget(self, station_id, field):
+        """Drop a stored value so the next report is treated as a change
+        
+        Used when the view was changed locally (e.g. a toggle click) and may no
+        longer match what the board last reported.
+        """
+        self.values[station_id].pop(field, None)
+    
+    def has_changes(self):
+        """Return True if there are changes waiting to be flushed"""
+        return bool(self._dirty)
+    
+    def take_changes(self):
+        """Return {station_id: {field: value}} changed since the last call and reset"""
+        changes, self._dirty = self._dirty, {}
+        return changes
+    
+    def snapshot(self):
+        """Return a copy of all current station values"""
+        return {station_id: dict(values) for station_id, values in self.values.items()}
+
+_MISSING = object()
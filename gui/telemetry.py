@@ -0,0 +1,138 @@
+"""Binary telemetry frames sent by the firmware after BINARY:1 (see arduino/eventReporter.cpp)
+
+Frame layout: SYNC(0xA5) LEN TYPE SEQ16 PAYLOAD[LEN] CRC16, where the CRC is
+CRC-16/CCITT-FALSE over LEN, TYPE, SEQ and PAYLOAD and 16-bit fields are
+little-endian. Payloads are packed little-endian structs and decode to the
+same message tuples as the ASCII protocol, with seq filled in.
+"""
+import struct
+from binascii import crc_hqx
+from messages import CycleMessage, StationMessage, SystemStateMessage, EventMessage
+
+FRAME_SYNC = 0xA5
+FRAME_CYCLE = 1
+FRAME_STATION = 2
+FRAME_SYSTEM_STATE = 3
+FRAME_EVENT = 4
+FRAME_MAX_PAYLOAD = 128
+FRAME_OVERHEAD = 7  # sync, length, type, sequence number and CRC
+
+_CYCLE = struct.Struct("<BBIIff")
+_STATION = struct.Struct("<BBII")
+_SYSTEM_STATE = struct.Struct("<B")
+_UINT16 = struct.Struct("<H")
+
+# Event texts the firmware sends when switching modes; the first is sent in
+# ASCII, the second in binary, and each is the last message in the old format
+BINARY_ENABLED_EVENT = "Binary telemetry enabled"
+BINARY_DISABLED_EVENT = "Binary telemetry disabled"
+BINARY_ENABLED_LINE = f"EVENT:{BINARY_ENABLED_EVENT}".encode()
+
+def encode_frame(frame_type, payload, seq=0):
+    """Build one frame around a payload"""
+    payload = bytes(payload[:FRAME_MAX_PAYLOAD])
+    body = bytes((len(payload), frame_type)) + _UINT16.pack(seq & 0xFFFF) + payload
+    return bytes((FRAME_SYNC,)) + body + _UINT16.pack(crc_hqx(body, 0xFFFF))
+
+def encode_message(message):
+    """Encode a message tuple as the firmware would (used by the simulator and benchmarks)"""
+    seq = getattr(message, 'seq', None) or 0
+    if isinstance(message, CycleMessage):
+        return encode_frame(FRAME_CYCLE, _CYCLE.pack(message.station, message.enabled, message.cycles,
+                                                     message.failures, message.keyswitch_current,
+                                                     message.starter_current), seq)
+    if isinstance(message, StationMessage):
+        return encode_frame(FRAME_STATION, _STATION.pack(message.station, message.enabled,
+                                                         message.cycles, message.failures), seq)
+    if isinstance(message, SystemStateMessage):
+        return encode_frame(FRAME_SYSTEM_STATE, _SYSTEM_STATE.pack(message.running), seq)
+    if isinstance(message, EventMessage):
+        return encode_frame(FRAME_EVENT, message.text.encode(), seq)
+    raise ValueError(f"Cannot encode {type(message).__name__}")
+
+def _decode_cycle(view, offset, seq):
+    station, enabled, cycles, failures, keyswitch, starter = _CYCLE.unpack_from(view, offset)
+    return CycleMessage(station, enabled == 1, cycles, failures, keyswitch, starter, seq)
+
+def _decode_station(view, offset, seq):
+    station, enabled, cycles, failures = _STATION.unpack_from(view, offset)
+    return StationMessage(station, enabled == 1, cycles, failures, seq)
+
+def _decode_system_state(view, offset, seq):
+    return SystemStateMessage(view[offset] == 1, seq)
+
+# Frame type -> (payload size or None for variable, decoder)
+_DECODERS = {
+    FRAME_CYCLE: (_CYCLE.size, _decode_cycle),
+    FRAME_STATION: (_STATION.size, _decode_station),
+    FRAME_SYSTEM_STATE: (_SYSTEM_STATE.size, _decode_system_state),
+    FRAME_EVENT: (None, None),
+}
+
+class FrameDecoder:
+    """Incrementally splits a byte stream into frames and decodes them
+
+    Fields are unpacked straight from the receive buffer through a memoryview.
+    Bytes that do not form a valid frame are skipped up to the next sync byte
+    and counted. Decoding stops after BINARY_DISABLED_EVENT; the bytes that
+    follow it (ASCII again) are left in `remainder`.
+    """
+    def __init__(self):
+        self.buffer = bytearray()
+        self.frames = 0
+        self.crc_errors = 0
+        self.skipped_bytes = 0
+        self.remainder = None
+
+    def feed(self, data):
+        """Append received bytes and return the messages of all complete frames"""
+        buffer = self.buffer
+        buffer += data
+        size = len(buffer)
+        messages = []
+        pos = 0
+        view = memoryview(buffer)
+        try:
+            while True:
+                start = buffer.find(FRAME_SYNC, pos)
+                if start < 0:
+                    self.skipped_bytes += size - pos
+                    pos = size
+                    break
+                self.skipped_bytes += start - pos
+                if start + 5 > size:
+                    pos = start
+                    break
+
+                length = buffer[start + 1]
+                end = start + 5 + length + 2
+                if length > FRAME_MAX_PAYLOAD:
+                    self.crc_errors += 1
+                    pos = start + 1
+                    continue
+                if end > size:
+                    pos = start
+                    break
+                if crc_hqx(view[start + 1:end - 2], 0xFFFF) != buffer[end - 2] | (buffer[end - 1] << 8):
+                    # Not a frame after all (or a corrupted one): resynchronise on the next sync byte
+                    self.crc_errors += 1
+                    pos = start + 1
+                    continue
+
+                pos = end
+                self.frames += 1
+                seq = buffer[start + 3] | (buffer[start + 4] << 8)
+                expected, decoder = _DECODERS.get(buffer[start + 2], (0, None))
+                if decoder is not None and length == expected:
+                    messages.append(decoder(view, start + 5, seq))
+                elif expected is None:
+                    text = bytes(view[start + 5:end - 2]).decode('utf-8', errors='replace')
+                    messages.append(EventMessage(text, seq))
+                    if text == BINARY_DISABLED_EVENT:
+                        self.remainder = bytes(view[end:])
+                        pos = size
+                        break
+        finally:
+            view.release()
+        del buffer[:pos]
+        return messages
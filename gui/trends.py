@@ -0,0 +1,139 @@
+"""Per-station current history for the trend plots (no Qt dependency)
+
+Samples live in preallocated NumPy ring buffers and are reduced to roughly
+one or two points per pixel before drawing, so redrawing a whole session
+costs a few vectorized passes over the buffers rather than a Python loop
+over every cycle.
+"""
+import numpy as np
+from constants import TREND_CAPACITY
+
+# Buffered fields, in the order of TrendBuffer.data's first axis
+TREND_FIELDS = ("keyswitch_current", "starter_current")
+
+class TrendBuffer:
+    """Keyswitch and starter current of every cycle, per station
+
+    Each station gets a ring of `capacity` float32 samples per field, all
+    allocated up front, so memory is fixed (see nbytes) and append() only
+    stores into the existing arrays. Once a station has recorded more than
+    `capacity` cycles its oldest samples are overwritten.
+    """
+    def __init__(self, stations, capacity=TREND_CAPACITY):
+        self.capacity = capacity
+        self.data = np.zeros((len(TREND_FIELDS), stations, capacity), dtype=np.float32)
+        self.counts = [0] * stations
+        self.version = 0  # bumped on every change so views can skip redundant redraws
+
+    @property
+    def stations(self):
+        return len(self.counts)
+
+    @property
+    def nbytes(self):
+        """Memory held by the sample buffers"""
+        return self.data.nbytes
+
+    def append(self, station, keyswitch_current, starter_current):
+        """Record one cycle for a 0-based station index"""
+        count = self.counts[station]
+        position = count % self.capacity
+        self.data[0, station, position] = keyswitch_current
+        self.data[1, station, position] = starter_current
+        self.counts[station] = count + 1
+        self.version += 1
+
+    def clear(self):
+        self.counts = [0] * self.stations
+        self.version += 1
+
+    def series(self, field, station):
+        """Return (first cycle index, samples oldest first) for one station and field
+
+        The samples are a view into the buffer until it has wrapped, after
+        which they are an ordered copy.
+        """
+        values = self.data[TREND_FIELDS.index(field), station]
+        count = self.counts[station]
+        if count <= self.capacity:
+            return 0, values[:count]
+        position = count % self.capacity
+        return count - self.capacity, np.concatenate((values[position:], values[:position]))
+
+    def since(self, station, start):
+        """Return (first cycle index, keyswitch, starter) for a station's cycles from `start` on
+
+        Cycles already overwritten are skipped, so first may be later than start.
+        """
+        count = self.counts[station]
+        first = min(count, max(start, count - self.capacity))
+        positions = np.arange(first, count) % self.capacity
+        return first, self.data[0, station, positions], self.data[1, station, positions]
+
+def minmax_decimate(values, buckets):
+    """Reduce a series to the minimum and maximum of each of `buckets` slices
+
+    Returns (indices, values) with about 2 * buckets points in their original
+    order, so a polyline through them spans the same range as the full series
+    in every bucket (i.e. every pixel column when buckets is the plot width).
+    """
+    count = len(values)
+    if buckets < 1 or count <= 2 * buckets:
+        return np.arange(count), values
+
+    size = -(-count // buckets)  # samples per bucket, rounded up
+    full = count // size
+    blocks = values[:full * size].reshape(full, size)
+    lows = blocks.argmin(axis=1)
+    highs = blocks.argmax(axis=1)
+    offsets = np.arange(0, full * size, size)
+
+    indices = np.empty(2 * full, dtype=np.int64)
+    indices[0::2] = offsets + np.minimum(lows, highs)
+    indices[1::2] = offsets + np.maximum(lows, highs)
+
+    tail = values[full * size:]
+    if len(tail):
+        start = full * size
+        first, second = sorted((start + int(tail.argmin()), start + int(tail.argmax())))
+        indices = np.append(indices, (first, second))
+    return indices, values[indices]
+
+def lttb_decimate(values, threshold):
+    """Reduce a series to `threshold` points with Largest-Triangle-Three-Buckets
+
+    Keeps the points that best preserve the visual shape. The per-bucket
+    choice depends on the previous one, so this loops over buckets (not
+    samples) and is slower than minmax_decimate.
+    """
+    count = len(values)
+    if threshold < 3 or count <= threshold:
+        return np.arange(count), values
+
+    # The first and last samples are kept; the rest is split into threshold - 2 buckets
+    edges = np.linspace(1, count - 1, threshold - 1).astype(np.int64)
+    bounds = np.append(edges, count)
+    sizes = np.diff(bounds)
+    averages = np.add.reduceat(values.astype(np.float64), bounds[:-1]) / sizes
+    centres = (bounds[:-1] + bounds[1:] - 1) / 2.0
+
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = count - 1
+    selected = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        # Triangle between the previous pick, this bucket's candidates and the next bucket's average
+        next_x, next_y = centres[bucket + 1], averages[bucket + 1]
+        selected_y = values[selected]
+        candidates = values[start:end]
+        areas = np.abs((selected - next_x) * (candidates - selected_y) -
+                       (selected - np.arange(start, end)) * (next_y - selected_y))
+        selected = start + int(areas.argmax())
+        indices[bucket + 1] = selected
+    return indices, values[indices]
+
+DECIMATORS = {
+    "minmax": lambda values, width: minmax_decimate(values, width),
+    "lttb": lambda values, width: lttb_decimate(values, 2 * width),
+}
@@ -0,0 +1,72 @@
+"""Measure message parser throughput on recorded or synthetic traffic
+
+Usage:
+    python tools/bench_parser.py                       # synthetic traffic
+    python tools/bench_parser.py logs/keyswitch_log_*.txt
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "gui"))
+
+from messages import parse_message, MessageParseError
+from traffic import load_traffic
+
+def run_parser(lines):
+    """Parse every line once; returns (seconds, parse errors)"""
+    errors = 0
+    start = time.perf_counter()
+    for line in lines:
+        try:
+            parse_message(line)
+        except MessageParseError:
+            errors += 1
+    return time.perf_counter() - start, errors
+
+def benchmark(lines, repeats):
+    """Best-of-N timing for str and bytes input"""
+    raw_lines = [line.encode() + b"\r\n" for line in lines]
+    results = {"lines": len(lines), "repeats": repeats}
+    for name, data in (("str", lines), ("bytes", raw_lines)):
+        best = None
+        errors = 0
+        for _ in range(repeats):
+            elapsed, errors = run_parser(data)
+            best = elapsed if best is None else min(best, elapsed)
+        results[name] = {
+            "seconds": best,
+            "lines_per_second": len(data) / best if best else float("inf"),
+            "ns_per_line": best * 1e9 / len(data) if data else 0.0,
+            "parse_errors": errors,
+        }
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("logs", nargs="*", help="log files with recorded traffic (.txt or .txt.gz)")
+    parser.add_argument("--count", type=int, default=200000, help="maximum number of lines to parse")
+    parser.add_argument("--repeats", type=int, default=5, help="timing repetitions (best is reported)")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+    
+    lines = load_traffic(args.logs, args.count)
+    if not lines:
+        print("No messages found", file=sys.stderr)
+        return 1
+    
+    results = benchmark(lines, args.repeats)
+    for name in ("str", "bytes"):
+        r = results[name]
+        print(f"{name:>5}: {r['lines_per_second']:>12,.0f} lines/s  {r['ns_per_line']:>8.0f} ns/line  "
+              f"({r['parse_errors']} parse errors)")
+    
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
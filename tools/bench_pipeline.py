@@ -0,0 +1,281 @@
+"""Measure the full host pipeline on recorded or synthetic traffic
+
+Lines are written into a pseudo-terminal that the GUI opens like an OpenRB
+board, so every message goes through the serial reader, process_serial_message,
+the station model and widget, the log view and the log file writer.
+
+Usage:
+    python tools/bench_pipeline.py                           # synthetic, as fast as possible
+    python tools/bench_pipeline.py --rate 2000 --json bench.json
+    python tools/bench_pipeline.py logs/keyswitch_log_*.txt
+"""
+import argparse
+import json
+import os
+import resource
+import select
+import sys
+import tempfile
+import threading
+import time
+import tty
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "gui"))
+
+from traffic import load_traffic, encodable_lines, numbered_messages
+from messages import parse_message
+from telemetry import encode_message, BINARY_ENABLED_LINE
+
+# Give up when nothing has been processed for this long
+STALL_TIMEOUT = 10.0
+
+class TrafficFeeder:
+    """Writes the benchmark lines into the board side of a PTY and records when each was sent
+    
+    With binary set, the feeder accepts the host's BINARY:1 and sends the
+    traffic as binary telemetry frames instead.
+    """
+    def __init__(self, lines, rate=0.0, chunk=64, binary=False):
+        self.lines = [line.encode() + b"\r\n" for line in lines]
+        self.frames = [encode_message(message) for message in numbered_messages(lines)] if binary else None
+        self.rate = rate
+        self.chunk = chunk
+        self.sent_at = [0.0] * len(lines)
+        self.feeding = threading.Event()
+        self.finished = threading.Event()
+
+        self.master_fd, self._slave_fd = os.openpty()
+        tty.setraw(self._slave_fd)
+        self.port = os.ttyname(self._slave_fd)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="TrafficFeeder", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        os.close(self.master_fd)
+        os.close(self._slave_fd)
+
+    def _run(self):
+        # Answer the connection's commands until the benchmark starts
+        while not self.feeding.is_set() and not self._stop.is_set():
+            readable, _, _ = select.select([self.master_fd], [], [], 0.05)
+            if not readable:
+                continue
+            for command in os.read(self.master_fd, 4096).decode().split():
+                if command == "REQUEST_STATE":
+                    reply = parse_message("SYSTEM_STATE:0"), parse_message("STATION:0:1:0:0")
+                    os.write(self.master_fd, b"".join(encode_message(m) for m in reply) if self.lines is self.frames
+                             else b"SYSTEM_STATE:0\r\nSTATION:0:1:0:0\r\n")
+                elif command == "BINARY:1" and self.frames:
+                    os.write(self.master_fd, BINARY_ENABLED_LINE + b"\r\n")
+                    self.lines = self.frames
+                else:
+                    os.write(self.master_fd, f"EVENT:Error: Unrecognized command - {command}\r\n".encode())
+
+        start = time.perf_counter()
+        index = 0
+        total = len(self.lines)
+        while index < total and not self._stop.is_set():
+            if self.rate:
+                # Send whatever is due by now, then sleep until the next line
+                due = min(total, int((time.perf_counter() - start) * self.rate) + 1)
+                if due <= index:
+                    time.sleep(max(0.0, min(0.001, (index + 1) / self.rate - (time.perf_counter() - start))))
+                    continue
+                end = min(due, index + self.chunk)
+            else:
+                end = min(total, index + self.chunk)
+
+            data = b"".join(self.lines[index:end])
+            now = time.perf_counter()
+            for i in range(index, end):
+                self.sent_at[i] = now
+            view = memoryview(data)
+            while view:
+                view = view[os.write(self.master_fd, view):]
+            index = end
+
+            # Drain commands so the host never blocks on a full PTY
+            readable, _, _ = select.select([self.master_fd], [], [], 0)
+            if readable:
+                os.read(self.master_fd, 4096)
+        self.finished.set()
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+def current_rss():
+    """Resident set size in bytes, or None where /proc is unavailable"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+def wait_for(app, condition, timeout):
+    """Run the Qt event loop until condition() is true or timeout expires"""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        app.processEvents()
+        time.sleep(0.001)
+    return True
+
+def run_pipeline(lines, rate, chunk, show, binary=False):
+    """Feed lines through a KeyswitchTesterGUI and return the measurements"""
+    from PySide6.QtWidgets import QApplication
+    from main import KeyswitchTesterGUI
+
+    app = QApplication.instance() or QApplication([])
+    feeder = TrafficFeeder(lines, rate, chunk, binary)
+    window = KeyswitchTesterGUI([feeder.port])
+    if show:
+        window.show()
+
+    window.connect_to_device()
+    if not wait_for(app, lambda: window.board_manager.connected and not window.board_manager.pending_count(), 10.0):
+        feeder.stop()
+        raise RuntimeError(f"Could not connect to {feeder.port}")
+    wait_for(app, lambda: False, 0.2)
+
+    # Timestamp every processed message; messages arrive in the order they were sent
+    done_at = [0.0] * len(lines)
+    processed = [0]
+    process_serial_message = window.process_serial_message
+
+    def timed_process(message, board_index=0):
+        process_serial_message(message, board_index)
+        done_at[processed[0]] = time.perf_counter()
+        processed[0] += 1
+    window.process_serial_message = timed_process
+
+    usage_before = resource.getrusage(resource.RUSAGE_SELF)
+    start = time.perf_counter()
+    feeder.feeding.set()
+
+    last_count = -1
+    last_progress = time.monotonic()
+    while processed[0] < len(lines):
+        app.processEvents()
+        if processed[0] != last_count:
+            last_count = processed[0]
+            last_progress = time.monotonic()
+        elif time.monotonic() - last_progress > STALL_TIMEOUT:
+            break
+        time.sleep(0.0005)
+    end = time.perf_counter()
+
+    # Let the capped display refreshes run once more
+    wait_for(app, lambda: False, 0.2)
+    usage_after = resource.getrusage(resource.RUSAGE_SELF)
+    rss_end = current_rss()
+
+    log_path = window.serial_log.log_file_path
+    close_start = time.perf_counter()
+    window.close()
+    close_seconds = time.perf_counter() - close_start
+    feeder.stop()
+
+    count = processed[0]
+    latencies = sorted((done_at[i] - feeder.sent_at[i]) * 1000 for i in range(count))
+    elapsed = end - start
+    cpu_user = usage_after.ru_utime - usage_before.ru_utime
+    cpu_system = usage_after.ru_stime - usage_before.ru_stime
+
+    logged = 0
+    if log_path and os.path.exists(log_path):
+        with open(log_path, 'rb') as f:
+            logged = sum(1 for _ in f)
+
+    return {
+        "telemetry": "binary" if feeder.lines is feeder.frames else "ascii",
+        "lines": len(lines),
+        "processed": count,
+        "seconds": elapsed,
+        "lines_per_second": count / elapsed if elapsed else 0.0,
+        "latency_ms": {
+            "p50": percentile(latencies, 0.50),
+            "p90": percentile(latencies, 0.90),
+            "p99": percentile(latencies, 0.99),
+            "p999": percentile(latencies, 0.999),
+            "max": latencies[-1] if latencies else 0.0,
+            "mean": sum(latencies) / count if count else 0.0,
+        },
+        "cpu": {
+            "user_seconds": cpu_user,
+            "system_seconds": cpu_system,
+            "percent": 100.0 * (cpu_user + cpu_system) / elapsed if elapsed else 0.0,
+        },
+        "rss_mb": {
+            # ru_maxrss is in kilobytes on Linux
+            "peak": usage_after.ru_maxrss / 1024,
+            "end": rss_end / (1024 * 1024) if rss_end is not None else None,
+        },
+        "log": {
+            "path": log_path,
+            "lines": logged,
+            "close_seconds": close_seconds,
+        },
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("logs", nargs="*", help="log files with recorded traffic (.txt or .txt.gz)")
+    parser.add_argument("--count", type=int, default=50000, help="maximum number of lines to send")
+    parser.add_argument("--rate", type=float, default=0.0, help="lines per second to send (0: as fast as possible)")
+    parser.add_argument("--binary", action="store_true", help="send the traffic as binary telemetry frames")
+    parser.add_argument("--chunk", type=int, default=64, help="maximum lines per write to the PTY")
+    parser.add_argument("--platform", default="offscreen",
+                        help="Qt platform plugin (default: offscreen; use xcb or wayland to watch)")
+    parser.add_argument("--no-show", action="store_true", help="do not show the window (skips repaints)")
+    parser.add_argument("--logs-dir", help="directory for the session's log files (default: a temporary directory)")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    lines = load_traffic(args.logs, args.count)
+    if args.binary:
+        # Host lines in recorded logs have no frame; leave them out so latency still pairs up per message
+        loaded = len(lines)
+        lines = encodable_lines(lines)
+        if len(lines) < loaded:
+            print(f"{loaded - len(lines)} lines without a binary encoding skipped", file=sys.stderr)
+    if not lines:
+        print("No messages found", file=sys.stderr)
+        return 1
+
+    os.environ["QT_QPA_PLATFORM"] = args.platform
+    with tempfile.TemporaryDirectory(prefix="keyswitch_bench_") as logs_dir:
+        # Must be set before the GUI modules import their constants
+        os.environ["KEYSWITCH_LOGS_DIR"] = args.logs_dir or logs_dir
+        results = run_pipeline(lines, args.rate, args.chunk, not args.no_show, args.binary)
+
+    results["config"] = {
+        "source": args.logs or "synthetic",
+        "rate": args.rate,
+        "chunk": args.chunk,
+        "platform": args.platform,
+        "shown": not args.no_show,
+    }
+
+    latency = results["latency_ms"]
+    print(f"{results['telemetry']}: {results['processed']}/{results['lines']} lines in {results['seconds']:.2f} s: "
+          f"{results['lines_per_second']:,.0f} lines/s")
+    print(f"latency ms: p50 {latency['p50']:.2f}  p90 {latency['p90']:.2f}  p99 {latency['p99']:.2f}  "
+          f"p99.9 {latency['p999']:.2f}  max {latency['max']:.2f}")
+    print(f"cpu: {results['cpu']['percent']:.0f}%  rss: peak {results['rss_mb']['peak']:.1f} MB")
+    print(f"log: {results['log']['lines']} lines written, closed in {results['log']['close_seconds'] * 1000:.0f} ms")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0 if results["processed"] == results["lines"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+"""Re-analyse recorded sessions for switches drifting toward failure
+
+Runs every station's cycles from one or more cycle stores (.kcyc) through
+the same drift detector the GUI uses, one vectorized pass per station.
+
+Usage:
+    python tools/drift_report.py logs/keyswitch_cycles_*.kcyc
+    python tools/drift_report.py --window 200 --json drift.json logs/keyswitch_cycles_20250101_080000.kcyc
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "gui"))
+
+from cycle_store import load_records
+from drift import DriftDetector, analyse_records, format_alert
+from constants import DRIFT_BASELINE_CYCLES, DRIFT_WINDOW, DRIFT_EWMA_ALPHA, DRIFT_CUSUM_K, DRIFT_CUSUM_H
+
+def analyse_store(path, **options):
+    """Return (records analysed, detector, alerts, seconds) for one cycle store"""
+    records = load_records(path)
+    stations = int(records["station"].max()) + 1 if len(records) else 0
+    start = time.perf_counter()
+    detector, alerts = analyse_records(records, DriftDetector(stations, **options))
+    return len(records), detector, alerts, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("stores", nargs="+", help="cycle store files (.kcyc)")
+    parser.add_argument("--baseline", type=int, default=DRIFT_BASELINE_CYCLES, help="cycles used as each switch's baseline")
+    parser.add_argument("--window", type=int, default=DRIFT_WINDOW, help="cycles in the rolling mean/std")
+    parser.add_argument("--alpha", type=float, default=DRIFT_EWMA_ALPHA, help="EWMA smoothing factor")
+    parser.add_argument("--cusum-k", type=float, default=DRIFT_CUSUM_K, help="CUSUM allowance (baseline std devs)")
+    parser.add_argument("--cusum-h", type=float, default=DRIFT_CUSUM_H, help="CUSUM decision interval (baseline std devs)")
+    parser.add_argument("--json", help="write per-station statistics and alerts to this file")
+    args = parser.parse_args()
+
+    options = dict(baseline=args.baseline, window=args.window, alpha=args.alpha,
+                   cusum_k=args.cusum_k, cusum_h=args.cusum_h)
+    results = {}
+    for path in args.stores:
+        try:
+            count, detector, alerts, seconds = analyse_store(path, **options)
+        except (OSError, ValueError) as e:
+            print(f"{path}: {e}", file=sys.stderr)
+            return 1
+
+        print(f"{path}: {count} cycles, {detector.stations} stations, analysed in {seconds * 1000:.0f} ms")
+        for alert in alerts:
+            print(f"  {format_alert(alert)}")
+        if not alerts:
+            print("  no drift detected")
+        results[path] = {
+            "cycles": count,
+            "stations": {station + 1: detector.summary(station) for station in range(detector.stations)},
+            "alerts": [dict(alert._asdict(), station=alert.station + 1) for alert in alerts],
+        }
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,440 @@
+"""Export session logs and cycle stores to CSV, NumPy .npz, Parquet or Arrow
+
+CYCLE, STATION and EVENT messages become three tables of typed columns:
+
+    cycles:   timestamp board station enabled cycles failures keyswitch_current starter_current seq
+    stations: timestamp board station enabled cycles failures seq
+    events:   timestamp board text seq
+
+timestamp is Unix time in seconds (as in the cycle store), station the
+0-based global station (board * 4 + the board's station) and seq -1 where
+the firmware sent no sequence number. Each table is written to
+<output>_<table>.<ext>. The input is read EXPORT_CHUNK_BYTES (or
+EXPORT_CHUNK_RECORDS) at a time and every chunk is converted with
+whole-array NumPy operations and appended to the outputs, so memory stays
+bounded however long the session is. Parquet and Arrow need pyarrow.
+
+Usage:
+    python tools/export_session.py logs/keyswitch_log_20250101_080000.txt
+    python tools/export_session.py --format npz --format parquet logs/keyswitch_log_20250101_080000.txt.gz
+    python tools/export_session.py --output /tmp/run7 logs/keyswitch_cycles_20250101_080000.kcyc
+"""
+import argparse
+import csv
+import gzip
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+import zipfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "gui"))
+
+from constants import STATIONS_PER_BOARD
+from cycle_store import FILE_MAGIC, load_records
+from log_format import LOG_PREFIX_LENGTH
+from log_index import index_chunk, LINE_CYCLE, LINE_STATION, LINE_EVENT
+from messages import parse_message, MessageParseError
+
+# Bytes of log text converted at a time
+EXPORT_CHUNK_BYTES = 16 * 1024 * 1024
+
+# Cycle store records converted at a time
+EXPORT_CHUNK_RECORDS = 262144
+
+# Table -> (column, dtype) in output order; dtype None is a text column
+TABLES = {
+    "cycles": (("timestamp", np.float64), ("board", np.uint8), ("station", np.uint16), ("enabled", np.bool_),
+               ("cycles", np.uint32), ("failures", np.uint32), ("keyswitch_current", np.float32),
+               ("starter_current", np.float32), ("seq", np.int64)),
+    "stations": (("timestamp", np.float64), ("board", np.uint8), ("station", np.uint16), ("enabled", np.bool_),
+                 ("cycles", np.uint32), ("failures", np.uint32), ("seq", np.int64)),
+    "events": (("timestamp", np.float64), ("board", np.uint8), ("text", None), ("seq", np.int64)),
+}
+
+# Numeric fields after "CYCLE:" / "STATION:" (station first), and how many of them have decimals
+_FIELD_COUNTS = {"cycles": (6, 2), "stations": (4, 0)}
+
+# Bytes a well-formed CYCLE/STATION body (with its line end) is made of
+_NUMERIC_BYTES = np.zeros(256, dtype=bool)
+_NUMERIC_BYTES[np.frombuffer(b"0123456789:.#-\r\n", dtype=np.uint8)] = True
+
+def _local_to_epoch(timestamps):
+    """Convert log timestamps (local wall time on a UTC scale, see log_index) to Unix time
+
+    The offset is looked up once per distinct hour, so DST changes are followed.
+    """
+    if not len(timestamps):
+        return timestamps
+    hours, inverse = np.unique(timestamps // 3600, return_inverse=True)
+    offsets = np.array([time.mktime(time.gmtime(hour * 3600)[:8] + (-1,)) - hour * 3600 for hour in hours])
+    return timestamps + offsets[inverse]
+
+# Turns a run of gathered "f1:...:fn[#seq]\n" bodies into one ':'-separated list for np.fromstring
+_SEPARATORS = bytes.maketrans(b"#\n\r", b":: ")
+
+def _tag_lengths(data, positions):
+    """Length of the optional "[Bn] " board tag at each message position (see format_board_message)"""
+    tagged = (data[positions] == ord("[")) & (data[positions + 1] == ord("B"))
+    return np.where(tagged, np.where(data[positions + 3] == ord("]"), 5, 6), 0)
+
+def _gather(data, begins, ends):
+    """Concatenate data[begins[i]:ends[i] + 1] for ordered, non-overlapping ranges"""
+    # Mask built from alternating run lengths: gap before range 0, range 0, gap, range 1, ..., trailing gap
+    stops = ends + 1
+    runs = np.empty(2 * len(begins) + 1, dtype=np.int64)
+    runs[0:-1:2] = begins - np.concatenate(([0], stops[:-1]))
+    runs[1::2] = stops - begins
+    runs[-1] = len(data) - stops[-1]
+    inside = np.zeros(len(runs), dtype=bool)
+    inside[1::2] = True
+    return data[np.repeat(inside, runs)]
+
+def _fromstring(text, offsets, first, last, width, rows, kept, group):
+    """Parse rows first..last-1 of a ':'-separated text into rows[group[...]], bisecting around bad rows
+
+    offsets[i] is where row i starts in text (offsets[-1] is its length);
+    rows that cannot be parsed are left with kept False.
+    """
+    with warnings.catch_warnings():
+        # Older NumPy warns and returns what it parsed, newer raises ValueError
+        warnings.simplefilter("ignore", DeprecationWarning)
+        try:
+            values = np.fromstring(text[offsets[first]:offsets[last] - 1], sep=":")
+        except ValueError:
+            values = None
+    if values is not None and len(values) == (last - first) * width:
+        rows[group[first:last], :width] = values.reshape(-1, width)
+        kept[group[first:last]] = True
+    elif last - first > 1:
+        middle = (first + last) // 2
+        _fromstring(text, offsets, first, middle, width, rows, kept, group)
+        _fromstring(text, offsets, middle, last, width, rows, kept, group)
+
+def _parse_numeric(data, begins, ends, prefix, fields, decimals):
+    """Parse the 'f1:...:fn[#seq]' bodies at data[begins:ends] into (rows, kept)
+
+    rows is a (lines, fields + 1) float64 array with seq -1 where absent and
+    kept masks the lines that parsed. Well-formed lines, with and without a
+    sequence number, are converted by np.fromstring in bulk; only the rare
+    malformed line goes through parse_message.
+    """
+    rows = np.full((len(begins), fields + 1), -1.0)
+    kept = np.zeros(len(begins), dtype=bool)
+    lengths = ends - begins + 1
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+    text = _gather(data, begins, ends)
+    # Only lines shaped exactly like the firmware's go in bulk: a short line next to a long
+    # one would shift every field after it, and fromstring accepts more than int() does
+    colons = np.add.reduceat(text == ord(":"), offsets[:-1], dtype=np.int32)
+    marks = np.add.reduceat(text == ord("#"), offsets[:-1], dtype=np.int32)
+    dots = np.add.reduceat(text == ord("."), offsets[:-1], dtype=np.int32)
+    others = np.add.reduceat(~_NUMERIC_BYTES[text], offsets[:-1], dtype=np.int32)
+    shaped = (colons == fields - 1) & (dots == decimals) & (others == 0)
+
+    for width in (fields, fields + 1):
+        group = np.flatnonzero(shaped & (marks == width - fields))
+        if not len(group):
+            continue
+        if len(group) < len(begins):
+            group_text = _gather(data, begins[group], ends[group])
+            group_offsets = np.concatenate(([0], np.cumsum(lengths[group])))
+        else:
+            group_text, group_offsets = text, offsets
+        _fromstring(group_text.tobytes().translate(_SEPARATORS), group_offsets, 0, len(group),
+                    width, rows, kept, group)
+
+    for row in np.flatnonzero(~kept):
+        line = prefix + data[begins[row]:ends[row]].tobytes()
+        try:
+            message = parse_message(line.decode('utf-8', errors='replace'))
+        except MessageParseError:
+            continue
+        if len(message) == fields + 1:
+            rows[row, :fields] = message[:fields]
+            rows[row, fields] = -1 if message.seq is None else message.seq
+            kept[row] = True
+    return rows, kept
+
+def _numeric_table(table, data, begins, ends, prefix, timestamps, boards):
+    """Columns of the cycles or stations table for the given lines of one chunk"""
+    rows, kept = _parse_numeric(data, begins, ends, prefix, *_FIELD_COUNTS[table])
+    # Corrupted lines can still parse as numbers; drop values that don't fit the columns
+    integers = rows[:, [0, 1, 2, 3, -1]]
+    kept &= (integers == np.floor(integers)).all(axis=1) & (integers[:, [0, 2, 3]] >= 0).all(axis=1)
+    kept &= (rows[:, 0] < STATIONS_PER_BOARD) & (rows[:, -1] >= -1)
+    if not kept.all():
+        rows, timestamps, boards = rows[kept], timestamps[kept], boards[kept]
+
+    columns = {"timestamp": timestamps, "board": boards,
+               "station": boards.astype(np.int64) * STATIONS_PER_BOARD + rows[:, 0].astype(np.int64),
+               "enabled": rows[:, 1] == 1, "cycles": rows[:, 2], "failures": rows[:, 3], "seq": rows[:, -1]}
+    if table == "cycles":
+        columns["keyswitch_current"] = rows[:, 4]
+        columns["starter_current"] = rows[:, 5]
+    return {name: np.asarray(columns[name], dtype=dtype) for name, dtype in TABLES[table]}
+
+def _event_table(bodies, timestamps, boards):
+    texts = []
+    seqs = np.full(len(bodies), -1, dtype=np.int64)
+    for row, body in enumerate(bodies):
+        text = body.rstrip(b"\r").decode('utf-8', errors='replace')
+        mark = text.rfind("#")
+        if mark >= 0 and text[mark + 1:].isdigit():
+            seqs[row] = int(text[mark + 1:])
+            text = text[:mark]
+        texts.append(text)
+    return {"timestamp": timestamps, "board": boards.astype(np.uint8), "text": texts, "seq": seqs}
+
+def convert_log_chunk(chunk, last_timestamp=np.nan):
+    """Convert a chunk of complete log lines to {table: columns}; also returns the chunk's last timestamp"""
+    records = index_chunk(chunk, 0, last_timestamp)
+    data = np.frombuffer(chunk, dtype=np.uint8)
+    starts = records["offset"].astype(np.int64)
+    ends = np.flatnonzero(data == ord("\n"))
+    timestamps = _local_to_epoch(records["timestamp"])
+    tables = {}
+    for table, code, prefix in (("cycles", LINE_CYCLE, b"CYCLE:"), ("stations", LINE_STATION, b"STATION:"),
+                                ("events", LINE_EVENT, b"EVENT:")):
+        selected = np.flatnonzero(records["type"] == code)
+        if not len(selected):
+            continue
+        messages = starts[selected] + LOG_PREFIX_LENGTH
+        begins = messages + _tag_lengths(data, messages) + len(prefix)
+        # The index only looks at a few characters of the type; check the whole prefix
+        expected = np.frombuffer(prefix, dtype=np.uint8)
+        valid = (data[(begins - len(prefix))[:, None] + np.arange(len(prefix))] == expected).all(axis=1)
+        selected, begins = selected[valid], begins[valid]
+        if table == "events":
+            bodies = [chunk[begin:end] for begin, end in zip(begins.tolist(), ends[selected].tolist())]
+            tables[table] = _event_table(bodies, timestamps[selected], records["board"][selected])
+        else:
+            tables[table] = _numeric_table(table, data, begins, ends[selected], prefix, timestamps[selected],
+                                           records["board"][selected])
+    last = records["timestamp"][-1] if len(records) else last_timestamp
+    return tables, last
+
+def iter_log_tables(path, chunk_bytes=EXPORT_CHUNK_BYTES):
+    """Yield {table: columns} for successive chunks of a plain or gzip-compressed log"""
+    opener = gzip.open if path.endswith(".gz") else open
+    last_timestamp = np.nan
+    with opener(path, 'rb') as f:
+        pending = b""
+        while True:
+            block = f.read(chunk_bytes)
+            if not block:
+                break
+            block = pending + block
+            end = block.rfind(b"\n") + 1
+            pending = block[end:]
+            if end:
+                tables, last_timestamp = convert_log_chunk(block[:end], last_timestamp)
+                yield tables
+        if pending.strip():
+            yield convert_log_chunk(pending + b"\n", last_timestamp)[0]
+
+def iter_store_tables(path, chunk_records=EXPORT_CHUNK_RECORDS):
+    """Yield {"cycles": columns} for successive slices of a memory-mapped cycle store"""
+    records = load_records(path)
+    for start in range(0, len(records), chunk_records):
+        chunk = records[start:start + chunk_records]
+        stations = np.asarray(chunk["station"])
+        columns = {
+            "timestamp": chunk["timestamp"], "board": stations // STATIONS_PER_BOARD, "station": stations,
+            "enabled": chunk["enabled"] != 0, "cycles": chunk["cycles"], "failures": chunk["failures"],
+            "keyswitch_current": chunk["keyswitch_current"], "starter_current": chunk["starter_current"],
+            "seq": np.full(len(chunk), -1),
+        }
+        yield {"cycles": {name: np.asarray(columns[name], dtype=dtype) for name, dtype in TABLES["cycles"]}}
+
+def iter_tables(path):
+    """Pick the reader for a file from its contents"""
+    with open(path, 'rb') as f:
+        magic = f.read(len(FILE_MAGIC))
+    return iter_store_tables(path) if magic == FILE_MAGIC else iter_log_tables(path)
+
+# printf formats for CSV: times to the log's millisecond, currents to the firmware's two decimals
+_CSV_FORMATS = {np.float64: "%.3f", np.float32: "%.2f"}
+
+class CsvWriter:
+    """Appends chunks to one CSV file per table"""
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.files = {}
+
+    def write(self, table, columns):
+        if table not in self.files:
+            self.files[table] = open(f"{self.prefix}_{table}.csv", 'w', newline='')
+            self.files[table].write(",".join(name for name, _ in TABLES[table]) + "\n")
+        f = self.files[table]
+        values = [columns[name] if dtype is None else columns[name].tolist() for name, dtype in TABLES[table]]
+        if any(dtype is None for _, dtype in TABLES[table]):
+            # Free text may need quoting
+            csv.writer(f, lineterminator="\n").writerows(zip(*values))
+            return
+        # One printf per row is about twice as fast as csv.writer for numbers
+        row_format = ",".join(_CSV_FORMATS.get(dtype, "%d") for _, dtype in TABLES[table])
+        f.write("\n".join(map(row_format.__mod__, zip(*values))))
+        f.write("\n")
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+        return [f.name for f in self.files.values()]
+
+class NpzWriter:
+    """Streams each column to a scratch file and assembles one .npz per table on close
+
+    np.savez needs every array in memory at once; here the .npy headers are
+    written once the final lengths are known and the column data is copied
+    in from disk.
+    """
+
+    def __init__(self, prefix, compress=False):
+        self.prefix = prefix
+        self.compression = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+        self.scratch = tempfile.mkdtemp(prefix="keyswitch_export_", dir=os.path.dirname(os.path.abspath(prefix)))
+        self.rows = {}
+        self.text_width = {}
+
+    def _scratch_path(self, table, name):
+        return os.path.join(self.scratch, f"{table}.{name}")
+
+    def write(self, table, columns):
+        for name, dtype in TABLES[table]:
+            with open(self._scratch_path(table, name), 'ab') as f:
+                if dtype is None:
+                    # Text is kept as lines of UTF-8 until the widest entry is known
+                    for text in columns[name]:
+                        f.write(text.replace("\n", " ").encode() + b"\n")
+                    width = max((len(text) for text in columns[name]), default=0)
+                    self.text_width[table, name] = max(self.text_width.get((table, name), 1), width)
+                else:
+                    f.write(np.ascontiguousarray(columns[name], dtype=dtype).tobytes())
+        self.rows[table] = self.rows.get(table, 0) + len(columns["timestamp"])
+
+    def close(self):
+        paths = []
+        try:
+            for table, rows in self.rows.items():
+                path = f"{self.prefix}_{table}.npz"
+                with zipfile.ZipFile(path, 'w', compression=self.compression, allowZip64=True) as archive:
+                    for name, dtype in TABLES[table]:
+                        self._write_member(archive, table, name, dtype, rows)
+                paths.append(path)
+        finally:
+            shutil.rmtree(self.scratch, ignore_errors=True)
+        return paths
+
+    def _write_member(self, archive, table, name, dtype, rows):
+        dtype = np.dtype(f"<U{self.text_width[table, name]}" if dtype is None else dtype)
+        header = {"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": False, "shape": (rows,)}
+        with archive.open(f"{name}.npy", 'w', force_zip64=True) as member, \
+                open(self._scratch_path(table, name), 'rb') as source:
+            np.lib.format.write_array_header_1_0(member, header)
+            if dtype.kind != "U":
+                shutil.copyfileobj(source, member, 1024 * 1024)
+                return
+            while True:
+                texts = source.readlines(1024 * 1024)
+                if not texts:
+                    break
+                member.write(np.array([text[:-1].decode() for text in texts], dtype=dtype).tobytes())
+
+class ArrowWriter:
+    """Appends chunks to one Parquet or Arrow IPC file per table (requires pyarrow)"""
+    def __init__(self, prefix, parquet=True):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ValueError(f"{'Parquet' if parquet else 'Arrow'} export requires pyarrow (pip install pyarrow)") from None
+        self.pa = pyarrow
+        self.parquet = parquet
+        self.extension = "parquet" if parquet else "arrow"
+        self.prefix = prefix
+        self.writers = {}
+
+    def write(self, table, columns):
+        batch = self.pa.table({name: self.pa.array(columns[name]) for name, _ in TABLES[table]})
+        if table not in self.writers:
+            path = f"{self.prefix}_{table}.{self.extension}"
+            if self.parquet:
+                writer = self.pa.parquet.ParquetWriter(path, batch.schema)
+            else:
+                writer = self.pa.ipc.new_file(path, batch.schema)
+            self.writers[table] = (path, writer)
+        self.writers[table][1].write_table(batch)
+
+    def close(self):
+        for _, writer in self.writers.values():
+            writer.close()
+        return [path for path, _ in self.writers.values()]
+
+WRITERS = {
+    "csv": lambda prefix, args: CsvWriter(prefix),
+    "npz": lambda prefix, args: NpzWriter(prefix, args.compress),
+    "parquet": lambda prefix, args: ArrowWriter(prefix, parquet=True),
+    "arrow": lambda prefix, args: ArrowWriter(prefix, parquet=False),
+}
+
+def output_prefix(path):
+    """logs/keyswitch_log_X.txt.gz -> logs/keyswitch_log_X"""
+    for suffix in (".gz", ".txt", ".kcyc"):
+        if path.endswith(suffix):
+            path = path[:-len(suffix)]
+    return path
+
+def export(path, writers):
+    """Stream one session into the writers; returns {table: rows}"""
+    rows = {}
+    for tables in iter_tables(path):
+        for table, columns in tables.items():
+            count = len(columns["timestamp"])
+            if count:
+                rows[table] = rows.get(table, 0) + count
+                for writer in writers:
+                    writer.write(table, columns)
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("sources", nargs="+", help="session logs (.txt, .txt.gz) or cycle stores (.kcyc)")
+    parser.add_argument("--format", action="append", choices=WRITERS,
+                        help="output format; repeatable (default: csv)")
+    parser.add_argument("--output", help="output path prefix (default: the input path without its extension)")
+    parser.add_argument("--compress", action="store_true", help="deflate .npz members, like numpy.savez_compressed")
+    args = parser.parse_args()
+
+    if args.output and len(args.sources) > 1:
+        parser.error("--output needs a single source")
+    formats = args.format or ["csv"]
+    for path in args.sources:
+        prefix = args.output or output_prefix(path)
+        started = time.perf_counter()
+        writers = []
+        try:
+            writers = [WRITERS[name](prefix, args) for name in formats]
+            rows = export(path, writers)
+        except (OSError, ValueError) as e:
+            print(f"{path}: {e}", file=sys.stderr)
+            return 1
+        finally:
+            outputs = [output for writer in writers for output in writer.close()]
+
+        counts = ", ".join(f"{count} {table}" for table, count in rows.items()) or "no messages"
+        print(f"{path}: {counts} in {time.perf_counter() - started:.2f} s")
+        for output in outputs:
+            print(f"  {output}")
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"peak RSS {peak:.0f} MB", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,341 @@
+"""Aggregate cycles, failures, currents and events across many recorded sessions in parallel
+
+Session files (logs, rotated .txt.gz logs and cycle stores) are spread over
+a process pool, largest first. Each worker streams its file through the same
+chunked converter as export_session.py and sends back a compact per-station
+summary (counts, fixed-bin current histograms, sums) that the parent
+merges. Grouping happens at merge time, so the same workers serve
+per-station, per-file and per-lot reports.
+
+Failures are counted from the firmware's cumulative failure counter: a
+cycle failed when its CYCLE message reports more failures than the station's
+previous one. Stations are 1-based global numbers (board 2's first station
+is 5).
+
+A directory holds each session twice, as a log and as a cycle store, so
+only one kind is read from it (--source); files named explicitly are all
+read.
+
+Lots are assigned with a CSV of `log,station,lot` rows, where log is a
+file name pattern (fnmatch) and station a station number or *; the first
+matching row wins.
+
+Usage:
+    python tools/fleet_report.py logs/
+    python tools/fleet_report.py --jobs 4 --json fleet.json /mnt/rig*/logs/keyswitch_log_*
+    python tools/fleet_report.py --by lot --lots lots.csv logs/
+    python tools/fleet_report.py --source stores logs/
+"""
+import argparse
+import csv
+import fnmatch
+import json
+import os
+import re
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "gui"))
+
+from export_session import iter_tables
+
+# Current histograms: fixed bins so partial results merge by addition
+CURRENT_BIN_WIDTH = 0.05  # A
+CURRENT_BINS = 1000  # 0-50 A; higher readings land in the last bin
+
+# Session files picked up when a directory is given. Every session writes
+# both a log and a cycle store holding the same cycles, so only one kind is
+# read: logs by default, since only they carry the events
+SESSION_PATTERNS = {
+    "logs": ("keyswitch_log_*.txt", "keyswitch_log_*.txt.gz"),
+    "stores": ("keyswitch_cycles_*.kcyc",),
+}
+
+# Report percentiles of each current distribution
+PERCENTILES = (5, 50, 95)
+
+class CurrentStats:
+    """Mergeable distribution of one current: histogram, moments and range"""
+    __slots__ = ("histogram", "count", "total", "squares", "low", "high")
+
+    def __init__(self):
+        self.histogram = np.zeros(CURRENT_BINS, dtype=np.int64)
+        self.count = 0
+        self.total = 0.0
+        self.squares = 0.0
+        self.low = np.inf
+        self.high = -np.inf
+
+    def add(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        bins = np.clip((values / CURRENT_BIN_WIDTH).astype(np.int64), 0, CURRENT_BINS - 1)
+        self.histogram += np.bincount(bins, minlength=CURRENT_BINS)
+        self.count += len(values)
+        self.total += float(values.sum())
+        self.squares += float(np.dot(values, values))
+        self.low = min(self.low, float(values.min()))
+        self.high = max(self.high, float(values.max()))
+
+    def merge(self, other):
+        self.histogram += other.histogram
+        self.count += other.count
+        self.total += other.total
+        self.squares += other.squares
+        self.low = min(self.low, other.low)
+        self.high = max(self.high, other.high)
+
+    def summary(self):
+        if not self.count:
+            return None
+        mean = self.total / self.count
+        summary = {"mean": mean, "std": max(self.squares / self.count - mean * mean, 0.0) ** 0.5,
+                   "min": self.low, "max": self.high}
+        # Percentiles interpolated linearly within their bin, kept inside the observed range
+        cumulative = np.cumsum(self.histogram)
+        for percentile in PERCENTILES:
+            rank = percentile / 100 * self.count
+            position = min(int(np.searchsorted(cumulative, rank)), CURRENT_BINS - 1)
+            below = cumulative[position] - self.histogram[position]
+            fraction = (rank - below) / self.histogram[position] if self.histogram[position] else 0.5
+            value = (position + min(max(fraction, 0.0), 1.0)) * CURRENT_BIN_WIDTH
+            summary[f"p{percentile}"] = float(min(max(value, self.low), self.high))
+        return summary
+
+class StationStats:
+    """Mergeable totals of one station (or of everything grouped under one key)"""
+    def __init__(self):
+        self.cycles = 0
+        self.failures = 0
+        self.counter = 0  # highest cumulative cycle count the firmware reported
+        self.files = set()
+        self.first = np.inf
+        self.last = -np.inf
+        self.keyswitch = CurrentStats()
+        self.starter = CurrentStats()
+        self._last_failures = -1  # only meaningful while one file is being read
+
+    def add_cycles(self, columns):
+        """Account for one station's CYCLE rows of a chunk, in order"""
+        failures = columns["failures"].astype(np.int64)
+        previous = np.concatenate(([self._last_failures], failures[:-1]))
+        self.failures += int(((failures > previous) & (previous >= 0)).sum())
+        self._last_failures = int(failures[-1])
+        self.cycles += len(failures)
+        self.counter = max(self.counter, int(columns["cycles"].max()))
+        self.first = min(self.first, float(columns["timestamp"][0]))
+        self.last = max(self.last, float(columns["timestamp"][-1]))
+        self.keyswitch.add(columns["keyswitch_current"])
+        self.starter.add(columns["starter_current"])
+
+    def merge(self, other):
+        self.cycles += other.cycles
+        self.failures += other.failures
+        self.counter = max(self.counter, other.counter)
+        self.files |= other.files
+        self.first = min(self.first, other.first)
+        self.last = max(self.last, other.last)
+        self.keyswitch.merge(other.keyswitch)
+        self.starter.merge(other.starter)
+
+    def summary(self):
+        return {
+            "files": len(self.files),
+            "cycles": self.cycles,
+            "failures": self.failures,
+            "failure_rate": self.failures / self.cycles if self.cycles else None,
+            "highest_counter": self.counter,
+            "first": None if np.isinf(self.first) else self.first,
+            "last": None if np.isinf(self.last) else self.last,
+            "keyswitch_current": self.keyswitch.summary(),
+            "starter_current": self.starter.summary(),
+        }
+
+class FileSummary:
+    """What a worker sends back for one session file"""
+    def __init__(self, path):
+        self.path = path
+        self.bytes = os.path.getsize(path)
+        self.stations = {}  # 0-based global station -> StationStats
+        self.events = Counter()  # event text with numbers replaced by n -> count
+        self.cpu_seconds = 0.0
+        self.error = None
+
+    def station(self, station):
+        if station not in self.stations:
+            self.stations[station] = StationStats()
+            self.stations[station].files.add(self.path)
+        return self.stations[station]
+
+_NUMBERS = re.compile(r"\d+")
+
+def summarize_file(path):
+    """Worker: stream one session file into a FileSummary"""
+    summary = FileSummary(path)
+    started = time.process_time()
+    try:
+        for tables in iter_tables(path):
+            cycles = tables.get("cycles")
+            if cycles is not None and len(cycles["station"]):
+                # Stable sort keeps each station's cycles in arrival order
+                order = np.argsort(cycles["station"], kind="stable")
+                stations = cycles["station"][order]
+                bounds = np.flatnonzero(np.diff(stations)) + 1
+                for rows in np.split(order, bounds):
+                    summary.station(int(cycles["station"][rows[0]])).add_cycles(
+                        {name: column[rows] for name, column in cycles.items()})
+            stations = tables.get("stations")
+            if stations is not None:
+                for station in np.unique(stations["station"]):
+                    counter = int(stations["cycles"][stations["station"] == station].max())
+                    stats = summary.station(int(station))
+                    stats.counter = max(stats.counter, counter)
+            events = tables.get("events")
+            if events is not None:
+                summary.events.update(_NUMBERS.sub("n", text) for text in events["text"])
+    except (OSError, ValueError, EOFError) as e:
+        summary.error = str(e)
+    for stats in summary.stations.values():
+        stats._last_failures = -1
+    summary.cpu_seconds = time.process_time() - started
+    return summary
+
+def find_sessions(paths, source="logs"):
+    """Expand directories into their session files of one kind, largest first (so the pool finishes evenly)"""
+    patterns = SESSION_PATTERNS[source]
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if any(fnmatch.fnmatch(name, pattern) for pattern in patterns):
+                    files.append(os.path.join(path, name))
+        else:
+            files.append(path)
+    return sorted(set(files), key=lambda path: os.path.getsize(path) if os.path.exists(path) else 0, reverse=True)
+
+def load_lots(path):
+    """Read `log,station,lot` rows into [(pattern, 0-based station or None, lot)]"""
+    rules = []
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            station = row["station"].strip()
+            rules.append((row["log"].strip(), None if station in ("", "*") else int(station) - 1, row["lot"].strip()))
+    return rules
+
+def group_key(by, path, station, lots=None):
+    """Report row a station of a file is counted under"""
+    if by == "station":
+        return station + 1
+    if by == "file":
+        return os.path.basename(path)
+    name = os.path.basename(path)
+    for pattern, lot_station, lot in lots:
+        if fnmatch.fnmatch(name, pattern) and lot_station in (None, station):
+            return lot
+    return "unassigned"
+
+def aggregate(files, jobs, by="station", lots=None, on_file=None):
+    """Summarize files on `jobs` processes and merge them; returns (groups, events, file summaries)"""
+    groups = {}
+    events = Counter()
+    summaries = []
+
+    def merge(summary):
+        summaries.append(summary)
+        events.update(summary.events)
+        for station, stats in summary.stations.items():
+            groups.setdefault(group_key(by, summary.path, station, lots), StationStats()).merge(stats)
+        if on_file:
+            on_file(summary)
+
+    if jobs <= 1:
+        for path in files:
+            merge(summarize_file(path))
+    else:
+        # Merged in submission order, so the float sums (and the report) do not depend on scheduling
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            for summary in pool.map(summarize_file, files):
+                merge(summary)
+    return groups, events, summaries
+
+def format_current(summary):
+    if summary is None:
+        return f"{'-':>27}"
+    return f"{summary['mean']:9.2f}{summary['std']:6.2f}{summary['p5']:6.2f}{summary['p95']:6.2f}"
+
+def current_header(name):
+    return f"{name + ' A':>9}{'std':>6}{'p5':>6}{'p95':>6}"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("paths", nargs="+", help="session files or directories holding them")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="worker processes (default: one per core)")
+    parser.add_argument("--source", choices=tuple(SESSION_PATTERNS), default="logs",
+                        help="session files read from directories: logs (with events) or cycle stores (default: logs)")
+    parser.add_argument("--by", choices=("station", "file", "lot"), default="station", help="report rows")
+    parser.add_argument("--lots", help="CSV of log,station,lot rows (required with --by lot)")
+    parser.add_argument("--events", type=int, default=10, help="most frequent event messages to list")
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    if args.by == "lot" and not args.lots:
+        parser.error("--by lot needs --lots")
+    try:
+        lots = load_lots(args.lots) if args.lots else None
+    except (OSError, KeyError, ValueError) as e:
+        print(f"{args.lots}: {e}", file=sys.stderr)
+        return 1
+    for path in args.paths:
+        if not os.path.exists(path):
+            print(f"{path}: no such file or directory", file=sys.stderr)
+            return 1
+    files = find_sessions(args.paths, args.source)
+    if not files:
+        print("No session files found", file=sys.stderr)
+        return 1
+
+    def on_file(summary):
+        if summary.error:
+            print(f"{summary.path}: {summary.error}", file=sys.stderr)
+
+    started = time.perf_counter()
+    groups, events, summaries = aggregate(files, args.jobs, args.by, lots, on_file)
+    seconds = time.perf_counter() - started
+    total_bytes = sum(summary.bytes for summary in summaries)
+    cpu_seconds = sum(summary.cpu_seconds for summary in summaries)
+    print(f"{len(files)} files, {total_bytes / 1e6:.0f} MB in {seconds:.2f} s on {args.jobs} processes "
+          f"({total_bytes / 1e6 / seconds:.0f} MB/s, {cpu_seconds / seconds:.1f} cores busy)")
+
+    width = max([len(args.by)] + [len(str(key)) for key in groups]) + 2
+    print(f"\n{args.by:<{width}}{'files':>6}{'cycles':>12}{'failures':>10}{'rate':>8}"
+          f"{current_header('key')}{current_header('start')}")
+    report = {}
+    for key in sorted(groups, key=lambda key: (isinstance(key, str), key)):
+        summary = groups[key].summary()
+        report[str(key)] = summary
+        rate = f"{summary['failure_rate']:.2%}" if summary["failure_rate"] is not None else "-"
+        print(f"{str(key):<{width}}{summary['files']:>6}{summary['cycles']:>12}{summary['failures']:>10}{rate:>8}"
+              f"{format_current(summary['keyswitch_current'])}{format_current(summary['starter_current'])}")
+
+    if events:
+        print("\nevents")
+        for text, count in events.most_common(args.events):
+            print(f"{count:>10}  {text}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                "files": [{"path": summary.path, "bytes": summary.bytes, "cpu_seconds": summary.cpu_seconds,
+                           "error": summary.error} for summary in summaries],
+                "by": args.by,
+                "groups": report,
+                "events": dict(events.most_common()),
+                "current_histogram_bin_width": CURRENT_BIN_WIDTH,
+            }, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""Query session logs by time range, message type, station and board through a sidecar index
+
+The first query builds keyswitch_log_*.txt.idx next to the log in one pass;
+later queries only index lines appended since, then seek straight to the
+matching lines instead of scanning the file. Stations and boards are
+1-based, as in the GUI.
+
+Usage:
+    python tools/log_query.py logs/keyswitch_log_20250101_080000.txt --type EVENT --station 3
+    python tools/log_query.py LOG --from "2025-01-01 09:00:00" --to "2025-01-01 09:05:00"
+    python tools/log_query.py LOG --type WARNING --type ERROR --follow
+    python tools/log_query.py LOG --summary
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "gui"))
+
+from log_index import LogIndex, LINE_TYPES, parse_log_time, format_log_time
+
+# Seconds between index updates with --follow
+FOLLOW_INTERVAL = 1.0
+
+def print_lines(index, numbers, limit=None):
+    """Print matching lines; returns how many were printed"""
+    if limit is not None:
+        numbers = numbers[:limit]
+    for line in index.lines(numbers):
+        print(line)
+    sys.stdout.flush()
+    return len(numbers)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("log", help="plain-text log file (keyswitch_log_*.txt)")
+    parser.add_argument("--from", dest="start", help="first time to include (yyyy-mm-dd HH:MM:SS[.fff])")
+    parser.add_argument("--to", dest="end", help="last time to include (yyyy-mm-dd HH:MM:SS[.fff])")
+    parser.add_argument("--type", action="append", type=str.upper, choices=LINE_TYPES,
+                        help="message type to include; repeatable (OTHER is host messages)")
+    parser.add_argument("--station", action="append", type=int, help="1-based station; repeatable")
+    parser.add_argument("--board", action="append", type=int, help="1-based board; repeatable")
+    parser.add_argument("--limit", type=int, help="print at most this many lines")
+    parser.add_argument("--count", action="store_true", help="print the number of matching lines only")
+    parser.add_argument("--summary", action="store_true", help="print the time span and line counts per type")
+    parser.add_argument("--follow", action="store_true", help="keep printing matching lines as the log grows")
+    parser.add_argument("--rebuild", action="store_true", help="rebuild the index from scratch")
+    args = parser.parse_args()
+
+    try:
+        start = parse_log_time(args.start) if args.start else None
+        end = parse_log_time(args.end) if args.end else None
+        index = LogIndex(args.log)
+        started = time.perf_counter()
+        added = index.update(rebuild=args.rebuild)
+    except (OSError, ValueError) as e:
+        print(f"{args.log}: {e}", file=sys.stderr)
+        return 1
+    if added:
+        print(f"Indexed {added} lines in {time.perf_counter() - started:.2f} s", file=sys.stderr)
+
+    if args.summary:
+        if len(index):
+            timestamps = index.records["timestamp"]
+            print(f"{len(index)} lines, {format_log_time(timestamps[0])} to {format_log_time(timestamps[-1])}")
+        for name, count in index.type_counts().items():
+            print(f"{name:<13}{count:>10}")
+        return 0
+
+    filters = dict(
+        start=start, end=end, types=args.type,
+        stations=[station - 1 for station in args.station] if args.station else None,
+        boards=[board - 1 for board in args.board] if args.board else None,
+    )
+    numbers = index.query(**filters)
+    if args.count:
+        print(len(numbers))
+        return 0
+    print_lines(index, numbers, args.limit)
+
+    # Only lines added since the last pass are filtered on each update
+    try:
+        while args.follow:
+            time.sleep(FOLLOW_INTERVAL)
+            first = len(index)
+            if index.update():
+                print_lines(index, index.query(first=first, **filters))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
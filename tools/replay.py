@@ -0,0 +1,329 @@
+"""Replay a recorded session through the host's message pipeline
+
+Board messages are fed to KeyswitchTesterGUI.handle_serial_lines (or the
+headless runner's handle_lines with --headless), so they are logged and go
+through process_serial_message, the station model, trend buffers and drift
+detector exactly as if a board had sent them. Sources are streamed from
+disk, so a week-long log is never loaded into memory:
+
+- session logs (keyswitch_log_*.txt, rotated .txt.gz): the CYCLE, STATION,
+  SYSTEM_STATE and EVENT lines, paced by their log timestamps,
+- cycle stores (.kcyc): every recorded cycle, paced by its timestamp,
+- raw serial captures (any other file, e.g. from `cat /dev/ttyACM0`): ASCII
+  lines and binary telemetry frames, decoded like the serial reader does.
+  Captures have no timing, so they always replay at maximum speed.
+
+With --max the replay is a deterministic workload for profiling the station
+update and logging paths; add --profile to record it with cProfile.
+
+Usage:
+    python tools/replay.py logs/keyswitch_log_20250101_080000.txt            # real time, in the GUI
+    python tools/replay.py --speed 60 --max-gap 5 logs/keyswitch_log_*.txt.gz
+    python tools/replay.py --headless --max logs/keyswitch_cycles_20250101_080000.kcyc
+    python tools/replay.py --max --exit --platform offscreen --profile replay.prof LOG
+"""
+import argparse
+import cProfile
+import mmap
+import os
+import pstats
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "gui"))
+
+# Modules that read constants are imported where used, after KEYSWITCH_LOGS_DIR is set
+from log_format import open_log, split_log_line, split_board_tag
+from messages import CycleMessage
+
+# Logged lines that came from a board; everything else in a log was written by the host
+BOARD_PREFIXES = ("CYCLE:", "STATION:", "SYSTEM_STATE:", "EVENT:")
+
+# Messages due within this many seconds of each other are delivered as one batch
+BATCH_WINDOW = 0.002
+
+# Largest batch, like one drain of the serial reader
+BATCH_SIZE = 64
+
+# Longest the GUI event loop is kept busy delivering batches before it gets to repaint
+GUI_SLICE = 0.02
+
+# Bytes of a raw capture decoded at a time
+CAPTURE_CHUNK = 65536
+
+def iter_log_session(path):
+    """Yield (timestamp, board index, line) for every board message in a session log"""
+    from log_index import parse_log_time
+    second_text = None
+    second = 0.0
+    with open_log(path) as f:
+        for line in f:
+            stamp, message = split_log_line(line)
+            if stamp is None:
+                continue
+            board_index, message = split_board_tag(message)
+            if not message.startswith(BOARD_PREFIXES):
+                continue
+            # Only the millisecond part changes between most lines
+            if stamp[:19] != second_text:
+                try:
+                    second = parse_log_time(stamp[:19])
+                except ValueError:
+                    continue
+                second_text = stamp[:19]
+            milliseconds = stamp[20:23]
+            yield second + (int(milliseconds) / 1000 if milliseconds.isdigit() else 0.0), board_index, message
+
+def iter_cycle_store(path):
+    """Yield (timestamp, board index, CycleMessage) for every record in a cycle store"""
+    from constants import STATIONS_PER_BOARD
+    from cycle_store import iter_records
+    for timestamp, station, enabled, cycles, failures, keyswitch, starter in iter_records(path):
+        board_index, local = divmod(station, STATIONS_PER_BOARD)
+        yield timestamp, board_index, CycleMessage(local, bool(enabled), cycles, failures, keyswitch, starter)
+
+def iter_capture(path):
+    """Yield (None, 0, line or message) for everything decoded from a raw serial capture"""
+    from serial_communication import SerialManager
+    # The reader's own decoder, so captures switch between ASCII and binary frames like a live link
+    reader = SerialManager()
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for start in range(0, len(data), CAPTURE_CHUNK):
+                if not reader.binary:
+                    reader.request_binary()
+                for message in reader._decode(data[start:start + CAPTURE_CHUNK]):
+                    yield None, 0, message
+
+def source_reader(path):
+    """Pick the reader for a file from its contents and name"""
+    from cycle_store import FILE_MAGIC
+    with open(path, 'rb') as f:
+        magic = f.read(len(FILE_MAGIC))
+    if magic == FILE_MAGIC:
+        return iter_cycle_store
+    if path.endswith(".gz") or os.path.basename(path).startswith("keyswitch_log_"):
+        return iter_log_session
+    return iter_capture
+
+def iter_source(path):
+    """Events from one file, read with the reader that fits it"""
+    return source_reader(path)(path)
+
+def count_boards(paths):
+    """Boards in a recorded session: one past the highest board tag or station in its logs and cycle stores"""
+    from constants import STATIONS_PER_BOARD
+    from cycle_store import iter_records
+    highest = 0
+    for path in paths:
+        reader = source_reader(path)
+        if reader is iter_log_session:
+            with open_log(path) as f:
+                for line in f:
+                    if "] [B" in line:
+                        highest = max(highest, split_board_tag(split_log_line(line)[1])[0])
+        elif reader is iter_cycle_store:
+            for record in iter_records(path):
+                highest = max(highest, record[1] // STATIONS_PER_BOARD)
+        # A raw capture is always one board's port
+    return highest + 1
+
+def iter_sources(paths, limit=None):
+    """Chain the events of several files (e.g. a log and its rotated parts), in the given order"""
+    count = 0
+    for path in paths:
+        for event in iter_source(path):
+            if limit is not None and count >= limit:
+                return
+            count += 1
+            yield event
+
+class ReplayClock:
+    """Maps recorded timestamps onto seconds since the start of the replay
+
+    speed 0 replays as fast as possible. Gaps between recorded messages are
+    capped at max_gap seconds (before scaling), so idle hours of a long
+    session can be skipped, and backward clock jumps count as no gap.
+    Untimed messages (None) are due with the message before them.
+    """
+    def __init__(self, speed=1.0, max_gap=None):
+        self.speed = speed
+        self.max_gap = max_gap
+        self._last = None
+        self._due = 0.0
+
+    def due(self, timestamp):
+        if not self.speed or timestamp is None:
+            return self._due
+        if self._last is not None:
+            gap = max(0.0, timestamp - self._last)
+            if self.max_gap is not None:
+                gap = min(gap, self.max_gap)
+            self._due += gap / self.speed
+        self._last = timestamp
+        return self._due
+
+def iter_batches(events, clock, size=BATCH_SIZE):
+    """Group consecutive messages of one board that are due together into (due, board index, messages)"""
+    batch = []
+    batch_board = batch_due = None
+    for timestamp, board_index, message in events:
+        due = clock.due(timestamp)
+        if batch and (board_index != batch_board or due - batch_due > BATCH_WINDOW or len(batch) >= size):
+            yield batch_due, batch_board, batch
+            batch = []
+        if not batch:
+            batch_board, batch_due = board_index, due
+        batch.append(message)
+    if batch:
+        yield batch_due, batch_board, batch
+
+def replay_headless(batches, args):
+    """Deliver the batches to a HeadlessTester on this thread; returns (messages, seconds)"""
+    from constants import STATIONS_PER_BOARD
+    from headless import HeadlessTester
+
+    tester = HeadlessTester(logs_dir=os.environ["KEYSWITCH_LOGS_DIR"], echo=not args.quiet)
+    tester.set_station_count(args.boards * STATIONS_PER_BOARD)
+    tester.open_storage()
+    messages = 0
+    started = time.perf_counter()
+    try:
+        for due, board_index, lines in batches:
+            wait = started + due - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+            tester.handle_lines(board_index, lines)
+            messages += len(lines)
+        tester.check_drift()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        seconds = time.perf_counter() - started
+        tester.close_storage()
+    return messages, seconds
+
+class GuiReplay:
+    """Delivers the batches to a KeyswitchTesterGUI from a timer, leaving the event loop free to repaint"""
+    def __init__(self, window, batches, on_finished):
+        from PySide6.QtCore import QTimer
+
+        self.window = window
+        self.batches = batches
+        self.on_finished = on_finished
+        self.messages = 0
+        self.seconds = 0.0
+        self._pending = next(batches, None)
+        self._started = None
+        self._timer = QTimer()
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._deliver)
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._timer.start(0)
+
+    def _deliver(self):
+        slice_end = time.perf_counter() + GUI_SLICE
+        while self._pending is not None:
+            due, board_index, lines = self._pending
+            now = time.perf_counter()
+            wait = self._started + due - now
+            if wait > 0:
+                self._timer.start(int(wait * 1000))
+                return
+            if now > slice_end:
+                self._timer.start(0)
+                return
+            self.window.handle_serial_lines(board_index, lines, now)
+            self.messages += len(lines)
+            self._pending = next(self.batches, None)
+
+        self.seconds = time.perf_counter() - self._started
+        self.window.check_drift()
+        self.on_finished()
+
+def replay_gui(batches, args):
+    """Deliver the batches to a KeyswitchTesterGUI; returns (messages, seconds) once the app exits"""
+    if args.platform:
+        os.environ["QT_QPA_PLATFORM"] = args.platform
+    from PySide6.QtWidgets import QApplication
+    from constants import STATIONS_PER_BOARD
+    from main import KeyswitchTesterGUI
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    window = KeyswitchTesterGUI([])
+    window.set_station_count(args.boards * STATIONS_PER_BOARD)
+    window.show()
+
+    def finished():
+        window.log_message(f"Replay finished: {replay.messages} messages in {replay.seconds:.2f} s")
+        if args.exit:
+            window.close()
+            app.quit()
+
+    replay = GuiReplay(window, batches, finished)
+    replay.start()
+    app.exec()
+    return replay.messages, replay.seconds or time.perf_counter() - replay._started
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("sources", nargs="+", help="session logs (.txt, .txt.gz), cycle stores (.kcyc) or raw captures")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed relative to the recording (default: 1)")
+    parser.add_argument("--max", action="store_true", help="replay as fast as the pipeline allows")
+    parser.add_argument("--max-gap", type=float, help="skip ahead when the recording is idle for longer than this (s)")
+    parser.add_argument("--limit", type=int, help="stop after this many messages")
+    parser.add_argument("--boards", type=int,
+                        help="boards in the recorded session (default: from the board tags in the sources)")
+    parser.add_argument("--headless", action="store_true", help="replay through the headless runner instead of the GUI")
+    parser.add_argument("--quiet", action="store_true", help="with --headless, do not echo log lines")
+    parser.add_argument("--platform", help="Qt platform plugin, e.g. offscreen")
+    parser.add_argument("--exit", action="store_true", help="close the GUI when the replay finishes")
+    parser.add_argument("--logs-dir", help="directory for the replayed session's logs (default: a temporary directory)")
+    parser.add_argument("--profile", help="record the replay with cProfile and write the stats to this file")
+    args = parser.parse_args()
+
+    if args.speed <= 0 and not args.max:
+        parser.error("--speed must be positive")
+    for path in args.sources:
+        if not os.path.isfile(path):
+            print(f"{path}: no such file", file=sys.stderr)
+            return 1
+
+    clock = ReplayClock(0.0 if args.max else args.speed, args.max_gap)
+    batches = iter_batches(iter_sources(args.sources, args.limit), clock)
+    replay = replay_headless if args.headless else replay_gui
+    profiler = cProfile.Profile() if args.profile else None
+
+    with tempfile.TemporaryDirectory(prefix="keyswitch_replay_") as logs_dir:
+        # Must be set before the GUI modules import their constants
+        os.environ["KEYSWITCH_LOGS_DIR"] = args.logs_dir or logs_dir
+        try:
+            if args.boards is None:
+                args.boards = count_boards(args.sources)
+                if args.boards > 1:
+                    print(f"Replaying {args.boards} boards (found in the sources; override with --boards)",
+                          file=sys.stderr)
+            if profiler:
+                profiler.enable()
+            messages, seconds = replay(batches, args)
+        except (OSError, ValueError) as e:
+            print(f"Replay failed: {e}", file=sys.stderr)
+            return 1
+        finally:
+            if profiler:
+                profiler.disable()
+
+    print(f"Replayed {messages} messages in {seconds:.2f} s ({messages / seconds if seconds else 0:,.0f} messages/s)",
+          file=sys.stderr)
+    if profiler:
+        profiler.dump_stats(args.profile)
+        pstats.Stats(profiler, stream=sys.stderr).sort_stats("cumulative").print_stats(15)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,399 @@
+"""Emulate OpenRB boards on pseudo-terminals for load testing without hardware
+
+Each simulated board implements the serial protocol of arduino/eventReporter.cpp
+and arduino/commandParser.cpp on a PTY, so SerialManager, the GUI and the
+headless runner can be pointed at it with --port:
+
+    python tools/simulator.py --rate 50 --fail-prob 0.01 --autostart
+    python gui/main.py --port /dev/pts/3
+"""
+import argparse
+import os
+import random
+import select
+import sys
+import threading
+import time
+import tty
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "gui"))
+
+from messages import parse_message
+from telemetry import encode_message, BINARY_ENABLED_EVENT, BINARY_DISABLED_EVENT
+
+# Firmware constants (arduino/config.h)
+KEYSWITCH_CURRENT_THRESHOLD = 5.0
+STARTER_CURRENT_THRESHOLD = 20.0
+STATION_FAILURE_THRESHOLD = 10
+STATION_CYCLE_THRESHOLD = 200000
+CYCLE_FREQUENCY_CPM = 6
+
+# Real firmware cycle rate in cycles/s across all enabled stations
+REAL_CYCLE_RATE = CYCLE_FREQUENCY_CPM / 60.0
+
+class SimulatedBoard:
+    """One emulated OpenRB board on a PTY
+    
+    rate is cycles per second across all enabled stations (REAL_CYCLE_RATE
+    matches the firmware). fail_prob injects cycles with currents below the
+    thresholds, malformed_prob corrupts outgoing lines, and burst_size extra
+    cycles are emitted back-to-back every burst_interval seconds.
+    """
+    def __init__(self, stations=4, rate=REAL_CYCLE_RATE, fail_prob=0.0, malformed_prob=0.0,
+                 burst_size=0, burst_interval=5.0, idle_state_rate=10.0, start_cycles=0,
+                 autostart=False, seed=None):
+        self.stations = stations
+        self.rate = rate
+        self.fail_prob = fail_prob
+        self.malformed_prob = malformed_prob
+        self.burst_size = burst_size
+        self.burst_interval = burst_interval
+        self.idle_state_rate = idle_state_rate
+        self.rng = random.Random(seed)
+        
+        self.running = autostart
+        self.binary = False
+        self.sequence_numbers = False
+        self._system_sequence = 0
+        self._station_sequence = [0] * stations
+        self.enabled = [True] * stations
+        self.cycles = [start_cycles] * stations
+        self.failures = [0] * stations
+        self.active_station = 0
+        
+        # Counters for load tests
+        self.lines_sent = 0
+        self.bytes_sent = 0
+        self.cycles_run = 0
+        self.commands_received = 0
+        
+        self.master_fd, self._slave_fd = os.openpty()
+        tty.setraw(self._slave_fd)
+        self.port = os.ttyname(self._slave_fd)
+        
+        self._stop = threading.Event()
+        self._thread = None
+        self._command_buffer = b""
+    
+    def start(self):
+        """Start emulating in a background thread"""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"SimulatedBoard {self.port}", daemon=True)
+        self._thread.start()
+        return self.port
+    
+    def stop(self):
+        """Stop the emulation and close the PTY"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        for fd in (self.master_fd, self._slave_fd):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+    
+    def _run(self):
+        """Emulation loop: emit due cycles/state lines and answer commands"""
+        now = time.monotonic()
+        last = now
+        credit = 0.0
+        next_idle = now
+        next_burst = now + self.burst_interval
+        
+        while not self._stop.is_set():
+            now = time.monotonic()
+            out = []
+            
+            if self.running:
+                # Accumulate fractional cycles so any rate is honoured on average
+                credit = min(credit + (now - last) * self.rate, max(1.0, self.rate * 0.5))
+                due = int(credit)
+                credit -= due
+                for _ in range(due):
+                    self._cycle(out)
+            else:
+                credit = 0.0
+                # The firmware repeats SYSTEM_STATE on every loop while stopped
+                if self.idle_state_rate and now >= next_idle:
+                    out.append("SYSTEM_STATE:0")
+                    next_idle = now + 1.0 / self.idle_state_rate
+            last = now
+            
+            if self.burst_size and now >= next_burst:
+                for _ in range(self.burst_size):
+                    if self.running:
+                        self._cycle(out)
+                    else:
+                        self._report_station_states(out)
+                next_burst = now + self.burst_interval
+            
+            if out:
+                self._send(out)
+            
+            try:
+                readable, _, _ = select.select([self.master_fd], [], [], 0.005 if self.running else 0.02)
+                if readable:
+                    self._receive(os.read(self.master_fd, 4096))
+            except OSError:
+                # No process has the port open right now
+                time.sleep(0.05)
+    
+    def _cycle(self, out):
+        """processCycle() from stateMachine.cpp for the next enabled station"""
+        if not any(self.enabled):
+            return
+        while not self.enabled[self.active_station]:
+            self.active_station = (self.active_station + 1) % self.stations
+        station = self.active_station
+        
+        if self.rng.random() < self.fail_prob:
+            keyswitch = self.rng.uniform(0.0, KEYSWITCH_CURRENT_THRESHOLD)
+            starter = self.rng.uniform(0.0, STARTER_CURRENT_THRESHOLD)
+        else:
+            keyswitch = max(KEYSWITCH_CURRENT_THRESHOLD, self.rng.gauss(6.5, 0.3))
+            starter = max(STARTER_CURRENT_THRESHOLD, self.rng.gauss(24.0, 1.0))
+        
+        if keyswitch < KEYSWITCH_CURRENT_THRESHOLD or starter < STARTER_CURRENT_THRESHOLD:
+            self.failures[station] += 1
+        else:
+            self.cycles[station] += 1
+        out.append(self._station_line(station))
+        
+        if self.failures[station] >= STATION_FAILURE_THRESHOLD or self.cycles[station] >= STATION_CYCLE_THRESHOLD:
+            self._disable(station, out)
+        
+        out.append(f"CYCLE:{station}:{1 if self.enabled[station] else 0}:{self.cycles[station]}:"
+                   f"{self.failures[station]}:{keyswitch:.2f}:{starter:.2f}")
+        self.cycles_run += 1
+        self.active_station = (station + 1) % self.stations
+    
+    def _station_line(self, station):
+        return (f"STATION:{station}:{1 if self.enabled[station] else 0}:"
+                f"{self.cycles[station]}:{self.failures[station]}")
+    
+    def _report_station_states(self, out):
+        for station in range(self.stations):
+            out.append(self._station_line(station))
+    
+    def _enable(self, station, out):
+        if not 0 <= station < self.stations:
+            out.append(f"EVENT:Invalid station index: {station}")
+        elif self.enabled[station]:
+            out.append(f"EVENT:Station {station} is already enabled")
+        else:
+            self.enabled[station] = True
+            out.append(self._station_line(station))
+            out.append(f"EVENT:Station {station} enabled")
+    
+    def _disable(self, station, out):
+        if not 0 <= station < self.stations:
+            out.append(f"EVENT:Invalid station index: {station}")
+        elif not self.enabled[station]:
+            out.append(f"EVENT:Station {station} is already disabled")
+        else:
+            self.enabled[station] = False
+            out.append(self._station_line(station))
+            out.append(f"EVENT:Station {station} disabled")
+    
+    def _handle_command(self, command, out):
+        """handleCommands() from commandParser.cpp"""
+        self.commands_received += 1
+        if command == "START":
+            if self.running:
+                out.append("EVENT:System is already running.")
+            else:
+                self.running = True
+                out.append("EVENT:System started.")
+                out.append("SYSTEM_STATE:1")
+        elif command == "STOP":
+            if not self.running:
+                out.append("EVENT:System is already stopped.")
+            else:
+                self.running = False
+                out.append("EVENT:System stopped.")
+                out.append("SYSTEM_STATE:0")
+        elif command.startswith("ENABLE:"):
+            self._enable(_to_int(command[7:]), out)
+        elif command.startswith("DISABLE:"):
+            self._disable(_to_int(command[8:]), out)
+        elif command.startswith("STATE:"):
+            self._load_state(command[6:], out)
+        elif command.startswith("RESET_CYCLE:"):
+            station = _to_int(command[12:])
+            if 0 <= station < self.stations:
+                self.cycles[station] = 0
+                out.append(self._station_line(station))
+                out.append(f"EVENT:Station {station} cycle count reset to 0")
+            out.append(f"EVENT:Reset cycle count for station {station}")
+        elif command.startswith("RESET_FAIL:"):
+            station = _to_int(command[11:])
+            if 0 <= station < self.stations:
+                self.failures[station] = 0
+                out.append(self._station_line(station))
+                out.append(f"EVENT:Station {station} failure count reset to 0")
+            out.append(f"EVENT:Reset failure count for station {station}")
+        elif command.startswith("BINARY:"):
+            # Acknowledge in the current format, then switch
+            enable = _to_int(command[7:]) != 0
+            out.append(f"EVENT:{BINARY_ENABLED_EVENT if enable else BINARY_DISABLED_EVENT}")
+            self._send(out)
+            out.clear()
+            self.binary = enable
+        elif command.startswith("SEQUENCE:"):
+            self.sequence_numbers = _to_int(command[9:]) != 0
+            out.append(f"EVENT:Sequence numbers {'enabled' if self.sequence_numbers else 'disabled'}")
+        elif command.startswith("REQUEST_STATION:"):
+            station = _to_int(command[16:])
+            if 0 <= station < self.stations:
+                out.append(self._station_line(station))
+            else:
+                out.append(f"EVENT:Invalid station index: {station}")
+        elif command == "REQUEST_STATE":
+            out.append(f"SYSTEM_STATE:{1 if self.running else 0}")
+            self._report_station_states(out)
+        else:
+            out.append(f"EVENT:Error: Unrecognized command - {command}")
+    
+    def _load_state(self, data, out):
+        """STATE:S0_CYCLES:S0_FAILS:... (the intended processStateData() behaviour)"""
+        values = [_to_int(value) for value in data.split(":")]
+        if len(values) != self.stations * 2:
+            out.append("EVENT:Error: Incomplete state data received")
+            return
+        for station in range(self.stations):
+            self.cycles[station] = values[station * 2]
+            self.failures[station] = values[station * 2 + 1]
+            out.append(self._station_line(station))
+        out.append("EVENT:Successfully loaded state data from Raspberry Pi")
+    
+    def _receive(self, data):
+        """Split incoming bytes into commands (readStringUntil('\\n')) and answer them"""
+        self._command_buffer += data
+        out = []
+        while b"\n" in self._command_buffer:
+            raw, self._command_buffer = self._command_buffer.split(b"\n", 1)
+            self._handle_command(raw.decode(errors='replace').strip(), out)
+        if out:
+            self._send(out)
+    
+    def _send(self, lines):
+        """Write lines with Serial.println() endings (or as binary frames), corrupting some if configured"""
+        chunks = []
+        for line in lines:
+            seq = self._next_sequence(line)
+            if self.binary:
+                data = encode_message(parse_message(line)._replace(seq=seq))
+            elif self.sequence_numbers:
+                data = f"{line}#{seq}\r\n".encode()
+            else:
+                data = line.encode() + b"\r\n"
+            if self.malformed_prob and self.rng.random() < self.malformed_prob:
+                data = self._corrupt(data)
+            chunks.append(data)
+        data = b"".join(chunks)
+        
+        view = memoryview(data)
+        try:
+            while view:
+                written = os.write(self.master_fd, view)
+                view = view[written:]
+        except OSError:
+            return
+        self.lines_sent += len(lines)
+        self.bytes_sent += len(data)
+    
+    def _next_sequence(self, line):
+        """Number a line within its stream (per station for CYCLE/STATION, else the system stream)"""
+        prefix, _, body = line.partition(":")
+        if prefix in ("CYCLE", "STATION"):
+            station = _to_int(body)
+            seq = self._station_sequence[station]
+            self._station_sequence[station] = (seq + 1) & 0xFFFF
+        else:
+            seq = self._system_sequence
+            self._system_sequence = (seq + 1) & 0xFFFF
+        return seq
+    
+    def _corrupt(self, data):
+        """Damage a line the way a noisy link might"""
+        if self.binary:
+            # Flip one byte, or lose the end of the frame
+            if self.rng.random() < 0.5:
+                return data[:self.rng.randrange(1, len(data))]
+            index = self.rng.randrange(len(data))
+            return data[:index] + bytes((data[index] ^ 0x55,)) + data[index + 1:]
+        kind = self.rng.randrange(4)
+        if kind == 0:
+            # Truncated: the tail and newline are lost, so it merges with the next line
+            return data[:self.rng.randrange(1, len(data) - 2)]
+        if kind == 1:
+            # Invalid UTF-8 in the middle
+            cut = self.rng.randrange(1, len(data) - 2)
+            return data[:cut] + b"\xff\xfe" + data[cut:]
+        if kind == 2:
+            # Missing fields
+            fields = data.rstrip(b"\r\n").split(b":")
+            return b":".join(fields[:max(1, len(fields) // 2)]) + b"\r\n"
+        # Non-numeric field
+        return data.replace(b":", b":x", 1)
+
+def _to_int(text):
+    """Arduino String.toInt(): leading integer or 0"""
+    digits = ""
+    for i, char in enumerate(text.strip()):
+        if char.isdigit() or (i == 0 and char == "-"):
+            digits += char
+        else:
+            break
+    try:
+        return int(digits)
+    except ValueError:
+        return 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Emulate OpenRB boards on pseudo-terminals")
+    parser.add_argument("--boards", type=int, default=1, help="number of boards to emulate")
+    parser.add_argument("--stations", type=int, default=4, help="stations per board")
+    parser.add_argument("--rate", type=float, default=REAL_CYCLE_RATE,
+                        help=f"cycles per second per board (firmware: {REAL_CYCLE_RATE:.2f})")
+    parser.add_argument("--fail-prob", type=float, default=0.0, help="probability that a cycle fails")
+    parser.add_argument("--malformed-prob", type=float, default=0.0, help="probability that a line is corrupted")
+    parser.add_argument("--burst-size", type=int, default=0, help="extra cycles emitted back-to-back per burst")
+    parser.add_argument("--burst-interval", type=float, default=5.0, help="seconds between bursts")
+    parser.add_argument("--idle-state-rate", type=float, default=10.0,
+                        help="SYSTEM_STATE:0 lines per second while stopped")
+    parser.add_argument("--start-cycles", type=int, default=0, help="initial cycle count for every station")
+    parser.add_argument("--autostart", action="store_true", help="start cycling without waiting for START")
+    parser.add_argument("--duration", type=float, help="exit after this many seconds")
+    parser.add_argument("--seed", type=int, help="random seed")
+    args = parser.parse_args()
+    
+    boards = []
+    for index in range(args.boards):
+        board = SimulatedBoard(args.stations, args.rate, args.fail_prob, args.malformed_prob,
+                               args.burst_size, args.burst_interval, args.idle_state_rate,
+                               args.start_cycles, args.autostart,
+                               None if args.seed is None else args.seed + index)
+        board.start()
+        boards.append(board)
+        print(board.port, flush=True)
+    
+    started = time.monotonic()
+    try:
+        while args.duration is None or time.monotonic() - started < args.duration:
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        elapsed = time.monotonic() - started
+        for board in boards:
+            board.stop()
+            print(f"{board.port}: {board.cycles_run} cycles, {board.lines_sent} lines "
+                  f"({board.lines_sent / elapsed:.0f} lines/s), {board.commands_received} commands",
+                  file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,314 @@
+"""Soak-test the host through a full-length run in compressed time
+
+A real test runs every station to STATION_CYCLE_THRESHOLD (200,000) cycles at
+CYCLE_FREQUENCY_CPM (6/min), which takes months; leaks in the log view or the
+station widgets only show at the end. This drives the GUI (offscreen) through
+the same run against simulated boards on pseudo-terminals at --rate cycles/s:
+each station starts --cycles short of the threshold, so the run ends the way
+the firmware ends it, with every station disabled at the threshold.
+
+Along the way it samples RSS and tracemalloc, and times every message from
+the serial read to the end of its processing on the GUI thread. After the
+warm-up (when the log view, trend buffers and histograms have reached their
+fixed sizes) the growth of RSS and traced memory and the p99 latency must
+stay within the budgets, else it exits with status 1 and lists the biggest
+allocation sites that grew.
+
+Usage:
+    python tools/soak.py                                   # full 200,000-cycle run at 1000 cycles/s
+    python tools/soak.py --cycles 20000 --rate 2000 --json soak.json
+    python tools/soak.py --boards 2 --io-process --max-rss-growth 20
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "gui"))
+
+from bench_pipeline import current_rss
+from latency import LatencyHistogram
+from simulator import SimulatedBoard, STATION_CYCLE_THRESHOLD, REAL_CYCLE_RATE
+
+# Give up when no message has been processed for this long
+STALL_TIMEOUT = 30.0
+
+# Allocation sites listed when a memory budget is exceeded
+TOP_GROWTH = 15
+
+MB = 1024 * 1024
+
+class SoakRun:
+    """Drives a KeyswitchTesterGUI through the run and samples it from Qt timers"""
+    def __init__(self, app, window, boards, args):
+        from PySide6.QtCore import QTimer
+
+        self.app = app
+        self.window = window
+        self.boards = boards
+        self.args = args
+        self.total_cycles = args.cycles * sum(board.stations for board in boards)
+
+        self.messages = 0
+        self.latency = LatencyHistogram()  # after the warm-up
+        self.window_latency = LatencyHistogram()  # since the last sample
+        self.samples = []
+        self.baseline = None  # (sample, tracemalloc snapshot) at the end of the warm-up
+        self.final_snapshot = None
+        self.error = None
+        self.started_at = None
+        self._started_run = False
+        self._last_progress = (0, time.monotonic())
+
+        # Time each batch from the serial read to the end of its processing
+        window.serial_lines_received.disconnect(window.handle_serial_lines)
+        window.serial_lines_received.connect(self.handle_serial_lines)
+
+        self._poll_timer = QTimer()
+        self._poll_timer.setInterval(100)
+        self._poll_timer.timeout.connect(self.poll)
+        self._sample_timer = QTimer()
+        self._sample_timer.setInterval(int(args.interval * 1000))
+        self._sample_timer.timeout.connect(self.sample)
+
+    def handle_serial_lines(self, board_index, lines, received_at):
+        self.window.handle_serial_lines(board_index, lines, received_at)
+        seconds = time.perf_counter() - received_at
+        histograms = (self.window_latency, self.latency) if self.baseline else (self.window_latency,)
+        for histogram in histograms:
+            for _ in lines:
+                histogram.record(seconds)
+        self.messages += len(lines)
+
+    def start(self):
+        self.window.connect_to_device()
+        self._poll_timer.start()
+
+    def cycles_done(self):
+        """Cycles the simulated boards have run (each station started args.cycles short of the threshold)"""
+        return sum(board.cycles_run for board in self.boards)
+
+    def poll(self):
+        """Start the run once connected, then watch for completion or a stall"""
+        window = self.window
+        if not self._started_run:
+            if window.board_manager.connected and not window.board_manager.pending_count():
+                self._started_run = True
+                self.started_at = time.perf_counter()
+                window.control_widget.start_stop_btn.setChecked(True)
+                window.toggle_start_stop()
+                self.sample()
+                self._sample_timer.start()
+            elif time.monotonic() - self._last_progress[1] > STALL_TIMEOUT:
+                self.stop("could not connect to the simulated boards")
+            return
+
+        now = time.monotonic()
+        if self.messages != self._last_progress[0]:
+            self._last_progress = (self.messages, now)
+        elif now - self._last_progress[1] > STALL_TIMEOUT:
+            self.stop(f"no messages processed for {STALL_TIMEOUT:.0f} s")
+            return
+        if self.args.timeout and time.perf_counter() - self.started_at > self.args.timeout:
+            self.stop(f"run did not finish within {self.args.timeout:.0f} s")
+            return
+
+        # Done once every station has been retired at the threshold and the host has seen it
+        retired = all(not any(board.enabled) for board in self.boards)
+        if retired and all(values.get('enabled') is False for values in window.station_model.values.values()):
+            self.sample()
+            self.stop()
+
+    def sample(self):
+        """Record memory, progress and the latency since the last sample"""
+        gc.collect()
+        elapsed = time.perf_counter() - self.started_at
+        traced = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+        cycles = self.cycles_done()
+        sample = {
+            "seconds": elapsed,
+            "cycles": cycles,
+            "simulated_days": cycles / REAL_CYCLE_RATE / 86400,
+            "messages": self.messages,
+            "rss_mb": (current_rss() or 0) / MB,
+            "traced_mb": traced / MB if traced is not None else None,
+            "log_view_pending": len(self.window.serial_log.pending_lines),
+            "p99_ms": self.window_latency.percentile(0.99) * 1000,
+            "max_ms": self.window_latency.max * 1000,
+        }
+        self.window_latency.reset()
+        self.samples.append(sample)
+        print_sample(sample, self.total_cycles, header=len(self.samples) == 1)
+
+        if self.baseline is None and cycles >= self.args.warmup * self.total_cycles:
+            snapshot = tracemalloc.take_snapshot() if tracemalloc.is_tracing() else None
+            self.baseline = (sample, snapshot)
+            print(f"-- warm-up done after {cycles:,} cycles; growth is measured from here", flush=True)
+
+    def stop(self, error=None):
+        self.error = error
+        self._poll_timer.stop()
+        self._sample_timer.stop()
+        if tracemalloc.is_tracing():
+            self.final_snapshot = tracemalloc.take_snapshot()
+        self.app.quit()
+
+def print_sample(sample, total_cycles, header=False):
+    if header:
+        print(f"{'time s':>8} {'cycles':>10} {'done':>6} {'sim days':>9} {'messages':>10} {'RSS MB':>8} "
+              f"{'traced MB':>10} {'view':>6} {'p99 ms':>8} {'max ms':>8}")
+    traced = f"{sample['traced_mb']:.1f}" if sample['traced_mb'] is not None else "-"
+    print(f"{sample['seconds']:8.0f} {sample['cycles']:10,} {sample['cycles'] / total_cycles:6.1%} "
+          f"{sample['simulated_days']:9.1f} {sample['messages']:10,} {sample['rss_mb']:8.1f} {traced:>10} "
+          f"{sample['log_view_pending']:6} {sample['p99_ms']:8.1f} {sample['max_ms']:8.1f}", flush=True)
+
+def top_growth(before, after, limit=TOP_GROWTH):
+    """The allocation sites whose traced size grew the most between two snapshots"""
+    filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap*>")]
+    stats = after.filter_traces(filters).compare_to(before.filter_traces(filters), "lineno")
+    return [{"site": str(stat.traceback), "growth_kb": stat.size_diff / 1024, "count_growth": stat.count_diff}
+            for stat in stats[:limit] if stat.size_diff > 0]
+
+def evaluate(run, args):
+    """Results of a finished run and the list of budgets it broke"""
+    failures = []
+    if run.error:
+        failures.append(run.error)
+    if run.baseline is None:
+        failures.append("the run ended before the warm-up finished")
+        return {"samples": run.samples}, failures
+
+    baseline, final = run.baseline[0], run.samples[-1]
+    rss_growth = final["rss_mb"] - baseline["rss_mb"]
+    traced_growth = (final["traced_mb"] - baseline["traced_mb"]) if final["traced_mb"] is not None else None
+    summary = run.latency.summary()
+    p99_ms = summary["p99"] * 1000
+
+    if rss_growth > args.max_rss_growth:
+        failures.append(f"RSS grew {rss_growth:.1f} MB after the warm-up (budget {args.max_rss_growth:g} MB)")
+    if traced_growth is not None and traced_growth > args.max_traced_growth:
+        failures.append(f"traced memory grew {traced_growth:.1f} MB after the warm-up "
+                        f"(budget {args.max_traced_growth:g} MB)")
+    if p99_ms > args.max_p99_ms:
+        failures.append(f"p99 message latency {p99_ms:.1f} ms (budget {args.max_p99_ms:g} ms)")
+    if final["cycles"] < run.total_cycles:
+        failures.append(f"only {final['cycles']:,} of {run.total_cycles:,} cycles ran")
+
+    growth = []
+    if run.baseline[1] is not None and run.final_snapshot is not None:
+        growth = top_growth(run.baseline[1], run.final_snapshot)
+    results = {
+        "cycles": final["cycles"],
+        "messages": final["messages"],
+        "seconds": final["seconds"],
+        "simulated_days": final["simulated_days"],
+        "rss_mb": {"baseline": baseline["rss_mb"], "final": final["rss_mb"], "growth": rss_growth},
+        "traced_mb": {"baseline": baseline["traced_mb"], "final": final["traced_mb"], "growth": traced_growth},
+        "latency_ms": {key: value * 1000 if key != "count" else value for key, value in summary.items()},
+        "top_growth": growth,
+        "samples": run.samples,
+    }
+    return results, failures
+
+def run_soak(args):
+    """Run the soak test in this process; returns (results, failures)"""
+    os.environ["QT_QPA_PLATFORM"] = args.platform
+    from PySide6.QtWidgets import QApplication
+    from main import KeyswitchTesterGUI
+
+    if args.trace_frames:
+        # Before the window is built, so its widgets and buffers are traced too
+        tracemalloc.start(args.trace_frames)
+
+    boards = [SimulatedBoard(args.stations, args.rate / args.boards, args.fail_prob,
+                             start_cycles=STATION_CYCLE_THRESHOLD - args.cycles, seed=args.seed + index)
+              for index in range(args.boards)]
+    for board in boards:
+        board.start()
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    window = KeyswitchTesterGUI([board.port for board in boards], io_process=args.io_process)
+    if not args.no_show:
+        window.show()
+    run = SoakRun(app, window, boards, args)
+    try:
+        run.start()
+        app.exec()
+    finally:
+        window.close()
+        for board in boards:
+            board.stop()
+        tracemalloc.stop()
+    return evaluate(run, args)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cycles", type=int, default=STATION_CYCLE_THRESHOLD,
+                        help=f"cycles per station before it is retired (default: the full {STATION_CYCLE_THRESHOLD:,})")
+    parser.add_argument("--rate", type=float, default=1000.0, help="cycles per second over all boards (default: 1000)")
+    parser.add_argument("--boards", type=int, default=1, help="simulated boards (default: 1)")
+    parser.add_argument("--stations", type=int, default=4, help="stations per board (default: 4)")
+    parser.add_argument("--fail-prob", type=float, default=0.0,
+                        help="probability that a cycle fails (10 failures retire a station early)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed of the simulated boards")
+    parser.add_argument("--io-process", action="store_true", help="run the GUI with its serial I/O in a separate process")
+    parser.add_argument("--interval", type=float, default=10.0, help="seconds between samples (default: 10)")
+    parser.add_argument("--warmup", type=float, default=0.1,
+                        help="fraction of the run before the memory baseline is taken (default: 0.1)")
+    parser.add_argument("--max-rss-growth", type=float, default=30.0, help="RSS growth budget in MB (default: 30)")
+    parser.add_argument("--max-traced-growth", type=float, default=10.0,
+                        help="tracemalloc growth budget in MB (default: 10)")
+    parser.add_argument("--max-p99-ms", type=float, default=200.0,
+                        help="p99 serial read -> processed latency budget in ms (default: 200)")
+    parser.add_argument("--trace-frames", type=int, default=1,
+                        help="tracemalloc stack depth; 0 disables tracing, which is much faster (default: 1)")
+    parser.add_argument("--timeout", type=float, help="fail if the run takes longer than this many seconds")
+    parser.add_argument("--platform", default="offscreen", help="Qt platform plugin (default: offscreen)")
+    parser.add_argument("--no-show", action="store_true", help="do not show the window (skips repaints)")
+    parser.add_argument("--logs-dir", help="directory for the session's log files (default: a temporary directory)")
+    parser.add_argument("--json", help="write the samples and results to this file")
+    args = parser.parse_args()
+
+    if not 0 < args.cycles <= STATION_CYCLE_THRESHOLD:
+        parser.error(f"--cycles must be between 1 and {STATION_CYCLE_THRESHOLD}")
+    if args.rate <= 0 or args.boards < 1 or not 0 <= args.warmup < 1:
+        parser.error("--rate and --boards must be positive and --warmup in [0, 1)")
+
+    with tempfile.TemporaryDirectory(prefix="keyswitch_soak_") as logs_dir:
+        # Must be set before the GUI modules import their constants
+        os.environ["KEYSWITCH_LOGS_DIR"] = args.logs_dir or logs_dir
+        results, failures = run_soak(args)
+
+    if "latency_ms" in results:
+        latency = results["latency_ms"]
+        print(f"{results['cycles']:,} cycles ({results['simulated_days']:.1f} days at the firmware rate), "
+              f"{results['messages']:,} messages in {results['seconds']:.0f} s")
+        traced = results["traced_mb"]["growth"]
+        print(f"memory after warm-up: RSS {results['rss_mb']['growth']:+.1f} MB, traced "
+              + (f"{traced:+.1f} MB" if traced is not None else "not measured"))
+        print(f"latency ms: p50 {latency['p50']:.2f}  p90 {latency['p90']:.2f}  p99 {latency['p99']:.2f}  "
+              f"max {latency['max']:.2f}")
+        if results["top_growth"] and failures:
+            print("largest allocation growth since the warm-up:")
+            for entry in results["top_growth"]:
+                print(f"  {entry['growth_kb']:+10.1f} KB {entry['count_growth']:+8} blocks  {entry['site']}")
+
+    results["budgets"] = {"max_rss_growth_mb": args.max_rss_growth, "max_traced_growth_mb": args.max_traced_growth,
+                          "max_p99_ms": args.max_p99_ms}
+    results["failures"] = failures
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    if not failures:
+        print("PASS")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
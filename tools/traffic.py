@@ -0,0 +1,92 @@
+import random
+
+from log_format import iter_log_messages
+from messages import (parse_message, MessageParseError, CycleMessage, StationMessage, SystemStateMessage,
+                      EventMessage)
+
+# Messages the firmware can send as binary telemetry frames
+BINARY_MESSAGE_TYPES = (CycleMessage, StationMessage, SystemStateMessage, EventMessage)
+
+def synthetic_lines(count, stations=4, seed=0, event_every=50, state_every=500):
+    """Yield `count` lines resembling a long run of the OpenRB firmware
+    
+    Mostly CYCLE lines cycling through the stations, with the STATION,
+    EVENT and SYSTEM_STATE lines the firmware emits around them.
+    """
+    rng = random.Random(seed)
+    cycles = [0] * stations
+    failures = [0] * stations
+    emitted = 0
+    station = 0
+    
+    while emitted < count:
+        keyswitch = rng.gauss(6.5, 0.3)
+        starter = rng.gauss(24.0, 1.0)
+        if keyswitch < 5.0 or starter < 20.0:
+            failures[station] += 1
+        else:
+            cycles[station] += 1
+        
+        line_group = [
+            f"STATION:{station}:1:{cycles[station]}:{failures[station]}",
+            f"CYCLE:{station}:1:{cycles[station]}:{failures[station]}:{keyswitch:.2f}:{starter:.2f}",
+        ]
+        if emitted % event_every == 0:
+            line_group.append(f"EVENT:Station {station} cycle complete")
+        if emitted % state_every == 0:
+            line_group.append("SYSTEM_STATE:1")
+        
+        for line in line_group:
+            if emitted >= count:
+                return
+            yield line
+            emitted += 1
+        station = (station + 1) % stations
+
+def load_traffic(paths, count):
+    """Return the lines to benchmark: recorded messages if log files are given, otherwise synthetic"""
+    if not paths:
+        return list(synthetic_lines(count))
+    lines = []
+    for path in paths:
+        for message in iter_log_messages(path):
+            lines.append(message)
+            if len(lines) >= count:
+                return lines
+    return lines
+
+def encodable_lines(lines):
+    """Keep only the lines the firmware could send as binary frames
+
+    Recorded logs also hold host lines and malformed board lines, which have
+    no frame encoding.
+    """
+    kept = []
+    for line in lines:
+        try:
+            if isinstance(parse_message(line), BINARY_MESSAGE_TYPES):
+                kept.append(line)
+        except MessageParseError:
+            pass
+    return kept
+
+def numbered_messages(lines):
+    """Parse lines and number them per stream like the firmware (per station, plus a system stream)
+
+    Lines without a binary encoding (see encodable_lines) are skipped without
+    using up a sequence number.
+    """
+    counters = {}
+    messages = []
+    for line in lines:
+        try:
+            message = parse_message(line)
+        except MessageParseError:
+            continue
+        if not isinstance(message, BINARY_MESSAGE_TYPES):
+            continue
+        stream = message.station if isinstance(message, (CycleMessage, StationMessage)) else None
+        seq = counters.get(stream, 0)
+        counters[stream] = (seq + 1) & 0xFFFF
+        messages.append(message._replace(seq=seq))
+    return messages